@@ -0,0 +1,140 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Dict
+
+from .config import settings
+
+
+class AdmissionRejected(Exception):
+    """受け付けられないリクエスト（503 + Retry-After で即返す）"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """OCRカスケードの同時実行数制限と有界キュー（イベントループ上で使う）
+
+    - 同時実行は max_concurrent 本まで。超えた分は max_queue 件まで待たせ、それ以上は即拒否
+    - queue_timeout_s 以上待ったリクエストは拒否（遅れて返すより早く断る）
+    - per_client_max > 0 ならクライアントキーごとの実行中＋待機数を制限し、
+      空いた枠はクライアント間でラウンドロビンに割り当てる
+    """
+
+    def __init__(self, max_concurrent: int = 8, max_queue: int = 16,
+                 queue_timeout_s: float = 5.0, per_client_max: int = 0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.per_client_max = per_client_max
+
+        self._active = 0
+        self._queued = 0
+        self._waiters: "OrderedDict[str, deque]" = OrderedDict()
+        self._per_client: Dict[str, int] = {}
+        self._service_s = 1.0   # 処理時間の指数移動平均（Retry-Afterの見積もり用）
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "client_share": 0, "queue_timeout": 0}
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._service_s * (self._queued + 1) / max(1, self.max_concurrent)))
+
+    def _reject(self, reason: str):
+        self.rejected[reason] += 1
+        raise AdmissionRejected(reason, self.retry_after())
+
+    def _leave(self, key: str):
+        self._per_client[key] -= 1
+        if not self._per_client[key]:
+            del self._per_client[key]
+
+    async def _acquire(self, key: str):
+        if self.per_client_max and self._per_client.get(key, 0) >= self.per_client_max:
+            self._reject("client_share")
+        if self._active < self.max_concurrent and not self._queued:
+            self._active += 1
+            self._per_client[key] = self._per_client.get(key, 0) + 1
+            return
+        if self._queued >= self.max_queue:
+            self._reject("queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append(waiter)
+        self._queued += 1
+        self._per_client[key] = self._per_client.get(key, 0) + 1
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout_s)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            # 割り当て前ならキューから外し、割り当て直後に取り消された場合は枠を返す
+            queue = self._waiters.get(key)
+            granted = False
+            if queue is not None and waiter in queue:
+                queue.remove(waiter)
+                if not queue:
+                    del self._waiters[key]
+                self._queued -= 1
+            elif waiter.done() and not waiter.cancelled():
+                granted = True
+                self._active -= 1
+            self._leave(key)
+            if granted:
+                self._dispatch()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._reject("queue_timeout")
+
+    def _dispatch(self):
+        """空いた枠を待機中のクライアントにラウンドロビンで割り当てる"""
+        while self._active < self.max_concurrent and self._waiters:
+            key, queue = next(iter(self._waiters.items()))
+            waiter = queue.popleft()
+            if queue:
+                self._waiters.move_to_end(key)
+            else:
+                del self._waiters[key]
+            self._queued -= 1
+            if waiter.done():
+                continue
+            self._active += 1
+            waiter.set_result(None)
+
+    def _release(self, key: str, elapsed_s: float):
+        self._active -= 1
+        self._leave(key)
+        self._service_s = 0.8 * self._service_s + 0.2 * elapsed_s
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, client_key: str):
+        """実行枠を確保する。確保できなければ AdmissionRejected"""
+        await self._acquire(client_key)
+        self.admitted += 1
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(client_key, time.monotonic() - t0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self._active,
+            "queued": self._queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "avg_service_s": round(self._service_s, 3),
+        }
+
+
+admission_controller = AdmissionController(
+    settings.admission_max_concurrent,
+    settings.admission_max_queue,
+    settings.admission_queue_timeout_s,
+    settings.admission_per_client_max
+)
@@ -1,26 +1,61 @@
 from azure.ai.vision.imageanalysis import ImageAnalysisClient
 from azure.core.credentials import AzureKeyCredential
 from .config import settings
+from .circuit_breaker import BreakerClient, CircuitBreaker
+from .hedging import HedgedClient
 
 
 class AzureClientManager:
     """Azure Vision Clientのシングルトン管理"""
     _instance = None
     _client = None
+    _breaker = None
+    _hedged = None
     
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
         return cls._instance
     
+    @property
+    def breaker(self) -> CircuitBreaker:
+        if self._breaker is None:
+            self._breaker = CircuitBreaker(
+                window=settings.breaker_window,
+                min_calls=settings.breaker_min_calls,
+                error_rate=settings.breaker_error_rate,
+                slow_ms=settings.breaker_slow_ms,
+                slow_rate=settings.breaker_slow_rate,
+                open_seconds=settings.breaker_open_seconds
+            )
+        return self._breaker
+    
+    @property
+    def hedging(self):
+        """ヘッジ付きクライアント（無効時・未作成時は None）"""
+        return self._hedged
+    
     def get_client(self) -> ImageAnalysisClient:
-        """Azure Vision Clientを取得（初回のみ作成する）"""
+        """Azure Vision Clientを取得（初回のみ作成する）
+
+        ブレーカー → ヘッジ → 実クライアントの順に包む（ブレーカーからはヘッジ込みで1呼び出しに見える）
+        """
         if self._client is None:
             settings.validate()
-            self._client = ImageAnalysisClient(
+            client = ImageAnalysisClient(
                 endpoint=settings.vision_endpoint,
                 credential=AzureKeyCredential(settings.vision_key)
             )
+            if settings.hedge_enabled:
+                self._hedged = HedgedClient(
+                    client,
+                    percentile=settings.hedge_percentile,
+                    max_fraction=settings.hedge_max_fraction,
+                    min_delay_ms=settings.hedge_min_delay_ms,
+                    max_workers=settings.hedge_max_workers()
+                )
+                client = self._hedged
+            self._client = BreakerClient(client, self.breaker)
         return self._client
 
 
@@ -0,0 +1,131 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Dict
+
+
+class CircuitOpenError(ConnectionError):
+    """サーキットが開いている間のOCR呼び出し（Azureに送らず即失敗）"""
+
+
+class CircuitBreaker:
+    """Azure呼び出しのサーキットブレーカー
+
+    直近 window 件のうち失敗率 or 遅延率が閾値を超えたら open にし、
+    open_seconds 経過後に half_open で probe 件だけ試す（成功で closed、失敗で再び open）。
+    スレッドプールから呼ばれるためロックで保護する。
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, window: int = 20, min_calls: int = 5, error_rate: float = 0.5,
+                 slow_ms: float = 10000.0, slow_rate: float = 0.5,
+                 open_seconds: float = 30.0, half_open_probes: int = 1):
+        self.window = window
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_ms = slow_ms
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self._lock = threading.Lock()
+        self._calls = deque(maxlen=window)   # (失敗したか, 遅かったか)
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    def before_call(self):
+        """呼び出し可否の判定。不可なら CircuitOpenError"""
+        with self._lock:
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    self.rejected += 1
+                    raise CircuitOpenError("OCR backend circuit is open")
+                self._state = self.HALF_OPEN
+                self._probes_in_flight = 0
+            if self._state == self.HALF_OPEN:
+                if self._probes_in_flight >= self.half_open_probes:
+                    self.rejected += 1
+                    raise CircuitOpenError("OCR backend circuit is half-open (probe in flight)")
+                self._probes_in_flight += 1
+
+    def record(self, failed: bool, latency_ms: float):
+        slow = latency_ms >= self.slow_ms
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if failed or slow:
+                    self._open()
+                else:
+                    self._state = self.CLOSED
+                    self._calls.clear()
+                return
+
+            self._calls.append((failed, slow))
+            n = len(self._calls)
+            if self._state == self.CLOSED and n >= self.min_calls:
+                failures = sum(1 for f, _ in self._calls if f)
+                slows = sum(1 for _, s in self._calls if s)
+                if failures / n >= self.error_rate or slows / n >= self.slow_rate:
+                    self._open()
+
+    def _open(self):
+        self._state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        self.times_opened += 1
+
+    def fail_fast(self):
+        """リクエスト開始時の判定。open中なら CircuitOpenError（half_openの試行枠は消費しない）"""
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                raise CircuitOpenError("OCR backend circuit is open")
+
+    def state(self) -> Dict[str, Any]:
+        with self._lock:
+            n = len(self._calls)
+            state = {
+                "state": self._state,
+                "recent_calls": n,
+                "recent_error_rate": sum(1 for f, _ in self._calls if f) / n if n else 0.0,
+                "recent_slow_rate": sum(1 for _, s in self._calls if s) / n if n else 0.0,
+                "rejected": self.rejected,
+                "times_opened": self.times_opened,
+            }
+            if self._state == self.OPEN:
+                state["retry_after_s"] = max(0.0, self.open_seconds - (time.monotonic() - self._opened_at))
+            return state
+
+
+def _is_backend_failure(e: Exception) -> bool:
+    """Azure側の障害か（画像不正などの4xxは障害として数えない。429は数える）"""
+    status = getattr(e, "status_code", None)
+    if status is None:
+        return True
+    return status == 429 or status >= 500
+
+
+class BreakerClient:
+    """ImageAnalysisClient.analyze をサーキットブレーカー越しに呼ぶラッパー"""
+
+    def __init__(self, client, breaker: CircuitBreaker):
+        self._client = client
+        self.breaker = breaker
+
+    def analyze(self, *args, **kwargs):
+        self.breaker.before_call()
+        t0 = time.perf_counter()
+        try:
+            result = self._client.analyze(*args, **kwargs)
+        except Exception as e:
+            self.breaker.record(_is_backend_failure(e), (time.perf_counter() - t0) * 1000.0)
+            raise
+        self.breaker.record(False, (time.perf_counter() - t0) * 1000.0)
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
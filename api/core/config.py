@@ -8,14 +8,117 @@ class Settings:
     vision_endpoint: str = os.getenv("VISION_ENDPOINT", "")
     vision_key: str = os.getenv("VISION_KEY", "")
     
+    # Azure障害時のサーキットブレーカー: 直近N件の失敗率・遅延率が閾値以上で一定時間遮断
+    breaker_window: int = int(os.getenv("BREAKER_WINDOW", "20"))
+    breaker_min_calls: int = int(os.getenv("BREAKER_MIN_CALLS", "5"))
+    breaker_error_rate: float = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+    breaker_slow_ms: float = float(os.getenv("BREAKER_SLOW_MS", "10000"))
+    breaker_slow_rate: float = float(os.getenv("BREAKER_SLOW_RATE", "0.5"))
+    breaker_open_seconds: float = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+    # ヘッジ: 直近レイテンシのパーセンタイルを過ぎても返らなければ同じ呼び出しをもう1本送る
+    hedge_enabled: bool = os.getenv("HEDGE_ENABLED", "true").lower() == "true"
+    hedge_percentile: float = float(os.getenv("HEDGE_PERCENTILE", "95"))
+    hedge_max_fraction: float = float(os.getenv("HEDGE_MAX_FRACTION", "0.05"))
+    hedge_min_delay_ms: float = float(os.getenv("HEDGE_MIN_DELAY_MS", "200"))
+    # アドミッション制御: OCRカスケードの同時実行数・待機キュー長・待機上限秒・クライアントごとの上限（0で無制限）
+    admission_max_concurrent: int = int(os.getenv("ADMISSION_MAX_CONCURRENT", "8"))
+    admission_max_queue: int = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))
+    admission_queue_timeout_s: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_S", "5"))
+    admission_per_client_max: int = int(os.getenv("ADMISSION_PER_CLIENT_MAX", "0"))
+    # 非同期ジョブAPI: ワーカー数・未完了ジョブの上限・完了ジョブの保持秒数・コールバック許可ホスト（カンマ区切り、空ならコールバック無効）
+    jobs_workers: int = int(os.getenv("JOBS_WORKERS", "4"))
+    jobs_max_pending: int = int(os.getenv("JOBS_MAX_PENDING", "100"))
+    jobs_ttl_seconds: float = float(os.getenv("JOBS_TTL_SECONDS", "3600"))
+    jobs_callback_hosts: str = os.getenv("JOBS_CALLBACK_ALLOWED_HOSTS", "")
+    # コールバック送信: 専用スレッド数（ジョブのワーカーを塞がない）・1回の送信のタイムアウト秒
+    jobs_callback_workers: int = int(os.getenv("JOBS_CALLBACK_WORKERS", "4"))
+    jobs_callback_timeout_s: float = float(os.getenv("JOBS_CALLBACK_TIMEOUT_S", "10"))
+    # サンプリングプロファイラ: N件に1件を cProfile で計測（0で無効）。
+    # PROFILE_TOKEN 設定時は X-Debug-Profile ヘッダでの計測指定と /api/debug/profiles が使える
+    profile_sample_every: int = int(os.getenv("PROFILE_SAMPLE_EVERY", "0"))
+    profile_dir: str = os.getenv("PROFILE_DIR", "/tmp/ocr-profiles")
+    profile_max_files: int = int(os.getenv("PROFILE_MAX_FILES", "50"))
+    profile_token: str = os.getenv("PROFILE_TOKEN", "")
+    # 同一画像のOCR結果キャッシュ（0で無効）
+    ocr_cache_size: int = int(os.getenv("OCR_CACHE_SIZE", "256"))
+    ocr_cache_ttl_seconds: float = float(os.getenv("OCR_CACHE_TTL_SECONDS", "3600"))
+    
+    # メモリ上限モード: 大きな画像は縮小デコードし、拡大バリアントの画素数を制限する
+    ocr_memory_budget: bool = os.getenv("OCR_MEMORY_BUDGET", "false").lower() == "true"
+    ocr_max_decode_pixels: int = int(os.getenv("OCR_MAX_DECODE_PIXELS", "16000000"))
+    ocr_max_variant_pixels: int = int(os.getenv("OCR_MAX_VARIANT_PIXELS", "24000000"))
+    # 前処理バリアントをスレッドごとの再利用バッファで生成する（バリアントごとの配列確保を減らす）
+    ocr_reuse_buffers: bool = os.getenv("OCR_REUSE_BUFFERS", "false").lower() == "true"
+    
+    # 前処理カスケードの計画（cascade_plans.yml の計画名。空ならYAMLの default、リクエストの plan で上書き可）
+    ocr_cascade_plan: str = os.getenv("OCR_CASCADE_PLAN", "")
+    # 計画ファイル（空なら scripts/ocr/preprocess/cascade_plans.yml）
+    ocr_cascade_plans_file: str = os.getenv("OCR_CASCADE_PLANS_FILE", "")
+    # 失敗済みバリアントとほぼ同じ（dHash距離が閾値以下）バリアントはOCRせずにスキップする
+    # 読み取り精度への影響をリプレイで測るまでは既定で無効
+    ocr_skip_similar_variants: bool = os.getenv("OCR_SKIP_SIMILAR_VARIANTS", "false").lower() == "true"
+    ocr_similar_variant_distance: int = int(os.getenv("OCR_SIMILAR_VARIANT_DISTANCE", "4"))
+    # 読み取れなかった時に返す継続トークン（撮り直し時に送ると前回の試行結果を使って再開する）
+    # シークレット未設定時はプロセスごとの乱数（複数レプリカでは共通の値を設定する）
+    ocr_continuation_secret: str = os.getenv("OCR_CONTINUATION_SECRET", "")
+    ocr_continuation_ttl_seconds: float = float(os.getenv("OCR_CONTINUATION_TTL_SECONDS", "900"))
+    
+    # 針メーター読み取り（GAUGE_WEIGHTS未設定なら無効）
+    gauge_weights: str = os.getenv("GAUGE_WEIGHTS", "")
+    gauge_config_dir: str = os.getenv("GAUGE_CONFIG_DIR", "config/gauges")
+    gauge_default_config: str = os.getenv("GAUGE_DEFAULT_CONFIG", "")
+    gauge_imgsz: int = int(os.getenv("GAUGE_IMGSZ", "640"))
+    gauge_conf_threshold: float = float(os.getenv("GAUGE_CONF_THRESHOLD", "0.5"))
+    gauge_num_threads: int = int(os.getenv("GAUGE_NUM_THREADS", "0"))
+    # マイクロバッチング: 最大N枚 / 最大Tミリ秒のどちらか早い方でまとめて推論
+    gauge_max_batch_size: int = int(os.getenv("GAUGE_MAX_BATCH_SIZE", "8"))
+    gauge_max_wait_ms: float = float(os.getenv("GAUGE_MAX_WAIT_MS", "10"))
+    
+    # ローカル7セグ認識: Azureの前に試し、確信度が閾値以上ならAzureを呼ばずに返す
+    ocr_local_seven_segment: bool = os.getenv("OCR_LOCAL_SEVEN_SEGMENT", "false").lower() == "true"
+    ocr_local_threshold: float = float(os.getenv("OCR_LOCAL_THRESHOLD", "0.85"))
+    
+    # ライブOCR（WebSocket）: フレームハッシュの距離がこれ以下なら同じ表示とみなす
+    live_hash_threshold: int = int(os.getenv("LIVE_HASH_THRESHOLD", "4"))
+    live_max_skip: int = int(os.getenv("LIVE_MAX_SKIP", "0"))
+    
     api_host: str = "0.0.0.0"
     api_port: int = 8000
     
+    def ocr_pixel_limits(self):
+        """(max_decode_pixels, max_variant_pixels)。メモリ上限モードでなければ無制限"""
+        if not self.ocr_memory_budget:
+            return 0, 0
+        return self.ocr_max_decode_pixels, self.ocr_max_variant_pixels
+    
+    def hedge_max_workers(self):
+        """ヘッジ用スレッド数。カスケード1本あたりAzure呼び出しは同時に1本（ヘッジ込みで2本）なので、
+        同時に走りうるカスケード数（アドミッション上限 + ジョブワーカー）の2倍"""
+        return 2 * (max(1, self.admission_max_concurrent) + max(0, self.jobs_workers))
+    
+    def ocr_similar_distance(self):
+        """バリアントのスキップ閾値（無効ならNone）"""
+        return self.ocr_similar_variant_distance if self.ocr_skip_similar_variants else None
+    
+    def jobs_callback_allowed_hosts(self):
+        return {h.strip().lower() for h in self.jobs_callback_hosts.split(",") if h.strip()}
+    
     def validate(self):
         if not self.vision_endpoint:
             raise ValueError("VISION_ENDPOINT is not set")
         if not self.vision_key:
             raise ValueError("VISION_KEY is not set")
+        self.validate_cascade_plan()
+    
+    def validate_cascade_plan(self):
+        """計画ファイルと OCR_CASCADE_PLAN を確認（誤りを起動時・/health で検出し、リクエスト時の500にしない）"""
+        from scripts.ocr.preprocess.plans import get_plan
+        try:
+            get_plan(self.ocr_cascade_plan or None, self.ocr_cascade_plans_file or None)
+        except KeyError:
+            raise ValueError(f"OCR_CASCADE_PLAN '{self.ocr_cascade_plan}' is not defined in the cascade plans file")
+        except Exception as e:
+            raise ValueError(f"OCR_CASCADE_PLANS_FILE could not be loaded: {e}")
 
 
 settings = Settings()
@@ -0,0 +1,60 @@
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+from typing import Any, Dict, Optional
+
+from .config import settings
+
+TOKEN_VERSION = 1
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class ContinuationTokens:
+    """撮り直し用の継続トークン（前回の試行結果とROI。HMAC-SHA256で署名）
+
+    中身はクライアントから見えるが改ざんはできない。secret 未設定時はプロセスごとの乱数を使うため、
+    再起動や別レプリカでは検証に失敗する（その場合は通常どおり最初から試す）。
+    """
+
+    def __init__(self, secret: str = "", ttl_seconds: float = 900.0):
+        self._key = secret.encode("utf-8") if secret else secrets.token_bytes(32)
+        self.ttl_seconds = ttl_seconds
+
+    def _sign(self, body: str) -> str:
+        return _b64encode(hmac.new(self._key, body.encode("ascii"), hashlib.sha256).digest())
+
+    def issue(self, state: Dict[str, Any]) -> str:
+        payload = {"v": TOKEN_VERSION, "exp": int(time.time() + self.ttl_seconds), **state}
+        body = _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+        return f"{body}.{self._sign(body)}"
+
+    def verify(self, token: str) -> Optional[Dict[str, Any]]:
+        """署名・期限・バージョンが正しければ状態を返す（不正ならNone）"""
+        if not token.isascii():
+            return None
+        body, _, signature = token.partition(".")
+        if not body or not hmac.compare_digest(signature.encode("ascii"), self._sign(body).encode("ascii")):
+            return None
+        try:
+            payload = json.loads(_b64decode(body))
+        except ValueError:
+            return None
+        if payload.get("v") != TOKEN_VERSION or payload.get("exp", 0) < time.time():
+            return None
+        return {k: v for k, v in payload.items() if k not in ("v", "exp")}
+
+
+continuation_tokens = ContinuationTokens(
+    settings.ocr_continuation_secret,
+    settings.ocr_continuation_ttl_seconds
+)
@@ -0,0 +1,67 @@
+import numpy as np
+from scripts.gauge import MicroBatcher, predict_detections
+from .config import settings
+
+
+class GaugeModelManager:
+    """針キーポイントモデルのシングルトン管理（起動時に1回だけロード）"""
+    _instance = None
+    _model = None
+    _batcher = None
+    
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(settings.gauge_weights)
+    
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+    
+    def load(self):
+        """モデルをCPUにロードしてウォームアップ（初回推論のグラフ構築を起動時に済ませる）"""
+        if self._model is None:
+            if not self.enabled:
+                raise RuntimeError("GAUGE_WEIGHTS is not set")
+            
+            import torch
+            from ultralytics import YOLO
+            
+            if settings.gauge_weights.endswith(".onnx"):
+                # ultralytics は onnxruntime がないと実行時にpipで入れようとするので、先に分かるエラーにする
+                try:
+                    import onnxruntime  # noqa: F401
+                except ImportError:
+                    raise RuntimeError("GAUGE_WEIGHTS is an ONNX model but onnxruntime is not installed (pip install onnxruntime)")
+            
+            if settings.gauge_num_threads > 0:
+                torch.set_num_threads(settings.gauge_num_threads)
+            
+            model = YOLO(settings.gauge_weights, task="pose")
+            dummy = np.zeros((settings.gauge_imgsz, settings.gauge_imgsz, 3), np.uint8)
+            model.predict(dummy, imgsz=settings.gauge_imgsz, device="cpu", verbose=False)
+            self._model = model
+        return self._model
+    
+    def get_model(self):
+        return self.load()
+    
+    def predict_batch(self, images):
+        """画像リストを1回のバッチ推論にかける（MicroBatcherから呼ばれる）"""
+        return predict_detections(self.get_model(), images, settings.gauge_imgsz, settings.gauge_conf_threshold)
+    
+    def get_batcher(self) -> MicroBatcher:
+        if self._batcher is None:
+            self._batcher = MicroBatcher(
+                self.predict_batch,
+                max_batch_size=settings.gauge_max_batch_size,
+                max_wait_ms=settings.gauge_max_wait_ms
+            )
+        return self._batcher
+
+
+gauge_model_manager = GaugeModelManager()
@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+class HedgedClient:
+    """ImageAnalysisClient.analyze のヘッジ（テールレイテンシ対策）
+
+    呼び出しが直近レイテンシの percentile を過ぎても返らなければ同じリクエストをもう1本送り、
+    先に成功した方を返す。ヘッジはトークンバケットで全呼び出しの max_fraction までに抑える
+    （1呼び出しごとに max_fraction トークン貯まり、ヘッジ1本で1消費）。
+    遅い方の呼び出しは止められないため、結果は捨てるがレイテンシの記録には使う。
+
+    待ち時間は呼び出しが実行を始めた時点から数える（スレッドプールの待ち行列の時間はAzureの遅さではない）。
+    空きスレッドがない時はヘッジしない（ヘッジも同じ待ち行列に並び、飽和時に重複呼び出しを増やすだけのため）。
+    """
+
+    def __init__(self, client, percentile: float = 95.0, max_fraction: float = 0.05,
+                 min_delay_ms: float = 200.0, window: int = 200, min_samples: int = 20,
+                 max_workers: int = 32, max_tokens: float = 10.0):
+        self._client = client
+        self.percentile = percentile
+        self.max_fraction = max_fraction
+        self.min_delay_ms = min_delay_ms
+        self.min_samples = min_samples
+        self.max_tokens = max_tokens
+
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ocr-hedge")
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)   # 成功した呼び出しのレイテンシ（ms）
+        self._tokens = 0.0
+        self._queued = 0    # submit済みで未実行の呼び出し
+        self._running = 0   # 実行中の呼び出し
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_denied = 0
+        self.backlog_skipped = 0
+
+    def delay_ms(self) -> Optional[float]:
+        """ヘッジまでの待ち時間。サンプル不足の間はヘッジしない（None）"""
+        with self._lock:
+            if not self._latencies or len(self._latencies) < self.min_samples:
+                return None
+            return max(self.min_delay_ms, float(np.percentile(self._latencies, self.percentile)))
+
+    def _submit(self, args, kwargs, started: Optional[threading.Event] = None):
+        with self._lock:
+            self._queued += 1
+        return self._executor.submit(self._timed_call, args, kwargs, started)
+
+    def _timed_call(self, args, kwargs, started: Optional[threading.Event] = None):
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+        if started is not None:
+            started.set()
+        t0 = time.perf_counter()
+        try:
+            result = self._client.analyze(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+        with self._lock:
+            self._latencies.append((time.perf_counter() - t0) * 1000.0)
+        return result
+
+    def _has_idle_worker(self) -> bool:
+        with self._lock:
+            if self._queued + self._running < self.max_workers:
+                return True
+            self.backlog_skipped += 1
+            return False
+
+    def _take_token(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                self.hedged += 1
+                return True
+            self.budget_denied += 1
+            return False
+
+    def analyze(self, *args, **kwargs):
+        delay = self.delay_ms()
+        with self._lock:
+            self.requests += 1
+            self._tokens = min(self.max_tokens, self._tokens + self.max_fraction)
+
+        started = threading.Event()
+        primary = self._submit(args, kwargs, started)
+        if delay is None:
+            return primary.result()
+        # 待ち行列にいる間は数えない（実行開始から delay 待つ）
+        started.wait()
+        done, _ = wait([primary], timeout=delay / 1000.0)
+        if done or not self._has_idle_worker() or not self._take_token():
+            return primary.result()
+
+        hedge = self._submit(args, kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        with self._lock:
+                            self.hedge_wins += 1
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        delay = self.delay_ms()
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hedged": self.hedged,
+                "unhedged": self.requests - self.hedged,
+                "hedge_wins": self.hedge_wins,
+                "budget_denied": self.budget_denied,
+                "backlog_skipped": self.backlog_skipped,
+                "in_flight": self._queued + self._running,
+                "delay_ms": delay,
+            }
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
@@ -0,0 +1,239 @@
+import http.client
+import ipaddress
+import json
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlparse
+
+from .config import settings
+
+
+class JobQueueFull(Exception):
+    """未完了ジョブが上限に達している（503 + Retry-After で返す）"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("job queue is full")
+        self.retry_after = retry_after
+
+
+class JobStore:
+    """非同期OCRジョブのプロセス内ストアとワーカープール
+
+    submit で即ジョブIDを返し、処理はワーカースレッドで行う。
+    完了したジョブは ttl_seconds 後に消える。callback_url があれば完了時に結果をPOSTする
+    （送信は専用のスレッドで行い、遅い受信側がジョブのワーカーを塞がないようにする）。
+    ワーカー数がジョブの同時実行数の上限（アドミッション制御とは別の予算）。
+    """
+
+    def __init__(self, workers: int = 4, max_pending: int = 100, ttl_seconds: float = 3600.0,
+                 callback_timeout_s: float = 10.0, callback_workers: int = 4):
+        self.max_pending = max_pending
+        self.ttl_seconds = ttl_seconds
+        self.callback_timeout_s = callback_timeout_s
+        self._workers = workers
+        self._callback_workers = max(1, callback_workers)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._callback_executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pending = 0
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="ocr-job")
+        return self._executor
+
+    def _callback_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._callback_executor is None:
+                self._callback_executor = ThreadPoolExecutor(max_workers=self._callback_workers,
+                                                             thread_name_prefix="ocr-callback")
+            return self._callback_executor
+
+    def _purge(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["finished_at"] is not None and now - job["finished_at"] > self.ttl_seconds]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, run: Callable[[], Dict[str, Any]], callback_url: Optional[str] = None) -> Dict[str, Any]:
+        """run() をワーカーで実行するジョブを登録する"""
+        with self._lock:
+            self._purge()
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(retry_after=max(1, self._pending // max(1, self._workers)))
+            job_id = uuid.uuid4().hex
+            job = {
+                "job_id": job_id,
+                "status": "queued",
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+                "callback_url": callback_url,
+                "callback_status": None,
+            }
+            self._jobs[job_id] = job
+            self._pending += 1
+        self._pool().submit(self._run, job_id, run)
+        return self.get(job_id)
+
+    def _run(self, job_id: str, run: Callable[[], Dict[str, Any]]):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["status"] = "running"
+            job["started_at"] = time.time()
+        try:
+            result = run()
+            status = "succeeded" if result.get("success") else "failed"
+        except Exception:
+            result = {
+                "success": False,
+                "error": {"code": "OCR_FAILED", "message": "OCR読み取りができませんでした。再度写真を撮って、お試しください"}
+            }
+            status = "failed"
+        with self._lock:
+            job["status"] = status
+            job["result"] = result
+            job["finished_at"] = time.time()
+            self._pending -= 1
+        if job["callback_url"]:
+            with self._lock:
+                job["callback_status"] = "pending"
+            self._callback_pool().submit(self._deliver, job)
+
+    def _deliver(self, job: Dict[str, Any]):
+        callback_status = self._post_callback(job["callback_url"], self.get(job["job_id"]))
+        with self._lock:
+            job["callback_status"] = callback_status
+
+    def _post_callback(self, url: str, payload: Dict[str, Any]) -> str:
+        # 登録時の検証後に許可リストが変わっていることもあるので送信直前にも確認する
+        # （宛先アドレスは接続時に確認する。_create_public_connection）
+        if not callback_allowed(url):
+            return "failed (not allowed)"
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"}, method="POST")
+        try:
+            with _callback_opener.open(req, timeout=self.callback_timeout_s) as resp:
+                return f"delivered ({resp.status})"
+        except urllib.error.HTTPError as e:
+            return f"failed (HTTP {e.code})"
+        except urllib.error.URLError as e:
+            if isinstance(e.reason, CallbackAddressNotAllowed):
+                return "failed (address not allowed)"
+            return f"failed ({type(e.reason).__name__})"
+        except Exception as e:
+            return f"failed ({type(e).__name__})"
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            self._purge()
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {k: v for k, v in job.items() if k != "callback_url"}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job["status"]] = counts.get(job["status"], 0) + 1
+            return {"pending": self._pending, "max_pending": self.max_pending, "jobs": counts}
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """リダイレクトは追わない（許可ホストから別のホストへ転送させない。3xxは HTTPError になる）"""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class CallbackAddressNotAllowed(OSError):
+    """コールバック先が許可しないアドレスに解決された"""
+
+
+class _PublicHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _create_public_connection
+
+
+class _PublicHTTPSConnection(http.client.HTTPSConnection):
+    # Hostヘッダ・SNI・証明書の検証は元のホスト名のまま（接続先だけ確認済みのアドレスにする）
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = _create_public_connection
+
+
+class _PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_PublicHTTPConnection, req)
+
+
+class _PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_PublicHTTPSConnection, req, context=self._context)
+
+
+# 環境変数のプロキシは使わない（プロキシ側で名前解決されるとアドレスを確認できない）
+_callback_opener = urllib.request.build_opener(
+    urllib.request.ProxyHandler({}), _NoRedirect, _PublicHTTPHandler, _PublicHTTPSHandler
+)
+
+
+def callback_allowed(url: str) -> bool:
+    """コールバック先の検証（http/httpsで、JOBS_CALLBACK_ALLOWED_HOSTS のホストのみ。未設定ならコールバック無効）"""
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        return False
+    return parsed.hostname in settings.jobs_callback_allowed_hosts()
+
+
+def _address_allowed(ip: str) -> bool:
+    """リンクローカル（クラウドのメタデータ等）・マルチキャスト・予約済み・未指定でないか
+
+    ループバック・プライベートアドレスは、許可リストに載せたホストなら内部の受信先として認める。
+    """
+    address = ipaddress.ip_address(ip.split("%")[0])
+    if address.version == 6 and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return not (address.is_link_local or address.is_multicast or address.is_reserved or address.is_unspecified)
+
+
+def _create_public_connection(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None):
+    """名前解決を1回だけ行い、全アドレスを確認してから、そのアドレスに直接接続する
+
+    確認と接続で別々に名前解決すると、DNSの応答を途中で内部アドレスに変えられる（DNSリバインディング）。
+    """
+    host, port = address
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM, proto=socket.IPPROTO_TCP)
+    except UnicodeError as e:
+        raise socket.gaierror(str(e))
+    if not infos or not all(_address_allowed(info[4][0]) for info in infos):
+        raise CallbackAddressNotAllowed(f"callback host {host} resolves to an address that is not allowed")
+    error = None
+    for info in infos:
+        try:
+            return socket.create_connection(info[4][:2], timeout, source_address)
+        except OSError as e:
+            error = e
+    raise error
+
+
+job_store = JobStore(
+    settings.jobs_workers,
+    settings.jobs_max_pending,
+    settings.jobs_ttl_seconds,
+    settings.jobs_callback_timeout_s,
+    settings.jobs_callback_workers
+)
@@ -0,0 +1,108 @@
+import cProfile
+import hmac
+import io
+import itertools
+import pathlib
+import pstats
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .config import settings
+
+PROFILE_HEADER = "x-debug-profile"
+TOKEN_HEADER = "x-debug-token"
+_NAME_RE = re.compile(r"^[0-9]{8}-[0-9]{6}-[0-9a-z_-]+\.prof$")
+
+
+class RequestProfiler:
+    """リクエスト単位のサンプリングプロファイラ（cProfile）
+
+    sample_every 件に1件、またはトークン付きの X-Debug-Profile ヘッダがあるリクエストを
+    process_image 全体（前処理エンジン・OpenCV呼び出しを含む）で計測し、directory に .prof を書く。
+    ファイルは max_files 件まで（古いものから削除）。無効時は判定1回だけで素通しする。
+    """
+
+    def __init__(self, sample_every: int = 0, directory: str = "/tmp/ocr-profiles",
+                 max_files: int = 50, token: str = ""):
+        self.sample_every = sample_every
+        self.directory = pathlib.Path(directory)
+        self.max_files = max_files
+        self.token = token
+        self._counter = itertools.count(1)
+        self._seq = itertools.count(1)
+        self._lock = threading.Lock()
+        self._running = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_every > 0 or bool(self.token)
+
+    def token_ok(self, value: Optional[str]) -> bool:
+        return bool(self.token) and value is not None and hmac.compare_digest(value.encode(), self.token.encode())
+
+    def should_profile(self, headers) -> bool:
+        if not self.enabled:
+            return False
+        if self.token_ok(headers.get(PROFILE_HEADER)):
+            return True
+        return self.sample_every > 0 and next(self._counter) % self.sample_every == 0
+
+    def run(self, label: str, fn: Callable[..., Any], *args, **kwargs):
+        """fn を計測しながら実行し、(戻り値, プロファイル名) を返す
+
+        cProfile はプロセス内で同時に1つしか有効にできない（Python 3.12以降）ため、
+        計測中に重なったリクエストは計測せずに実行する（プロファイル名はNone）。
+        """
+        if not self._running.acquire(blocking=False):
+            return fn(*args, **kwargs), None
+        profiler = cProfile.Profile()
+        t0 = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                profiler.disable()
+        finally:
+            self._running.release()
+        elapsed_ms = int((time.perf_counter() - t0) * 1000)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{label}-{next(self._seq)}-{elapsed_ms}ms.prof"
+        self._save(profiler, name)
+        return result, name
+
+    def _save(self, profiler: cProfile.Profile, name: str):
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(str(self.directory / name))
+            files = sorted(self.directory.glob("*.prof"), key=lambda p: p.stat().st_mtime)
+            for old in files[:max(0, len(files) - self.max_files)]:
+                old.unlink(missing_ok=True)
+
+    def list(self) -> List[Dict[str, Any]]:
+        if not self.directory.exists():
+            return []
+        files = sorted(self.directory.glob("*.prof"), key=lambda p: p.stat().st_mtime, reverse=True)
+        return [{"name": p.name, "bytes": p.stat().st_size, "created_at": p.stat().st_mtime} for p in files]
+
+    def path(self, name: str) -> Optional[pathlib.Path]:
+        """ファイル名を検証して実パスを返す（ディレクトリ外は参照させない）"""
+        if not _NAME_RE.match(name):
+            return None
+        path = self.directory / name
+        return path if path.is_file() else None
+
+    def summary(self, path: pathlib.Path, limit: int = 40, sort: str = "cumulative") -> str:
+        out = io.StringIO()
+        stats = pstats.Stats(str(path), stream=out)
+        stats.strip_dirs().sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+request_profiler = RequestProfiler(
+    settings.profile_sample_every,
+    settings.profile_dir,
+    settings.profile_max_files,
+    settings.profile_token
+)
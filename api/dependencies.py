@@ -1,6 +1,23 @@
+from fastapi import HTTPException
 from azure.ai.vision.imageanalysis import ImageAnalysisClient
 from .core.azure_client import azure_client_manager
+from .core.gauge_model import gauge_model_manager
 
 
 def get_azure_client() -> ImageAnalysisClient:
     return azure_client_manager.get_client()
+
+
+def get_gauge_batcher():
+    if not gauge_model_manager.enabled:
+        raise HTTPException(status_code=503, detail="Gauge model is not configured")
+    gauge_model_manager.load()
+    return gauge_model_manager.get_batcher()
+
+
+def get_optional_gauge_batcher():
+    """メーターモデル未設定ならNone（パネル読み取りではOCRだけ返す）"""
+    if not gauge_model_manager.enabled:
+        return None
+    gauge_model_manager.load()
+    return gauge_model_manager.get_batcher()
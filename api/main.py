@@ -1,8 +1,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .routers import ocr
+from .routers import ocr, gauge, panel, debug
 from .core.config import settings
+from .core.gauge_model import gauge_model_manager
+from .core.azure_client import azure_client_manager
+from .core.result_cache import ocr_result_cache
+from .core.admission import admission_controller
+from .core.jobs import job_store
 
 
 app = FastAPI(
@@ -20,6 +25,9 @@ app.add_middleware(
 )
 
 app.include_router(ocr.router, prefix="/api")
+app.include_router(gauge.router, prefix="/api")
+app.include_router(panel.router, prefix="/api")
+app.include_router(debug.router, prefix="/api")
 
 
 @app.get("/")
@@ -31,9 +39,25 @@ async def root():
 async def health_check():
     try:
         settings.validate()
-        return {"status": "healthy", "message": "API is running"}
     except Exception as e:
         return {"status": "unhealthy", "message": str(e)}
+    
+    # Azureへの呼び出しが遮断中なら縮退運転（キャッシュ済みの画像のみ応答）
+    circuit = azure_client_manager.breaker.state()
+    if circuit["state"] == "closed":
+        status, message = "healthy", "API is running"
+    else:
+        status, message = "degraded", "OCR backend circuit is " + circuit["state"]
+    hedging = azure_client_manager.hedging
+    return {
+        "status": status,
+        "message": message,
+        "ocr_backend": circuit,
+        "ocr_hedging": hedging.stats() if hedging is not None else None,
+        "ocr_cache": ocr_result_cache.stats(),
+        "admission": admission_controller.stats(),
+        "jobs": job_store.stats()
+    }
 
 
 @app.on_event("startup")
@@ -45,6 +69,20 @@ async def startup_event():
     except Exception as e:
         print(f"Configuration error: {e}")
         raise
+    if settings.ocr_reuse_buffers and settings.ocr_memory_budget:
+        print("Warning: OCR_REUSE_BUFFERS adds up to 128MB per running cascade on top of OCR_MEMORY_BUDGET")
+    
+    # 針メーターモデルはリクエスト毎ではなく起動時に1回だけロード
+    if gauge_model_manager.enabled:
+        gauge_model_manager.load()
+        await gauge_model_manager.get_batcher().start()
+        print("Gauge model loaded")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if gauge_model_manager.enabled:
+        await gauge_model_manager.get_batcher().stop()
 
 
 if __name__ == "__main__":
@@ -1,16 +1,153 @@
+import math
+
 from pydantic import BaseModel, validator
+from typing import Optional
+
+from scripts.ocr.preprocess.plans import plan_names
+from ..core.config import settings
+from ..core.jobs import callback_allowed
+
+MAX_CONTINUATION_TOKEN_LENGTH = 8192
+
+
+def _validate_image_base64(v):
+    if not v or not isinstance(v, str):
+        raise ValueError('image_base64 must be a non-empty string')
+    
+    # Base64形式の基本チェック
+    if not v.startswith('data:image/'):
+        raise ValueError('image_base64 must start with data:image/')
+    
+    return v
+
+
+def _validate_plan(v):
+    # cascade_plans.yml に定義された計画名のみ
+    if v is None:
+        return v
+    names = plan_names(settings.ocr_cascade_plans_file or None)
+    if v not in names:
+        raise ValueError(f'plan must be one of: {", ".join(names)}')
+    return v
+
+
+def _validate_continuation_token(v):
+    if v is not None and len(v) > MAX_CONTINUATION_TOKEN_LENGTH:
+        raise ValueError('continuation_token is too long')
+    return v
+
+
+def _validate_gauge_id(v):
+    # 設定ファイル名として使うため英数字・_・-のみ許可
+    if v is not None and (not v or not all(c.isalnum() or c in "_-" for c in v)):
+        raise ValueError('gauge_id must contain only letters, digits, "_" or "-"')
+    return v
 
 
 class MlApiRequest(BaseModel):
     image_base64: str
+    plan: Optional[str] = None
+    # 前回読み取れなかった時のレスポンスの continuation_token（撮り直し時）
+    continuation_token: Optional[str] = None
+    
+    @validator('image_base64')
+    def validate_base64(cls, v):
+        return _validate_image_base64(v)
+    
+    @validator('plan')
+    def validate_plan(cls, v):
+        return _validate_plan(v)
+    
+    @validator('continuation_token')
+    def validate_continuation_token(cls, v):
+        return _validate_continuation_token(v)
+
+
+class OcrJobRequest(BaseModel):
+    image_base64: str
+    plan: Optional[str] = None
+    continuation_token: Optional[str] = None
+    callback_url: Optional[str] = None
     
     @validator('image_base64')
     def validate_base64(cls, v):
-        if not v or not isinstance(v, str):
-            raise ValueError('image_base64 must be a non-empty string')
-        
-        # Base64形式の基本チェック
-        if not v.startswith('data:image/'):
-            raise ValueError('image_base64 must start with data:image/')
-        
+        return _validate_image_base64(v)
+    
+    @validator('plan')
+    def validate_plan(cls, v):
+        return _validate_plan(v)
+    
+    @validator('continuation_token')
+    def validate_continuation_token(cls, v):
+        return _validate_continuation_token(v)
+    
+    @validator('callback_url')
+    def validate_callback_url(cls, v):
+        if v is None:
+            return v
+        if not settings.jobs_callback_allowed_hosts():
+            raise ValueError('callback_url is disabled (JOBS_CALLBACK_ALLOWED_HOSTS is not set)')
+        if not callback_allowed(v):
+            raise ValueError('callback_url must be an http(s) URL on an allowed host')
+        return v
+
+
+class GaugeCalibration(BaseModel):
+    theta_min: float
+    theta_max: float
+    v_min: float
+    v_max: float
+    direction: str = "CW"
+    
+    @validator('theta_min', 'theta_max', 'v_min', 'v_max')
+    def validate_finite(cls, v):
+        if not math.isfinite(v):
+            raise ValueError('calibration values must be finite')
+        return v
+    
+    @validator('theta_max')
+    def validate_theta_span(cls, v, values):
+        # map_angle_to_value と同じく theta_max < theta_min なら360度足して幅を見る（幅0は換算できない）
+        theta_min = values.get('theta_min')
+        if theta_min is not None and (v + 360.0 if v < theta_min else v) == theta_min:
+            raise ValueError('theta_max must differ from theta_min (the calibrated arc is empty)')
         return v
+
+
+class GaugeReadRequest(BaseModel):
+    image_base64: str
+    gauge_id: Optional[str] = None
+    calibration: Optional[GaugeCalibration] = None
+    
+    @validator('image_base64')
+    def validate_base64(cls, v):
+        return _validate_image_base64(v)
+    
+    @validator('gauge_id')
+    def validate_gauge_id(cls, v):
+        return _validate_gauge_id(v)
+
+
+class PanelReadRequest(BaseModel):
+    """デジタル表示と針メーターが並んだパネルの写真（1枚でOCRとメーター読み取りを行う）"""
+    image_base64: str
+    gauge_id: Optional[str] = None
+    calibration: Optional[GaugeCalibration] = None
+    plan: Optional[str] = None
+    continuation_token: Optional[str] = None
+    
+    @validator('image_base64')
+    def validate_base64(cls, v):
+        return _validate_image_base64(v)
+    
+    @validator('gauge_id')
+    def validate_gauge_id(cls, v):
+        return _validate_gauge_id(v)
+    
+    @validator('plan')
+    def validate_plan(cls, v):
+        return _validate_plan(v)
+    
+    @validator('continuation_token')
+    def validate_continuation_token(cls, v):
+        return _validate_continuation_token(v)
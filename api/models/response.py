@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, Optional
 
 
 class MlApiResult(BaseModel):
@@ -10,6 +10,10 @@ class MlApiResult(BaseModel):
 class MlApiMetadata(BaseModel):
     total_lines_detected: int
     numeric_candidates: int
+    cached: bool = False
+    source: str = "azure"
+    plan: Optional[str] = None
+    resumed: bool = False
 
 
 class MlApiResponse(BaseModel):
@@ -17,6 +21,8 @@ class MlApiResponse(BaseModel):
     result: MlApiResult
     processing_time: float
     metadata: MlApiMetadata
+    # 読み取れなかった場合のみ。撮り直した画像と一緒に送ると、前回無駄だった前処理を飛ばして再開する
+    continuation_token: Optional[str] = None
 
 
 class ApiError(BaseModel):
@@ -27,3 +33,40 @@ class ApiError(BaseModel):
 class MlApiErrorResponse(BaseModel):
     success: bool = False
     error: ApiError
+
+
+class OcrJobResponse(BaseModel):
+    job_id: str
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    callback_status: Optional[str] = None
+
+
+class GaugeReadResult(BaseModel):
+    angle: float
+    value: Optional[float]
+    confidence: float
+    valid: bool
+
+
+class GaugeReadResponse(BaseModel):
+    success: bool
+    result: Optional[GaugeReadResult] = None
+    processing_time: float
+    error: Optional[ApiError] = None
+
+
+class PanelOcrReading(MlApiResponse):
+    error: Optional[ApiError] = None
+
+
+class PanelReadResponse(BaseModel):
+    # 片方だけ読めた場合も両方の結果を返す（success は両方読めた時のみ True）
+    success: bool
+    ocr: Optional[PanelOcrReading] = None
+    gauge: Optional[GaugeReadResponse] = None
+    processing_time: float
+    error: Optional[ApiError] = None
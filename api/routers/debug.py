@@ -0,0 +1,33 @@
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from ..core.profiling import request_profiler, TOKEN_HEADER
+
+
+router = APIRouter()
+
+
+def require_debug_token(request: Request):
+    """PROFILE_TOKEN 未設定なら存在しない扱い（404）、トークン不一致は403"""
+    if not request_profiler.token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not request_profiler.token_ok(request.headers.get(TOKEN_HEADER)):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+@router.get("/debug/profiles", dependencies=[Depends(require_debug_token)])
+async def list_profiles():
+    return {"profiles": request_profiler.list()}
+
+
+@router.get("/debug/profiles/{name}", dependencies=[Depends(require_debug_token)])
+async def get_profile(name: str, format: str = "prof", sort: str = "cumulative", limit: int = 40):
+    """format=prof で pstats ファイル（snakeviz 等で開く）、format=text で上位関数の一覧"""
+    path = request_profiler.path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "text":
+        if sort not in ("cumulative", "tottime", "ncalls"):
+            raise HTTPException(status_code=400, detail="sort must be cumulative, tottime or ncalls")
+        return PlainTextResponse(request_profiler.summary(path, limit, sort))
+    return FileResponse(str(path), media_type="application/octet-stream", filename=name)
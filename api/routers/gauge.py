@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends
+
+from ..models.request import GaugeReadRequest
+from ..models.response import GaugeReadResponse
+from ..services.gauge_service import GaugeService
+from ..dependencies import get_gauge_batcher
+
+
+router = APIRouter()
+
+
+def get_gauge_service(batcher=Depends(get_gauge_batcher)) -> GaugeService:
+    return GaugeService(batcher)
+
+
+@router.post("/gauge/read", response_model=GaugeReadResponse)
+async def read_gauge(
+    request: GaugeReadRequest,
+    gauge_service: GaugeService = Depends(get_gauge_service)
+):
+    calibration = request.calibration.dict() if request.calibration else None
+    return await gauge_service.process_image(request.image_base64, request.gauge_id, calibration)
@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+from starlette.requests import HTTPConnection
+from starlette.concurrency import run_in_threadpool
 from azure.ai.vision.imageanalysis import ImageAnalysisClient
 
-from ..models.request import MlApiRequest
-from ..models.response import MlApiResponse, MlApiErrorResponse
+from ..models.request import MlApiRequest, OcrJobRequest
+from ..models.response import MlApiResponse, MlApiErrorResponse, OcrJobResponse
 from ..services.ocr_service import OCRService
+from ..services.live_session import LiveSession
 from ..dependencies import get_azure_client
+from ..core.admission import admission_controller, AdmissionRejected
+from ..core.jobs import job_store, JobQueueFull
+from ..core.profiling import request_profiler
 
 
 router = APIRouter()
@@ -14,11 +21,96 @@ def get_ocr_service(azure_client: ImageAnalysisClient = Depends(get_azure_client
     return OCRService(azure_client)
 
 
-@router.post("/ocr/analyze", response_model=MlApiResponse)
+def client_key(http_request: HTTPConnection) -> str:
+    """公平制御用のクライアントキー（X-Client-Key ヘッダ、なければ接続元IP）。WebSocketでも同じ"""
+    key = http_request.headers.get("x-client-key")
+    if key:
+        return key
+    return http_request.client.host if http_request.client else "unknown"
+
+
+def overloaded_response(e) -> JSONResponse:
+    """AdmissionRejected / JobQueueFull を 503 + Retry-After に変換"""
+    return JSONResponse(
+        status_code=503,
+        content={
+            "success": False,
+            "error": {
+                "code": "SERVER_BUSY",
+                "message": "混雑しています。しばらくしてから、お試しください"
+            }
+        },
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+@router.post("/ocr/analyze", response_model=MlApiResponse,
+             responses={503: {"model": MlApiErrorResponse}})
 async def analyze_ocr(
     request: MlApiRequest,
+    http_request: Request,
+    response: Response,
     ocr_service: OCRService = Depends(get_ocr_service)
 ):
-    result = ocr_service.process_image(request.image_base64)
-    return result
+    # 同時実行数を超えた分は有界キューで待たせ、溢れたら即503（カスケードはスレッドプールで実行）
+    try:
+        async with admission_controller.slot(client_key(http_request)):
+            if not request_profiler.should_profile(http_request.headers):
+                return await run_in_threadpool(
+                    ocr_service.process_image, request.image_base64, request.plan, request.continuation_token
+                )
+            # サンプリング対象はスレッド内で丸ごと計測し、プロファイル名をヘッダで返す
+            result, profile = await run_in_threadpool(
+                request_profiler.run, "ocr-analyze", ocr_service.process_image,
+                request.image_base64, request.plan, request.continuation_token
+            )
+            if profile:
+                response.headers["X-Profile-Id"] = profile
+            return result
+    except AdmissionRejected as e:
+        return overloaded_response(e)
 
+
+
+@router.post("/ocr/jobs", response_model=OcrJobResponse, status_code=202,
+             responses={503: {"model": MlApiErrorResponse}})
+async def create_ocr_job(
+    request: OcrJobRequest,
+    ocr_service: OCRService = Depends(get_ocr_service)
+):
+    """カスケードをバックグラウンドで実行し、ジョブIDを即返す（結果は GET /ocr/jobs/{job_id} かコールバックで受け取る）"""
+    try:
+        return job_store.submit(
+            lambda: ocr_service.process_image(request.image_base64, request.plan, request.continuation_token),
+            request.callback_url
+        )
+    except JobQueueFull as e:
+        return overloaded_response(e)
+
+
+@router.get("/ocr/jobs/{job_id}", response_model=OcrJobResponse)
+async def get_ocr_job(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.websocket("/ocr/live")
+async def live_ocr(
+    websocket: WebSocket,
+    azure_client: ImageAnalysisClient = Depends(get_azure_client)
+):
+    """フレームはJPEG等のバイナリ、または {"image_base64": ...} のJSONで送る"""
+    await websocket.accept()
+    session = LiveSession(azure_client, client_key(websocket))
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            result = await session.process_message(message)
+            if result is not None:
+                await websocket.send_json(result)
+    except WebSocketDisconnect:
+        pass
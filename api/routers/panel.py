@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, Request
+from azure.ai.vision.imageanalysis import ImageAnalysisClient
+
+from ..models.request import PanelReadRequest
+from ..models.response import PanelReadResponse, MlApiErrorResponse
+from ..services.ocr_service import OCRService
+from ..services.gauge_service import GaugeService
+from ..services.panel_service import PanelService
+from ..dependencies import get_azure_client, get_optional_gauge_batcher
+from ..core.admission import admission_controller, AdmissionRejected
+from .ocr import client_key, overloaded_response
+
+
+router = APIRouter()
+
+
+def get_panel_service(
+    azure_client: ImageAnalysisClient = Depends(get_azure_client),
+    batcher=Depends(get_optional_gauge_batcher)
+) -> PanelService:
+    gauge_service = GaugeService(batcher) if batcher is not None else None
+    return PanelService(OCRService(azure_client), gauge_service)
+
+
+@router.post("/panel/read", response_model=PanelReadResponse,
+             responses={503: {"model": MlApiErrorResponse}})
+async def read_panel(
+    request: PanelReadRequest,
+    http_request: Request,
+    panel_service: PanelService = Depends(get_panel_service)
+):
+    """デジタル表示と針メーターを1回のアップロードで読む（片方だけ読めた場合も両方の結果を返す）"""
+    calibration = request.calibration.dict() if request.calibration else None
+    try:
+        async with admission_controller.slot(client_key(http_request)):
+            return await panel_service.process_image(
+                request.image_base64, request.gauge_id, calibration, request.plan, request.continuation_token
+            )
+    except AdmissionRejected as e:
+        return overloaded_response(e)
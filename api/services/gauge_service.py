@@ -0,0 +1,87 @@
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+import numpy as np
+import yaml
+from starlette.concurrency import run_in_threadpool
+
+from scripts.gauge import MicroBatcher, read_batch
+from ..core.config import settings
+from ..utils.image_processing import decode_base64_image, decode_image_array
+
+
+@lru_cache(maxsize=64)
+def load_calibration(gauge_id: Optional[str]) -> Dict[str, Any]:
+    """gauge_config.yml形式のキャリブレーションを読み込み（gauge_idごとにキャッシュ）"""
+    if gauge_id:
+        path = Path(settings.gauge_config_dir) / f"{gauge_id}.yml"
+    elif settings.gauge_default_config:
+        path = Path(settings.gauge_default_config)
+    else:
+        raise FileNotFoundError("No gauge calibration configured")
+
+    with open(path, "r") as f:
+        return yaml.safe_load(f)
+
+
+class GaugeService:
+
+    def __init__(self, batcher: MicroBatcher):
+        self.batcher = batcher
+
+    async def process_image(self, image_base64: str, gauge_id: Optional[str] = None,
+                            calibration: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        start_time = time.time()
+
+        try:
+            image = await run_in_threadpool(lambda: decode_image_array(decode_base64_image(image_base64)))
+        except ValueError:
+            return self._error("INVALID_IMAGE", "画像の形式が不正です。再度写真を撮って、お試しください", start_time)
+        return await self.read_array(image, gauge_id, calibration, start_time)
+
+    async def read_array(self, image: np.ndarray, gauge_id: Optional[str] = None,
+                         calibration: Optional[Dict[str, Any]] = None,
+                         start_time: Optional[float] = None) -> Dict[str, Any]:
+        """デコード済みの画像（BGR）で読み取る"""
+        start_time = start_time or time.time()
+
+        try:
+            calib = calibration or load_calibration(gauge_id)
+
+            # 同時リクエストとまとめてバッチ推論
+            detections = await self.batcher.submit(image)
+            readings = read_batch([detections], settings.gauge_conf_threshold, calib)
+
+            if not readings["has_det"][0]:
+                return self._error("GAUGE_NOT_DETECTED", "針を検出できませんでした。再度写真を撮って、お試しください", start_time)
+
+            return {
+                "success": True,
+                "result": {
+                    "angle": float(readings["angle"][0]),
+                    "value": float(readings["value"][0]),
+                    "confidence": float(readings["score"][0]),
+                    "valid": bool(readings["valid"][0])
+                },
+                "processing_time": time.time() - start_time
+            }
+
+        except ValueError:
+            return self._error("INVALID_IMAGE", "画像の形式が不正です。再度写真を撮って、お試しください", start_time)
+        except (FileNotFoundError, KeyError):
+            return self._error("CALIBRATION_NOT_FOUND", "メーターの設定が見つかりません", start_time)
+        except Exception:
+            return self._error("GAUGE_FAILED", "メーターの読み取りができませんでした。再度写真を撮って、お試しください", start_time)
+
+    def _error(self, code: str, message: str, start_time: float) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "error": {
+                "code": code,
+                "message": message
+            },
+            "processing_time": time.time() - start_time,
+            "result": None
+        }
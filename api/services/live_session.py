@@ -0,0 +1,141 @@
+import json
+import time
+from typing import Dict, Any, Optional
+
+from azure.ai.vision.imageanalysis import ImageAnalysisClient
+from starlette.concurrency import run_in_threadpool
+
+from scripts.ocr.single_image_ocr import analyze_single_image
+from scripts.ocr.change_detection import ChangeDetector
+from scripts.ocr.image_io import decode_bounded
+from scripts.ocr.preprocess.plans import get_plan
+from ..core.config import settings
+from ..core.circuit_breaker import CircuitOpenError
+from ..core.admission import admission_controller, AdmissionRejected
+from ..utils.image_processing import decode_base64_image, check_image_bytes
+
+
+class LiveSession:
+    """WebSocket接続ごとの状態（前回のROI・採用プリセット・読み取り値・フレームハッシュ）
+
+    表示が変わっていないフレームはOCRせず、読み取り値が変わった時だけ結果を返す。
+    OCRするフレームは /ocr/analyze と同じアドミッション枠を取り、取れなければ SERVER_BUSY を返してフレームを捨てる。
+    """
+
+    def __init__(self, azure_client: ImageAnalysisClient, client_key: str = "unknown"):
+        self.azure_client = azure_client
+        self.client_key = client_key
+        self.detector = ChangeDetector(settings.live_hash_threshold, settings.live_max_skip)
+        # 計画は最初にOCRするフレームで解決する（設定の誤りはエラー応答にする）
+        self.plan: Optional[Dict[str, Any]] = None
+        self.last_stage: Optional[Dict[str, Any]] = None
+        self.last_text: Optional[str] = None
+        self.frames = 0
+        self.deduplicated = 0
+        self.ocr_calls = 0
+        self.busy = 0
+
+    async def process_message(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """WebSocketメッセージ（バイナリ画像 または {"image_base64": ...} のJSON）を1フレームとして処理
+
+        送信すべき結果があれば返し、なければNone。
+        """
+        start_time = time.time()
+        self.frames += 1
+        max_decode_pixels, max_variant_pixels = settings.ocr_pixel_limits()
+
+        try:
+            if message.get("bytes") is not None:
+                image_bytes = check_image_bytes(message["bytes"])
+            else:
+                image_bytes = decode_base64_image(json.loads(message["text"])["image_base64"])
+            image, _ = await run_in_threadpool(decode_bounded, image_bytes, max_decode_pixels)
+            if image is None:
+                raise ValueError("Invalid image format")
+        except (ValueError, KeyError, TypeError):
+            return self._error("INVALID_IMAGE", "画像の形式が不正です", start_time)
+
+        # フレーム全体のハッシュ・ROI抽出はイベントループを止めないようスレッドで行う
+        need_ocr, _ = await run_in_threadpool(self.detector.check, image)
+        if not need_ocr:
+            self.deduplicated += 1
+            return None
+
+        try:
+            if self.plan is None:
+                self.plan = get_plan(settings.ocr_cascade_plan or None, settings.ocr_cascade_plans_file or None)
+            async with admission_controller.slot(self.client_key):
+                # 前回採用されたステージ（ROI・プリセット・スケール）から試す。デコード済みのフレームを渡す
+                result, analysis = await run_in_threadpool(
+                    analyze_single_image, self.azure_client, image_bytes, True, self.last_stage,
+                    max_decode_pixels, max_variant_pixels, image,
+                    local_first=settings.ocr_local_seven_segment,
+                    local_threshold=settings.ocr_local_threshold,
+                    reuse_buffers=settings.ocr_reuse_buffers,
+                    plan=self.plan,
+                    similar_distance=settings.ocr_similar_distance()
+                )
+        except AdmissionRejected as e:
+            # このフレームは捨てる（比較基準は更新しないので、次の変化フレームでOCRする）
+            self.busy += 1
+            response = self._error("SERVER_BUSY", "混雑しています。しばらくしてから、お試しください", start_time)
+            response["retry_after"] = e.retry_after
+            return response
+        except CircuitOpenError:
+            return self._error("OCR_UNAVAILABLE", "OCRサービスが一時的に利用できません", start_time)
+        except ConnectionError:
+            return self._error("NETWORK_ERROR", "ネットワークエラーが発生しました", start_time)
+        except Exception:
+            return self._error("OCR_FAILED", "OCR読み取りができませんでした", start_time)
+
+        preprocessing = analysis["preprocessing"]
+        self.ocr_calls += preprocessing["attempts"]
+        numeric_results = analysis["numeric"]
+        text = numeric_results[0]["normalized"] if numeric_results else ""
+
+        stage = preprocessing.get("final_stage")
+        local = preprocessing.get("local") or {}
+        if stage is not None:
+            self.last_stage = stage
+        # 採用ステージ（またはローカル認識）のROIがあればその領域で、なければ検出したROIで次フレームと比較
+        roi = stage.get("roi") if stage else (local.get("roi") if local.get("accepted") else None)
+        await run_in_threadpool(self.detector.update, image, roi)
+
+        if text == self.last_text:
+            return None
+        self.last_text = text
+
+        return {
+            "success": True,
+            "result": {
+                "text_normalized": text,
+                "preprocessing_attempts": preprocessing["attempts"]
+            },
+            "processing_time": time.time() - start_time,
+            "metadata": {
+                "total_lines_detected": len(result["lines"]),
+                "numeric_candidates": len(numeric_results),
+                "source": "local" if local.get("accepted") else "azure"
+            },
+            "session": self.stats()
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "frames": self.frames,
+            "deduplicated": self.deduplicated,
+            "ocr_calls": self.ocr_calls,
+            "busy": self.busy
+        }
+
+    def _error(self, code: str, message: str, start_time: float) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "error": {
+                "code": code,
+                "message": message
+            },
+            "processing_time": time.time() - start_time,
+            "result": None,
+            "session": self.stats()
+        }
@@ -1,9 +1,16 @@
 import time
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+import numpy as np
 from azure.ai.vision.imageanalysis import ImageAnalysisClient
 
 # 既存のOCR処理モジュールを活用
 from scripts.ocr.single_image_ocr import analyze_single_image
+from scripts.ocr.preprocess.plans import get_plan, plan_names
+from ..core.config import settings
+from ..core.circuit_breaker import CircuitOpenError
+from ..core.result_cache import ocr_result_cache
+from ..core.continuation import continuation_tokens
 from ..utils.image_processing import decode_base64_image
 from ..models.response import MlApiResponse, MlApiResult, MlApiMetadata
 
@@ -13,16 +20,64 @@ class OCRService:
     def __init__(self, azure_client: ImageAnalysisClient):
         self.azure_client = azure_client
     
-    def process_image(self, image_base64: str) -> Dict[str, Any]:
+    def process_image(self, image_base64: str, plan: Optional[str] = None,
+                      continuation_token: Optional[str] = None) -> Dict[str, Any]:
+        """plan: カスケード計画名（Noneなら継続トークンの計画 → OCR_CASCADE_PLAN → YAMLの default）
+        continuation_token: 前回読み取れなかった時のトークン（不正・期限切れなら無視して最初から試す）
+        """
         start_time = time.time()
-        
         try:
             image_bytes = decode_base64_image(image_base64)
+        except ValueError:
+            return self._error("INVALID_IMAGE", "画像の形式が不正です。再度写真を撮って、お試しください", start_time)
+        return self.process_bytes(image_bytes, None, plan, continuation_token, start_time)
+    
+    def process_bytes(self, image_bytes: bytes, image: Optional[np.ndarray] = None, plan: Optional[str] = None,
+                      continuation_token: Optional[str] = None, start_time: Optional[float] = None) -> Dict[str, Any]:
+        """デコード済みの画像バイト列（image: 呼び出し側でデコード済みの画像。指定時は再デコードしない）"""
+        start_time = start_time or time.time()
+        
+        try:
+            plans_file = settings.ocr_cascade_plans_file or None
+            resume = continuation_tokens.verify(continuation_token) if continuation_token else None
+            if not plan and resume and resume.get("plan") in plan_names(plans_file):
+                plan = resume["plan"]
+            cascade_plan = get_plan(plan or settings.ocr_cascade_plan or None, plans_file)
+        except Exception:
+            # 計画ファイル・OCR_CASCADE_PLAN の誤り（通常は起動時の settings.validate() で止まる）
+            return self._error("OCR_FAILED", "OCR読み取りができませんでした。しばらくしてから、お試しください", start_time)
+        
+        try:
+            # 同じ画像の結果はキャッシュから返す（Azure障害時の縮退運転も兼ねる）
+            cache_key = ocr_result_cache.key(image_bytes)
+            cached = ocr_result_cache.get(cache_key)
+            if cached is not None:
+                return {
+                    **cached,
+                    "processing_time": time.time() - start_time,
+                    "metadata": {**cached["metadata"], "cached": True}
+                }
+            
+            # サーキットが開いていればカスケードを回さずに即失敗
+            # （ローカル認識が有効ならそちらで読める可能性があるので先に試す）
+            breaker = getattr(self.azure_client, "breaker", None)
+            if breaker is not None and not settings.ocr_local_seven_segment:
+                breaker.fail_fast()
             
+            max_decode_pixels, max_variant_pixels = settings.ocr_pixel_limits()
             result, analysis = analyze_single_image(
-                self.azure_client, 
-                image_bytes, 
-                use_preprocessing=True
+                self.azure_client,
+                image_bytes,
+                use_preprocessing=True,
+                max_decode_pixels=max_decode_pixels,
+                max_variant_pixels=max_variant_pixels,
+                image=image,
+                local_first=settings.ocr_local_seven_segment,
+                local_threshold=settings.ocr_local_threshold,
+                reuse_buffers=settings.ocr_reuse_buffers,
+                plan=cascade_plan,
+                similar_distance=settings.ocr_similar_distance(),
+                resume=resume
             )
             
             processing_time = time.time() - start_time
@@ -30,7 +85,7 @@ class OCRService:
             numeric_results = analysis["numeric"]
             best_result = numeric_results[0]["normalized"] if numeric_results else ""
             
-            return {
+            response = {
                 "success": True,
                 "result": {
                     "text_normalized": best_result,
@@ -39,63 +94,44 @@ class OCRService:
                 "processing_time": processing_time,
                 "metadata": {
                     "total_lines_detected": len(result["lines"]),
-                    "numeric_candidates": len(numeric_results)
+                    "numeric_candidates": len(numeric_results),
+                    "source": "local" if analysis["preprocessing"]["attempts"] == 0 else "azure",
+                    "plan": cascade_plan["name"],
+                    "resumed": resume is not None
                 }
             }
-            
+            if best_result:
+                ocr_result_cache.put(cache_key, response)
+            preprocessing = analysis["preprocessing"]
+            if not preprocessing["accepted"] and preprocessing["resume"] is not None:
+                # 撮り直し用（キャッシュには含めない）
+                response = {**response, "continuation_token": continuation_tokens.issue(preprocessing["resume"])}
+            return response
+        
         except ValueError as e:
-            processing_time = time.time() - start_time
-            return {
-                "success": False,
-                "error": {
-                    "code": "INVALID_IMAGE",
-                    "message": "画像の形式が不正です。再度写真を撮って、お試しください"
-                },
-                "processing_time": processing_time,
-                "result": {
-                    "text_normalized": "",
-                    "preprocessing_attempts": 0
-                },
-                "metadata": {
-                    "total_lines_detected": 0,
-                    "numeric_candidates": 0
-                }
-            }
+            return self._error("INVALID_IMAGE", "画像の形式が不正です。再度写真を撮って、お試しください", start_time)
+        except CircuitOpenError as e:
+            return self._error("OCR_UNAVAILABLE", "OCRサービスが一時的に利用できません。しばらくしてから、お試しください", start_time)
         except ConnectionError as e:
-            processing_time = time.time() - start_time
-            return {
-                "success": False,
-                "error": {
-                    "code": "NETWORK_ERROR",
-                    "message": "ネットワークエラーが発生しました。再度お試しください"
-                },
-                "processing_time": processing_time,
-                "result": {
-                    "text_normalized": "",
-                    "preprocessing_attempts": 0
-                },
-                "metadata": {
-                    "total_lines_detected": 0,
-                    "numeric_candidates": 0
-                }
-            }
+            return self._error("NETWORK_ERROR", "ネットワークエラーが発生しました。再度お試しください", start_time)
         except Exception as e:
-            processing_time = time.time() - start_time
             error_code = "AZURE_API_ERROR" if "InvalidRequest" in str(e) or "InvalidImageSize" in str(e) else "OCR_FAILED"
-            
-            return {
-                "success": False,
-                "error": {
-                    "code": error_code,
-                    "message": "OCR読み取りができませんでした。再度写真を撮って、お試しください"
-                },
-                "processing_time": processing_time,
-                "result": {
-                    "text_normalized": "",
-                    "preprocessing_attempts": 0
-                },
-                "metadata": {
-                    "total_lines_detected": 0,
-                    "numeric_candidates": 0
-                }
+            return self._error(error_code, "OCR読み取りができませんでした。再度写真を撮って、お試しください", start_time)
+    
+    def _error(self, code: str, message: str, start_time: float) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "error": {
+                "code": code,
+                "message": message
+            },
+            "processing_time": time.time() - start_time,
+            "result": {
+                "text_normalized": "",
+                "preprocessing_attempts": 0
+            },
+            "metadata": {
+                "total_lines_detected": 0,
+                "numeric_candidates": 0
             }
+        }
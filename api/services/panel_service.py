@@ -0,0 +1,82 @@
+import asyncio
+import time
+from typing import Dict, Any, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from scripts.ocr.image_io import decode_bounded
+from ..core.config import settings
+from ..utils.image_processing import decode_base64_image
+from .ocr_service import OCRService
+from .gauge_service import GaugeService
+
+
+class PanelService:
+    """1枚の写真からデジタル表示（OCR）と針メーターを読む
+
+    画像のデコードは1回だけ行い、OCRカスケード（スレッドプール）とメーターの推論（マイクロバッチ）を並行に実行する。
+    """
+
+    def __init__(self, ocr_service: OCRService, gauge_service: Optional[GaugeService]):
+        self.ocr_service = ocr_service
+        self.gauge_service = gauge_service
+
+    async def process_image(self, image_base64: str, gauge_id: Optional[str] = None,
+                            calibration: Optional[Dict[str, Any]] = None, plan: Optional[str] = None,
+                            continuation_token: Optional[str] = None) -> Dict[str, Any]:
+        start_time = time.time()
+
+        try:
+            image_bytes, image = await run_in_threadpool(self._decode, image_base64)
+        except ValueError:
+            return self._error("INVALID_IMAGE", "画像の形式が不正です。再度写真を撮って、お試しください", start_time)
+
+        # 同じ配列を両方に渡す（どちらも入力画像は書き換えない）
+        ocr_task = run_in_threadpool(
+            self.ocr_service.process_bytes, image_bytes, image, plan, continuation_token, start_time
+        )
+        if self.gauge_service is None:
+            ocr = await ocr_task
+            gauge = self._gauge_unavailable(start_time)
+        else:
+            ocr, gauge = await asyncio.gather(
+                ocr_task, self.gauge_service.read_array(image, gauge_id, calibration, start_time)
+            )
+
+        return {
+            "success": ocr["success"] and gauge["success"],
+            "ocr": ocr,
+            "gauge": gauge,
+            "processing_time": time.time() - start_time
+        }
+
+    def _decode(self, image_base64: str):
+        """(画像バイト列, BGR画像)。メモリ上限モードではOCRと同じ上限で縮小デコード"""
+        image_bytes = decode_base64_image(image_base64)
+        image, _ = decode_bounded(image_bytes, settings.ocr_pixel_limits()[0])
+        if image is None:
+            raise ValueError("Invalid image data")
+        return image_bytes, image
+
+    def _gauge_unavailable(self, start_time: float) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "error": {
+                "code": "GAUGE_UNAVAILABLE",
+                "message": "メーターの読み取りは設定されていません"
+            },
+            "processing_time": time.time() - start_time,
+            "result": None
+        }
+
+    def _error(self, code: str, message: str, start_time: float) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "error": {
+                "code": code,
+                "message": message
+            },
+            "processing_time": time.time() - start_time,
+            "ocr": None,
+            "gauge": None
+        }
@@ -2,6 +2,8 @@ import base64
 import cv2
 import numpy as np
 
+MAX_IMAGE_BYTES = 20 * 1024 * 1024
+
 
 def decode_base64_image(image_base64: str) -> bytes:
     
@@ -13,7 +15,12 @@ def decode_base64_image(image_base64: str) -> bytes:
     except Exception as e:
         raise ValueError(f"Invalid base64 format: {e}")
     
-    if len(image_bytes) > 20 * 1024 * 1024:
+    return check_image_bytes(image_bytes)
+
+
+def check_image_bytes(image_bytes: bytes) -> bytes:
+    """サイズ上限と画像形式の確認（base64以外で受け取った画像にも使う）"""
+    if len(image_bytes) > MAX_IMAGE_BYTES:
         raise ValueError("Image size exceeds 20MB limit")
     
     if not validate_image_format(image_bytes):
@@ -22,12 +29,21 @@ def decode_base64_image(image_base64: str) -> bytes:
     return image_bytes
 
 
+# 先頭バイトで判定できる画像形式（JPEG, PNG, GIF, BMP, TIFF, WebP）
+_IMAGE_SIGNATURES = (b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n", b"GIF87a", b"GIF89a", b"BM", b"II*\x00", b"MM\x00*")
+
+
 def validate_image_format(image_bytes: bytes) -> bool:
-    try:
-        img_array = np.frombuffer(image_bytes, np.uint8)
-        image = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-        return image is not None
-    except:
-        return False
+    # 検証のためだけに全体をデコードしない（壊れた画像は後段のデコードでValueErrorになる）
+    if image_bytes[:4] == b"RIFF" and image_bytes[8:12] == b"WEBP":
+        return True
+    return image_bytes.startswith(_IMAGE_SIGNATURES)
+
 
 
+
+def decode_image_array(image_bytes: bytes) -> np.ndarray:
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Invalid image format")
+    return image
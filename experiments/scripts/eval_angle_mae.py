@@ -1,27 +1,16 @@
-import argparse, json, csv, math, os, glob
+# 使い方（experiments/ から）: python -m scripts.eval_angle_mae --config config/eval_config.yml [--backend onnx --weights best.onnx]
+import argparse, json, csv, math, os, glob, time
 from pathlib import Path
 import cv2
 import yaml
-from ultralytics import YOLO
 
-def angle_deg(pivot_xy, tip_xy):
-    dx = tip_xy[0] - pivot_xy[0]
-    dy = tip_xy[1] - pivot_xy[1]
-    ang = math.degrees(math.atan2(-dy,dx))
-    return (ang + 360.0) % 360.0
-
-def circ_abs_diff_deg(a, b):
-    return abs(((a - b + 180.0) % 360.0) - 180.0)
+from scripts.gauge import read_batch, angle_deg, circ_abs_diff_deg
+from scripts.gauge.backends import load_backend, iter_backend_batches, InferenceTimer, peak_rss_mb
 
 def read_eval_cfg(path):
     with open(path, "r") as f:
         return yaml.safe_load(f)
 
-def load_image_size(img_path):
-    img = cv2.imread(img_path)
-    h, w = img.shape[: 2]
-    return w, h, img
-
 def read_gt_kpts(label_path, img_w, img_h):
     with open(label_path) as f:
         for line in f:
@@ -36,86 +25,26 @@ def read_gt_kpts(label_path, img_w, img_h):
                 return (x1, y1, v1), (x2, y2, v2)
     return None, None
 
-def pick_best_det(result, conf_thres):
-    if result.keypoints is None or len(result.keypoints) == 0:
-        return None
-    kpts = result.keypoints  # ultralytics.engine.results.Keypoints
-    # xy normalized if available; prefer xyn then scale outside
-    xyn = getattr(kpts, "xyn", None)
-    xy = getattr(kpts, "xy", None)
-    conf = getattr(kpts, "confidence", None) or getattr(kpts, "conf", None)
-    # boxes conf fallback
-    boxes_conf = getattr(result.boxes, "conf", None) if result.boxes is not None else None
-
-    best_idx, best_score = None, -1.0
-    n = len(kpts)
-    for i in range(n):
-        # use KP conf avg of first two points if present
-        kp_score = 0.0
-        if conf is not None:
-            try:
-                c0 = float(conf[i][0].item())
-                c1 = float(conf[i][1].item())
-                kp_score = (c0 + c1) / 2.0
-            except Exception:
-                kp_score = 0.0
-        box_score = 0.0
-        if boxes_conf is not None and i < len(boxes_conf):
-            try:
-                box_score = float(boxes_conf[i].item())
-            except Exception:
-                box_score = 0.0
-        score = 0.7 * kp_score + 0.3 * box_score
-        if score > best_score:
-            best_score = score
-            best_idx = i
-
-    # confidence gate for validity
-    valid = True
-    c0 = c1 = 1.0
-    if conf is not None:
-        try:
-            c0 = float(conf[best_idx][0].item())
-            c1 = float(conf[best_idx][1].item())
-        except Exception:
-            pass
-    if (c0 < conf_thres) or (c1 < conf_thres):
-        valid = False
-
-    # return structure with xy normalized or absolute
-    return {
-        "idx": best_idx,
-        "valid": valid,
-        "use_xyn": xyn is not None,
-        "xyn": xyn,
-        "xy": xy,
-        "conf_pair": (c0, c1),
-    }
-
-def to_pixels_from_result(best, img_w, img_h):
-    i = best["idx"]
-    if best["use_xyn"]:
-        tp = best["xyn"][i][0].tolist()  # [x, y]
-        pv = best["xyn"][i][1].tolist()
-        tip_xy = (tp[0] * img_w, tp[1] * img_h)
-        pivot_xy = (pv[0] * img_w, pv[1] * img_h)
-    else:
-        tp = best["xy"][i][0].tolist()
-        pv = best["xy"][i][1].tolist()
-        pivot_xy = (pv[0], pv[1])
-        tip_xy = (tp[0], tp[1])
-    return pivot_xy, tip_xy
-
+FIELDNAMES = ["filename", "angle_gt", "angle_pred", "angle_err_deg", "valid", "gt_visible"]
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--config", required=True)
+    # 以下は設定ファイルの値を上書き（バックエンド比較用）
+    ap.add_argument("--backend", choices=["auto", "ultralytics", "onnx"], default=None)
+    ap.add_argument("--weights", default=None)
+    ap.add_argument("--out-dir", default=None)
     args = ap.parse_args()
     cfg = read_eval_cfg(args.config)
+    for key in ("backend", "weights", "out_dir"):
+        if getattr(args, key) is not None:
+            cfg[key] = getattr(args, key)
 
     imgsz = int(cfg.get("imgsz", 640))
     conf_thres = float(cfg.get("conf_threshold", 0.5))
+    batch_size = int(cfg.get("batch_size", 16))
     weights = cfg["weights"]
+    backend_kind = cfg.get("backend", "auto")
     test_images = cfg["test_images"]
     test_labels = cfg["test_labels"]
     out_dir = Path(cfg["out_dir"])
@@ -125,68 +54,80 @@ def main():
     if do_viz:
         viz_dir.mkdir(parents=True, exist_ok=True)
 
-    model = YOLO(weights)
+    t0 = time.perf_counter()
+    backend = load_backend(backend_kind, weights, imgsz, conf_thres)
+    model_load_s = time.perf_counter() - t0
+    timer = InferenceTimer()
     img_paths = sorted(glob.glob(str(Path(test_images) / "*.*")))
-    preds = model.predict(img_paths, imgsz=imgsz, conf=conf_thres, verbose=False)
-
-    rows = []
-    valid_errors = []
-    for img_path, r in zip(img_paths, preds):
-        stem = Path(img_path).stem
-        label_path = Path(test_labels) / f"{stem}.txt"
-        img_w, img_h, img = load_image_size(img_path)
-
-        gt_pv, gt_tp = read_gt_kpts(str(label_path), img_w, img_h)
-        angle_gt, gt_visible = None, True
-        if gt_pv and gt_tp:
-            angle_gt = angle_deg((gt_pv[0], gt_pv[1]), (gt_tp[0], gt_tp[1]))
-            gt_visible = (gt_pv[2] > 0) and (gt_tp[2] > 0)
-
-        best = pick_best_det(r, conf_thres)
-        angle_pred, valid = None, False
-        if best is not None:
-            pv_xy, tp_xy = to_pixels_from_result(best, img_w, img_h)
-            angle_pred = angle_deg(pv_xy, tp_xy)
-            valid = best["valid"]
-
-        err = None
-        if (angle_gt is not None) and (angle_pred is not None):
-            err = circ_abs_diff_deg(angle_pred, angle_gt)
-            if valid:
-                valid_errors.append(err)
-
-        rows.append({
-            "filename": Path(img_path).name,
-            "angle_gt": angle_gt if angle_gt is not None else "",
-            "angle_pred": angle_pred if angle_pred is not None else "",
-            "angle_err_deg": err if err is not None else "",
-            "valid": int(valid),
-            "gt_visible": int(gt_visible),
-        })
-
-        if do_viz and (angle_gt is not None or angle_pred is not None):
-            canvas = img.copy()
-            if angle_gt is not None:
-                cv2.arrowedLine(canvas, (int(gt_pv[0]), int(gt_pv[1])), (int(gt_tp[0]), int(gt_tp[1])), (0,255,0), 2, tipLength=0.15)
-            if angle_pred is not None:
-                cv2.arrowedLine(canvas, (int(pv_xy[0]), int(pv_xy[1])), (int(tp_xy[0]), int(tp_xy[1])), (255,0,255), 2, tipLength=0.15)
-            cv2.imwrite(str(viz_dir / f"{stem}.jpg"), canvas)
-
-    # CSV
+
+    # CSVは1行ずつ書き出し、集計は逐次更新
+    num_samples, num_valid, err_sum = 0, 0, 0.0
     csv_path = out_dir / "angle_results.csv"
     with open(csv_path, "w", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
         writer.writeheader()
-        writer.writerows(rows)
+
+        for chunk, images, dets in iter_backend_batches(backend, img_paths, batch_size, timer):
+            # バッチ内の全検出をまとめてスコアリング・角度計算
+            readings = read_batch(dets, conf_thres)
+
+            for j, (img_path, image) in enumerate(zip(chunk, images)):
+                stem = Path(img_path).stem
+                label_path = Path(test_labels) / f"{stem}.txt"
+                img_h, img_w = image.shape[:2]
+
+                gt_pv, gt_tp = read_gt_kpts(str(label_path), img_w, img_h)
+                angle_gt, gt_visible = None, True
+                if gt_pv and gt_tp:
+                    angle_gt = float(angle_deg((gt_pv[0], gt_pv[1]), (gt_tp[0], gt_tp[1])))
+                    gt_visible = (gt_pv[2] > 0) and (gt_tp[2] > 0)
+
+                angle_pred, valid = None, False
+                if readings["has_det"][j]:
+                    pv_xy, tp_xy = readings["pivot"][j], readings["tip"][j]
+                    angle_pred = float(readings["angle"][j])
+                    valid = bool(readings["valid"][j])
+
+                err = None
+                if (angle_gt is not None) and (angle_pred is not None):
+                    err = float(circ_abs_diff_deg(angle_pred, angle_gt))
+                    if valid:
+                        num_valid += 1
+                        err_sum += err
+
+                num_samples += 1
+                writer.writerow({
+                    "filename": Path(img_path).name,
+                    "angle_gt": angle_gt if angle_gt is not None else "",
+                    "angle_pred": angle_pred if angle_pred is not None else "",
+                    "angle_err_deg": err if err is not None else "",
+                    "valid": int(valid),
+                    "gt_visible": int(gt_visible),
+                })
+
+                if do_viz and (angle_gt is not None or angle_pred is not None):
+                    # 推論時にデコード済みの元画像をそのまま使う
+                    canvas = image.copy()
+                    if angle_gt is not None:
+                        cv2.arrowedLine(canvas, (int(gt_pv[0]), int(gt_pv[1])), (int(gt_tp[0]), int(gt_tp[1])), (0,255,0), 2, tipLength=0.15)
+                    if angle_pred is not None:
+                        cv2.arrowedLine(canvas, (int(pv_xy[0]), int(pv_xy[1])), (int(tp_xy[0]), int(tp_xy[1])), (255,0,255), 2, tipLength=0.15)
+                    cv2.imwrite(str(viz_dir / f"{stem}.jpg"), canvas)
 
     # Summary
     summary = {
-        "mae_deg": sum(valid_errors)/len(valid_errors) if valid_errors else None,
-        "num_samples": len(rows),
-        "num_valid": len(valid_errors),
-        "valid_ratio": (len(valid_errors)/len(rows)) if rows else 0.0,
+        "mae_deg": err_sum/num_valid if num_valid else None,
+        "num_samples": num_samples,
+        "num_valid": num_valid,
+        "valid_ratio": (num_valid/num_samples) if num_samples else 0.0,
         "conf_threshold": conf_thres,
-        "imgsz": imgsz
+        "imgsz": imgsz,
+        "batch_size": batch_size,
+        "backend": backend.name,
+        "weights": str(weights),
+        "model_load_s": model_load_s,
+        "infer_ms_per_image": timer.ms_per_image(),
+        "peak_rss_mb": peak_rss_mb()
     }
     with open(out_dir / "angle_summary.json", "w") as f:
         json.dump(summary, f, indent=2, ensure_ascii=False)
@@ -194,4 +135,4 @@ def main():
     print(json.dumps(summary, indent=2, ensure_ascii=False))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,24 @@
+# scripts/gauge/__init__.py
+"""針メーター読み取りモジュール"""
+
+from .reading import (
+    Detections,
+    detections_from_result,
+    predict_detections,
+    read_batch,
+    angle_deg,
+    circ_abs_diff_deg,
+    map_angle_to_value,
+)
+from .batching import MicroBatcher
+
+__all__ = [
+    "Detections",
+    "detections_from_result",
+    "predict_detections",
+    "read_batch",
+    "angle_deg",
+    "circ_abs_diff_deg",
+    "map_angle_to_value",
+    "MicroBatcher",
+]
@@ -0,0 +1,162 @@
+# scripts/gauge/backends.py
+"""推論バックエンド（ultralytics/PyTorch と ONNX Runtime）
+
+どちらも predict(images) -> List[Detections] の同じ形で結果を返すため、
+read_batch 以降の処理はバックエンドに依存しない。
+"""
+import os, sys, time
+from typing import List, Sequence, Tuple
+import cv2
+import numpy as np
+
+from .reading import Detections, predict_detections
+
+NUM_KEYPOINTS = 2
+NMS_IOU = 0.7
+MAX_DET = 300   # ultralyticsの既定値
+
+
+def letterbox(image: np.ndarray, imgsz: int) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """ultralyticsと同じレターボックス（アスペクト維持・灰色114で中央パディング）"""
+    h, w = image.shape[:2]
+    r = min(imgsz / h, imgsz / w)
+    new_w, new_h = int(round(w * r)), int(round(h * r))
+    pad_w, pad_h = (imgsz - new_w) / 2.0, (imgsz - new_h) / 2.0
+
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR) if (new_w, new_h) != (w, h) else image
+    top, bottom = int(round(pad_h - 0.1)), int(round(pad_h + 0.1))
+    left, right = int(round(pad_w - 0.1)), int(round(pad_w + 0.1))
+    padded = cv2.copyMakeBorder(resized, top, bottom, left, right, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return padded, r, (left, top)
+
+
+def preprocess_batch(images: Sequence[np.ndarray], imgsz: int):
+    """BGR画像リスト → (B,3,imgsz,imgsz) float32テンソルと逆変換パラメータ"""
+    tensor = np.empty((len(images), 3, imgsz, imgsz), np.float32)
+    params = []
+    for i, img in enumerate(images):
+        padded, r, pad = letterbox(img, imgsz)
+        # BGR→RGB, HWC→CHW, 0〜1
+        tensor[i] = padded[:, :, ::-1].transpose(2, 0, 1) * (1.0 / 255.0)
+        params.append((r, pad))
+    return tensor, params
+
+
+class UltralyticsBackend:
+    name = "ultralytics"
+
+    def __init__(self, weights: str, imgsz: int = 640, conf_thres: float = 0.5):
+        from ultralytics import YOLO
+        self.model = YOLO(weights, task="pose")
+        self.imgsz = imgsz
+        self.conf_thres = conf_thres
+
+    def predict(self, images: Sequence[np.ndarray]) -> List[Detections]:
+        return predict_detections(self.model, images, self.imgsz, self.conf_thres)
+
+
+class OnnxPoseBackend:
+    """ONNX Runtime（CPU）でYOLO-poseを推論し、NMS・座標復元まで行う"""
+    name = "onnx"
+
+    def __init__(self, weights: str, imgsz: int = 640, conf_thres: float = 0.5, num_threads: int = 0):
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        if num_threads > 0:
+            opts.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(weights, sess_options=opts, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+        # 静的shapeでエクスポートされたモデルはバッチ1固定
+        batch_dim = self.session.get_inputs()[0].shape[0]
+        self.fixed_batch = batch_dim if isinstance(batch_dim, int) else None
+        self.imgsz = imgsz
+        self.conf_thres = conf_thres
+
+    def predict(self, images: Sequence[np.ndarray]) -> List[Detections]:
+        if not images:
+            return []
+        if self.fixed_batch == 1 and len(images) > 1:
+            return [d for img in images for d in self.predict([img])]
+
+        tensor, params = preprocess_batch(images, self.imgsz)
+        output = self.session.run(None, {self.input_name: tensor})[0]
+        return [self._decode(output[i], r, pad, img.shape[:2]) for i, ((r, pad), img) in enumerate(zip(params, images))]
+
+    def _decode(self, out: np.ndarray, r: float, pad: Tuple[float, float], shape: Tuple[int, int]) -> Detections:
+        k3 = NUM_KEYPOINTS * 3
+        if out.shape[0] < out.shape[1]:
+            # 生出力 (4+nc+K*3, anchors): xywh中心・クラススコア・キーポイント
+            pred = out.T
+            nc = pred.shape[1] - 4 - k3
+            scores = pred[:, 4:4 + nc].max(axis=1)
+            keep = scores >= self.conf_thres
+            pred, scores = pred[keep], scores[keep]
+            xywh = pred[:, :4]
+            boxes = np.concatenate([xywh[:, :2] - xywh[:, 2:] / 2.0, xywh[:, 2:]], axis=1)
+            idx = cv2.dnn.NMSBoxes(boxes.tolist(), scores.tolist(), self.conf_thres, NMS_IOU, top_k=MAX_DET)
+            idx = np.asarray(idx, dtype=np.int64).reshape(-1)
+            kpts = pred[idx, 4 + nc:].reshape(-1, NUM_KEYPOINTS, 3)
+            scores = scores[idx]
+        else:
+            # NMS込みのend2end出力 (N, 6+K*3): x1y1x2y2・スコア・クラス・キーポイント
+            pred = out[out[:, 4] >= self.conf_thres]
+            kpts = pred[:, 6:6 + k3].reshape(-1, NUM_KEYPOINTS, 3)
+            scores = pred[:, 4]
+
+        # レターボックス座標 → 元画像座標
+        xy = (kpts[:, :, :2] - np.array(pad, np.float32)) / r
+        # ultralyticsと同様に画像範囲へクリップ
+        np.clip(xy[..., 0], 0, shape[1], out=xy[..., 0])
+        np.clip(xy[..., 1], 0, shape[0], out=xy[..., 1])
+        return Detections(xy.astype(np.float32), kpts[:, :, 2].astype(np.float32), scores.astype(np.float32))
+
+
+def load_backend(kind: str, weights: str, imgsz: int = 640, conf_thres: float = 0.5):
+    """--backend 指定からバックエンドを生成（onnxは拡張子 .onnx の重みが必要）"""
+    if kind == "auto":
+        kind = "onnx" if str(weights).endswith(".onnx") else "ultralytics"
+    if kind == "onnx":
+        return OnnxPoseBackend(weights, imgsz, conf_thres, num_threads=int(os.getenv("ORT_NUM_THREADS", "0")))
+    if kind == "ultralytics":
+        return UltralyticsBackend(weights, imgsz, conf_thres)
+    raise ValueError(f"unknown backend: {kind}")
+
+
+def iter_backend_batches(backend, img_paths: List[str], batch_size: int, timer=None):
+    """batch_size枚ずつ読み込み（各画像1回だけデコード）→推論し、(パス, 画像, Detections)のリストを返す
+
+    timer を渡すと推論時間（秒）と枚数を timer(elapsed, n) で通知する。
+    """
+    for start in range(0, len(img_paths), batch_size):
+        chunk = img_paths[start:start + batch_size]
+        images = [cv2.imread(p) for p in chunk]
+        ok = [i for i, im in enumerate(images) if im is not None]
+        chunk = [chunk[i] for i in ok]
+        images = [images[i] for i in ok]
+        t0 = time.perf_counter()
+        dets = backend.predict(images)
+        if timer is not None:
+            timer(time.perf_counter() - t0, len(images))
+        yield chunk, images, dets
+
+
+def peak_rss_mb() -> float:
+    """プロセスの最大常駐メモリ[MB]（Linuxはru_maxrssがKB、macOSはバイト）"""
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+
+class InferenceTimer:
+    """iter_backend_batches の timer に渡して推論時間を集計"""
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.images = 0
+
+    def __call__(self, elapsed: float, n: int):
+        self.seconds += elapsed
+        self.images += n
+
+    def ms_per_image(self):
+        return self.seconds * 1000.0 / self.images if self.images else None
@@ -0,0 +1,115 @@
+# scripts/gauge/batching.py
+"""動的マイクロバッチング（同時リクエストをまとめて1回のバッチ推論に流す）"""
+import asyncio
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class MicroBatcher:
+    """最大 max_batch_size 件 / 最大 max_wait_ms ミリ秒のどちらか早い方でバッチを締める
+
+    predict_fn はリスト入力・同じ長さのリスト出力の同期関数。
+    イベントループを塞がないようスレッドプールで実行する。
+    stop() 時点で未完了のリクエスト（推論中・待機中）は例外で終わらせる。
+    """
+
+    def __init__(self, predict_fn: Callable[[List[Any]], List[Any]], max_batch_size: int = 8, max_wait_ms: float = 10.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # 収集中・推論中のバッチ（停止時に未完了のまま残さないため）
+        self._current: List[Tuple[Any, asyncio.Future]] = []
+        self._stopped = False
+        self.batches = 0
+        self.items = 0
+
+    async def start(self):
+        self._stopped = False
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopped = True
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        pending = self._current
+        self._current = []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        self._fail(pending, RuntimeError("MicroBatcher stopped"))
+
+    async def submit(self, item: Any) -> Any:
+        """1件投入し、バッチ推論後の自分の結果を待つ"""
+        if self._stopped:
+            raise RuntimeError("MicroBatcher stopped")
+        if self._worker is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    @staticmethod
+    def _fail(batch, error: Exception):
+        for _, fut in batch:
+            if not fut.done():
+                fut.set_exception(error)
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        batch = self._current = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # 既に溜まっている分は待たずに取る
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # 待機中に切断されたリクエストは推論しない
+        self._current = [(item, fut) for item, fut in batch if not fut.cancelled()]
+        return self._current
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            items = [item for item, _ in batch]
+            try:
+                results = await loop.run_in_executor(None, self.predict_fn, items)
+                if len(results) != len(items):
+                    # 結果と入力の対応が取れないので、バッチ全体を失敗にする
+                    raise ValueError(f"predict_fn returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                self._current = []
+                self._fail(batch, e)
+                continue
+            # 推論中に stop() でキャンセルされた場合は _current を残し、stop() 側で失敗させる
+            self._current = []
+            self.batches += 1
+            self.items += len(items)
+            for (_, fut), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
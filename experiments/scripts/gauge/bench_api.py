@@ -0,0 +1,153 @@
+# scripts/gauge/bench_api.py
+"""/api/gauge/read の応答チェックとCPUレイテンシ計測（小さな2キーポイントモデルをローカル生成）
+
+学習済み重みなしで再現できるよう、yolo11n-pose を kpt_shape=[2, 3]（回転中心・針先）にした
+未学習モデルを固定シードで生成し、それを GAUGE_WEIGHTS にしたAPIをプロセス内で起動して叩く。
+- 応答形式（success, result.angle/value/confidence/valid）
+- 角度が同じ画像の直接推論（predict_detections → read_batch）と一致するか
+- 値がリクエストのキャリブレーションで角度から換算されているか（map_angle_to_value）
+--assert-p95-ms を指定すると、p95レイテンシが超えた場合に終了コード1で失敗する。
+
+使い方（experiments/ から）:
+    python -m scripts.gauge.bench_api --requests 30 --assert-p95-ms 400
+    python -m scripts.gauge.bench_api --weights best.pt --imgsz 640
+"""
+import os, sys, json, time, base64, shutil, pathlib, argparse, tempfile
+
+import cv2
+import numpy as np
+
+ROOT = pathlib.Path(__file__).resolve().parents[3]
+
+# 2キーポイント・1クラスの小さなポーズモデル
+KPT_SHAPE = [2, 3]
+CALIBRATION = {"theta_min": 45.0, "theta_max": 315.0, "v_min": -20.0, "v_max": 120.0, "direction": "CW"}
+
+def export_tiny_model(out_dir: pathlib.Path, seed: int = 0) -> pathlib.Path:
+    """yolo11n-pose の構成をkpt_shapeだけ変えて生成し .pt に保存（重みは固定シードの初期値）"""
+    import torch, yaml
+    from ultralytics import YOLO
+    from ultralytics.utils import ROOT as ULTRALYTICS_ROOT
+
+    cfg = yaml.safe_load(open(ULTRALYTICS_ROOT / "cfg/models/11/yolo11-pose.yaml", "r"))
+    cfg["kpt_shape"] = KPT_SHAPE
+    # ファイル名の "n" でスケールが決まる
+    cfg_path = out_dir / "yolo11n-gauge.yaml"
+    cfg_path.write_text(yaml.safe_dump(cfg))
+    torch.manual_seed(seed)
+    weights = out_dir / "gauge-tiny.pt"
+    YOLO(str(cfg_path), task="pose").save(str(weights))
+    return weights
+
+def synthetic_gauge(angle: float, size: int = 480) -> np.ndarray:
+    """文字盤と指定角度の針を描いたメーター画像"""
+    img = np.full((size, size, 3), 235, np.uint8)
+    c = size // 2
+    r = int(size * 0.4)
+    cv2.circle(img, (c, c), r, (40, 40, 40), 4)
+    for a in np.arange(CALIBRATION["theta_min"], CALIBRATION["theta_max"] + 1, 27):
+        rad = np.radians(a)
+        p0 = (int(c + 0.85 * r * np.cos(rad)), int(c - 0.85 * r * np.sin(rad)))
+        p1 = (int(c + r * np.cos(rad)), int(c - r * np.sin(rad)))
+        cv2.line(img, p0, p1, (40, 40, 40), 3)
+    rad = np.radians(angle)
+    tip = (int(c + 0.8 * r * np.cos(rad)), int(c - 0.8 * r * np.sin(rad)))
+    cv2.line(img, (c, c), tip, (0, 0, 200), 6)
+    cv2.circle(img, (c, c), 12, (30, 30, 30), -1)
+    return img
+
+def check_response(body, expected) -> list:
+    """応答形式と、直接推論・キャリブレーション換算との一致を確認（問題点のリスト）"""
+    from scripts.gauge import map_angle_to_value
+
+    problems = []
+    if not body.get("success"):
+        return [f"success=false: {body.get('error')}"]
+    result = body.get("result") or {}
+    for key, kind in (("angle", float), ("value", float), ("confidence", float), ("valid", bool)):
+        if not isinstance(result.get(key), (kind, int) if kind is float else kind):
+            problems.append(f"result.{key} missing or not {kind.__name__}")
+    if problems:
+        return problems
+    if not 0.0 <= result["angle"] < 360.0:
+        problems.append(f"angle out of range: {result['angle']}")
+    if abs(result["angle"] - expected["angle"]) > 1e-3:
+        problems.append(f"angle {result['angle']:.4f} != direct inference {expected['angle']:.4f}")
+    mapped = float(map_angle_to_value(result["angle"], CALIBRATION))
+    if abs(result["value"] - mapped) > 1e-6:
+        problems.append(f"value {result['value']:.4f} != calibrated {mapped:.4f}")
+    return problems
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--weights", default=None, help="使う重み（未指定なら小さな未学習モデルを生成）")
+    ap.add_argument("--imgsz", type=int, default=640, help="GAUGE_IMGSZ（APIの既定は640）")
+    ap.add_argument("--requests", type=int, default=30, help="計測するリクエスト数（ウォームアップ後）")
+    ap.add_argument("--threads", type=int, default=0, help="torchのスレッド数（0なら既定）")
+    ap.add_argument("--assert-p95-ms", type=float, default=None, help="p95レイテンシ[ms]の許容値")
+    args = ap.parse_args()
+
+    tmp = pathlib.Path(tempfile.mkdtemp(prefix="gauge-bench-"))
+    weights = args.weights or str(export_tiny_model(tmp))
+
+    # 設定は api の import 時に読まれるので先に環境変数を入れる（未学習モデルは信頼度が低いので閾値0）
+    os.environ.update({
+        "GAUGE_WEIGHTS": weights,
+        "GAUGE_IMGSZ": str(args.imgsz),
+        "GAUGE_CONF_THRESHOLD": "0.0" if not args.weights else os.environ.get("GAUGE_CONF_THRESHOLD", "0.5"),
+        "GAUGE_NUM_THREADS": str(args.threads),
+    })
+    os.environ.setdefault("VISION_ENDPOINT", "http://127.0.0.1:9")   # Azureは呼ばない
+    os.environ.setdefault("VISION_KEY", "unused")
+    sys.path[:0] = [str(ROOT), str(ROOT / "experiments")]
+
+    from fastapi.testclient import TestClient
+    from api.main import app
+    from api.core.config import settings
+    from api.core.gauge_model import gauge_model_manager
+    from scripts.gauge import predict_detections, read_batch
+
+    angles = [60.0, 135.0, 200.0, 290.0]
+    images = [cv2.imencode(".jpg", synthetic_gauge(a), [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes() for a in angles]
+    payloads = [{"image_base64": "data:image/jpeg;base64," + base64.b64encode(b).decode("ascii"),
+                 "calibration": CALIBRATION} for b in images]
+
+    problems = []
+    latencies = []
+    with TestClient(app) as client:
+        model = gauge_model_manager.get_model()
+        for angle, jpeg, payload in zip(angles, images, payloads):
+            decoded = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+            dets = predict_detections(model, [decoded], settings.gauge_imgsz, settings.gauge_conf_threshold)
+            direct = read_batch(dets, settings.gauge_conf_threshold, CALIBRATION)
+            body = client.post("/api/gauge/read", json=payload).json()
+            expected = {"angle": float(direct["angle"][0])}
+            problems += [f"needle {angle:.0f}deg: {p}" for p in check_response(body, expected)]
+
+        for i in range(args.requests):
+            t0 = time.perf_counter()
+            response = client.post("/api/gauge/read", json=payloads[i % len(payloads)])
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            if response.status_code != 200:
+                problems.append(f"HTTP {response.status_code}")
+
+    report = {
+        "weights": "tiny (generated)" if not args.weights else weights,
+        "imgsz": args.imgsz,
+        "requests": len(latencies),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "max_ms": float(np.max(latencies)),
+        "problems": problems,
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    shutil.rmtree(tmp, ignore_errors=True)
+    failed = bool(problems)
+    if args.assert_p95_ms is not None and report["p95_ms"] > args.assert_p95_ms:
+        print(f"FAIL: p95 {report['p95_ms']:.0f} ms > {args.assert_p95_ms:.0f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# scripts/gauge/bench_batching.py
+"""マイクロバッチングのスループット／レイテンシ比較ベンチマーク
+
+使い方（experiments/ から）:
+    python -m scripts.gauge.bench_batching --weights best.pt --images data/images/test \\
+        --concurrency 16 --batch-sizes 1,4,8,16 --wait-ms 0,5,10,20
+"""
+import argparse, asyncio, glob, json, time
+from pathlib import Path
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+from .batching import MicroBatcher
+from .reading import predict_detections
+
+async def run_config(predict_fn, images, concurrency, requests_per_client, batch_size, wait_ms):
+    batcher = MicroBatcher(predict_fn, max_batch_size=batch_size, max_wait_ms=wait_ms)
+    await batcher.start()
+    latencies = []
+
+    async def client(cid):
+        for k in range(requests_per_client):
+            img = images[(cid * requests_per_client + k) % len(images)]
+            t = time.perf_counter()
+            await batcher.submit(img)
+            latencies.append((time.perf_counter() - t) * 1000.0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    await batcher.stop()
+
+    lat = np.array(latencies)
+    return {
+        "max_batch_size": batch_size,
+        "max_wait_ms": wait_ms,
+        "throughput_rps": len(lat) / elapsed,
+        "latency_p50_ms": float(np.percentile(lat, 50)),
+        "latency_p95_ms": float(np.percentile(lat, 95)),
+        "mean_batch_size": batcher.stats()["mean_batch_size"],
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--weights", required=True)
+    ap.add_argument("--images", required=True, help="入力画像ディレクトリ")
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--conf-threshold", type=float, default=0.5)
+    ap.add_argument("--concurrency", type=int, default=16, help="同時クライアント数")
+    ap.add_argument("--requests-per-client", type=int, default=8)
+    ap.add_argument("--batch-sizes", default="1,4,8,16")
+    ap.add_argument("--wait-ms", default="0,5,10,20")
+    args = ap.parse_args()
+
+    images = [cv2.imread(p) for p in sorted(glob.glob(str(Path(args.images) / "*.*")))]
+    images = [im for im in images if im is not None]
+    if not images:
+        raise SystemExit(f"no images in {args.images}")
+
+    model = YOLO(args.weights, task="pose")
+    predict_fn = lambda batch: predict_detections(model, batch, args.imgsz, args.conf_threshold)
+    predict_fn(images[:1])  # ウォームアップ
+
+    rows = []
+    for b in (int(x) for x in args.batch_sizes.split(",")):
+        # batch=1は待つ意味がないので待ち時間0のみ
+        for w in ([0.0] if b == 1 else [float(x) for x in args.wait_ms.split(",")]):
+            rows.append(asyncio.run(run_config(predict_fn, images, args.concurrency, args.requests_per_client, b, w)))
+            print(json.dumps(rows[-1]))
+
+    base = rows[0]
+    for r in rows:
+        r["throughput_x"] = r["throughput_rps"] / base["throughput_rps"]
+        r["added_p50_ms"] = r["latency_p50_ms"] - base["latency_p50_ms"]
+    print(json.dumps(rows, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# scripts/gauge/compare_backends.py
+"""推論バックエンド比較（角度MAE・推論レイテンシ・メモリ・ロード時間）
+
+各モデルを別プロセスで eval_angle_mae に通すため、ピークメモリは互いに干渉しない。
+
+使い方（experiments/ から）:
+    python -m scripts.gauge.compare_backends --config config/eval_config.yml \\
+        --models best.pt,best.onnx,best_int8.onnx --out-dir eval/backends
+"""
+import argparse, json, subprocess, sys
+from pathlib import Path
+
+COLUMNS = ["backend", "weights", "mae_deg", "valid_ratio", "infer_ms_per_image", "peak_rss_mb", "model_load_s"]
+
+def run_eval(config: str, weights: str, out_dir: Path):
+    cmd = [sys.executable, "-m", "scripts.eval_angle_mae", "--config", config,
+           "--backend", "auto", "--weights", weights, "--out-dir", str(out_dir)]
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    with open(out_dir / "angle_summary.json", "r") as f:
+        return json.load(f)
+
+def fmt(v):
+    if isinstance(v, float):
+        return f"{v:.3f}"
+    return "-" if v is None else str(v)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--config", required=True, help="eval_angle_mae用の設定ファイル")
+    ap.add_argument("--models", required=True, help="比較する重み（カンマ区切り、.pt/.onnx）")
+    ap.add_argument("--out-dir", required=True)
+    args = ap.parse_args()
+
+    out_root = Path(args.out_dir); out_root.mkdir(parents=True, exist_ok=True)
+    rows = []
+    for i, weights in enumerate(w for w in args.models.split(",") if w):
+        summary = run_eval(args.config, weights, out_root / f"{i:02d}_{Path(weights).stem}")
+        summary["weights"] = Path(weights).name
+        rows.append({c: summary.get(c) for c in COLUMNS})
+
+    with open(out_root / "backend_comparison.json", "w") as f:
+        json.dump(rows, f, indent=2, ensure_ascii=False)
+
+    # Markdown表で出力
+    print("| " + " | ".join(COLUMNS) + " |")
+    print("|" + "---|" * len(COLUMNS))
+    for row in rows:
+        print("| " + " | ".join(fmt(row[c]) for c in COLUMNS) + " |")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# scripts/gauge/export_onnx.py
+"""best.pt → ONNX エクスポート（オプションでINT8静的量子化）
+
+INT8はテスト画像でキャリブレーションする（QDQ形式、CPU実行向け）。
+
+使い方（experiments/ から）:
+    python -m scripts.gauge.export_onnx --weights best.pt --imgsz 640
+    python -m scripts.gauge.export_onnx --weights best.pt --int8 --calib-images data/images/test --calib-size 64
+"""
+import argparse, glob, json
+from pathlib import Path
+import cv2
+
+from .backends import preprocess_batch
+
+def export_fp32(weights: str, imgsz: int, opset: int) -> Path:
+    """ultralyticsのエクスポータでONNX化（バッチ次元は可変）"""
+    from ultralytics import YOLO
+    path = YOLO(weights, task="pose").export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True, opset=opset)
+    return Path(path)
+
+class ImageCalibrationReader:
+    """onnxruntime.quantization 用のキャリブレーションデータ（1枚ずつ推論時と同じ前処理）"""
+
+    def __init__(self, input_name: str, img_paths, imgsz: int):
+        self.input_name = input_name
+        self.img_paths = list(img_paths)
+        self.imgsz = imgsz
+        self._it = iter(self.img_paths)
+
+    def get_next(self):
+        for p in self._it:
+            img = cv2.imread(p)
+            if img is None:
+                continue
+            tensor, _ = preprocess_batch([img], self.imgsz)
+            return {self.input_name: tensor}
+        return None
+
+    def rewind(self):
+        self._it = iter(self.img_paths)
+
+def head_decode_nodes(model_path: Path):
+    """ヘッド（最終モジュール）の座標デコード部分のノード名
+
+    xywh（ピクセル単位）とスコア（0〜1）が同じテンソルに連結されるため、
+    ここを量子化するとスコアが0に潰れる。畳み込み以外は浮動小数のまま残す。
+    """
+    import onnx
+    nodes = onnx.load(str(model_path)).graph.node
+    head = "/".join(nodes[-1].name.split("/")[:2]) + "/"   # 例: "/model.23/"
+    return [n.name for n in nodes if n.name.startswith(head) and (n.op_type != "Conv" or "/dfl/" in n.name)]
+
+def quantize_int8(fp32_path: Path, calib_paths, imgsz: int) -> Path:
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    # 量子化前にシェイプ推論・グラフ最適化を済ませておく（推奨手順）
+    prep_path = fp32_path.with_name(fp32_path.stem + "_prep.onnx")
+    quant_pre_process(str(fp32_path), str(prep_path), skip_symbolic_shape=True)
+
+    input_name = ort.InferenceSession(str(prep_path), providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    int8_path = fp32_path.with_name(fp32_path.stem + "_int8.onnx")
+    quantize_static(
+        str(prep_path), str(int8_path),
+        ImageCalibrationReader(input_name, calib_paths, imgsz),
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=True,
+        calibrate_method=CalibrationMethod.MinMax,
+        nodes_to_exclude=head_decode_nodes(prep_path),
+    )
+    prep_path.unlink(missing_ok=True)
+    return int8_path
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--weights", required=True, help="学習済みbest.pt")
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--opset", type=int, default=17)
+    ap.add_argument("--int8", action="store_true", help="INT8静的量子化モデルも出力")
+    ap.add_argument("--calib-images", default=None, help="キャリブレーション画像ディレクトリ（--int8時に必須）")
+    ap.add_argument("--calib-size", type=int, default=64, help="キャリブレーションに使う枚数")
+    args = ap.parse_args()
+
+    fp32_path = export_fp32(args.weights, args.imgsz, args.opset)
+    outputs = {"fp32": str(fp32_path), "fp32_mb": fp32_path.stat().st_size / 1e6}
+
+    if args.int8:
+        if not args.calib_images:
+            raise SystemExit("--int8 には --calib-images が必要です")
+        calib_paths = sorted(glob.glob(str(Path(args.calib_images) / "*.*")))[:args.calib_size]
+        if not calib_paths:
+            raise SystemExit(f"キャリブレーション画像がありません: {args.calib_images}")
+        int8_path = quantize_int8(fp32_path, calib_paths, args.imgsz)
+        outputs.update({"int8": str(int8_path), "int8_mb": int8_path.stat().st_size / 1e6, "calib_images": len(calib_paths)})
+
+    print(json.dumps(outputs, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
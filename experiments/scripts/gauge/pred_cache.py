@@ -0,0 +1,102 @@
+# scripts/gauge/pred_cache.py
+"""推論結果キャッシュ（最低閾値で全検出を保存し、閾値・キャリブレーションの変更時は再推論しない）
+
+キャッシュは重みファイルのハッシュ・imgsz・画像リストごとに1つの .npz。
+NMSは信頼度の高い順に処理するため、低閾値で得た検出を後から box_conf で絞り込むと
+その閾値で推論した結果と一致する（max_det 上限に達した場合を除く）。
+"""
+import hashlib
+from pathlib import Path
+from typing import List
+import numpy as np
+
+from .reading import Detections
+from .backends import iter_backend_batches, load_backend
+
+CACHE_CONF = 0.001   # キャッシュ作成時の推論閾値
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def cache_path(cache_dir: str, weights: str, imgsz: int, img_paths: List[str]) -> Path:
+    # 画像リストが変わったら別キャッシュ
+    names = hashlib.sha256("\n".join(Path(p).name for p in img_paths).encode("utf-8")).hexdigest()
+    return Path(cache_dir) / f"preds_{file_sha256(weights)[:16]}_{imgsz}_{names[:8]}.npz"
+
+
+class PredictionCache:
+    """画像ごとの検出を連結配列で保持（counts で画像境界を表す）"""
+
+    def __init__(self, names, shapes, counts, kp_xy, kp_conf, box_conf):
+        self.names = np.asarray(names)
+        self.shapes = np.asarray(shapes, np.int32)      # (B, 2) = (h, w)
+        self.counts = np.asarray(counts, np.int64)      # (B,)
+        self.kp_xy = np.asarray(kp_xy, np.float32)      # (N, K, 2)
+        self.kp_conf = np.asarray(kp_conf, np.float32)  # (N, K) 信頼度なしモデルはNaN
+        self.box_conf = np.asarray(box_conf, np.float32)
+
+    def __len__(self):
+        return len(self.names)
+
+    def detections(self, conf_thres: float) -> List[Detections]:
+        """conf_thres で推論した場合と同じ画像ごとのDetections"""
+        has_kp_conf = not np.isnan(self.kp_conf).all()
+        out = []
+        for sl in self._slices():
+            keep = self.box_conf[sl] >= conf_thres
+            out.append(Detections(
+                self.kp_xy[sl][keep],
+                self.kp_conf[sl][keep] if has_kp_conf else None,
+                self.box_conf[sl][keep],
+            ))
+        return out
+
+    def _slices(self):
+        ends = np.cumsum(self.counts)
+        return [slice(int(e - n), int(e)) for n, e in zip(self.counts, ends)]
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(path, names=self.names, shapes=self.shapes, counts=self.counts,
+                            kp_xy=self.kp_xy, kp_conf=self.kp_conf, box_conf=self.box_conf)
+
+    @classmethod
+    def load(cls, path: Path) -> "PredictionCache":
+        with np.load(path) as z:
+            return cls(z["names"], z["shapes"], z["counts"], z["kp_xy"], z["kp_conf"], z["box_conf"])
+
+    @classmethod
+    def build(cls, backend, img_paths: List[str], batch_size: int) -> "PredictionCache":
+        names, shapes, dets = [], [], []
+        for chunk, images, batch_dets in iter_backend_batches(backend, img_paths, batch_size):
+            names.extend(Path(p).name for p in chunk)
+            shapes.extend(im.shape[:2] for im in images)
+            dets.extend(batch_dets)
+
+        k = dets[0].kp_xy.shape[1] if dets else 2
+        kp_conf = [d.kp_conf if d.kp_conf is not None else np.full(d.kp_xy.shape[:2], np.nan, np.float32) for d in dets]
+        box_conf = [d.box_conf if d.box_conf is not None else np.ones(len(d.kp_xy), np.float32) for d in dets]
+        return cls(
+            names, np.asarray(shapes).reshape(-1, 2), [len(d.kp_xy) for d in dets],
+            np.concatenate([d.kp_xy for d in dets]) if dets else np.zeros((0, k, 2)),
+            np.concatenate(kp_conf) if dets else np.zeros((0, k)),
+            np.concatenate(box_conf) if dets else np.zeros(0),
+        )
+
+
+def load_or_build(weights: str, img_paths: List[str], imgsz: int, cache_dir: str,
+                  backend_kind: str = "auto", batch_size: int = 16, rebuild: bool = False):
+    """キャッシュがあれば読み込み、なければ最低閾値で推論して保存。(cache, path, 作成したか) を返す"""
+    path = cache_path(cache_dir, weights, imgsz, img_paths)
+    if path.exists() and not rebuild:
+        return PredictionCache.load(path), path, False
+    backend = load_backend(backend_kind, weights, imgsz, CACHE_CONF)
+    cache = PredictionCache.build(backend, img_paths, batch_size)
+    cache.save(path)
+    return cache, path, True
@@ -0,0 +1,132 @@
+# scripts/gauge/reading.py
+"""針メーター読み取りの共通処理（評価スクリプト・API共通、バッチ単位でベクトル化）"""
+from typing import NamedTuple, Optional, List, Dict, Any, Sequence
+import numpy as np
+
+# キーポイント順序（ラベル定義と同じ: 0=回転中心, 1=針先）
+PIVOT_IDX, TIP_IDX = 0, 1
+
+# 検出選択スコア = 0.7 * キーポイント信頼度平均 + 0.3 * ボックス信頼度
+KP_WEIGHT, BOX_WEIGHT = 0.7, 0.3
+
+
+class Detections(NamedTuple):
+    """1画像分の検出結果（座標は元画像のピクセル）"""
+    kp_xy: np.ndarray                 # (N, K, 2)
+    kp_conf: Optional[np.ndarray]     # (N, K)  可視性なしモデルではNone
+    box_conf: Optional[np.ndarray]    # (N,)
+
+
+def _to_numpy(t):
+    return t.cpu().numpy() if hasattr(t, "cpu") else np.asarray(t)
+
+
+def detections_from_result(result) -> Detections:
+    """ultralyticsのResultを配列に変換"""
+    kpts = result.keypoints
+    if kpts is None or len(kpts) == 0:
+        return Detections(np.zeros((0, 2, 2), np.float32), None, None)
+    kp_conf = kpts.conf
+    box_conf = result.boxes.conf if result.boxes is not None else None
+    return Detections(
+        _to_numpy(kpts.xy).astype(np.float32),
+        _to_numpy(kp_conf).astype(np.float32) if kp_conf is not None else None,
+        _to_numpy(box_conf).astype(np.float32) if box_conf is not None else None,
+    )
+
+
+def predict_detections(model, images: Sequence[np.ndarray], imgsz: int, conf_thres: float, device: str = "cpu") -> List[Detections]:
+    """画像リストを1回のバッチ推論にかけ、画像ごとのDetectionsを返す"""
+    results = model.predict(list(images), imgsz=imgsz, conf=conf_thres, device=device, batch=len(images), verbose=False)
+    return [detections_from_result(r) for r in results]
+
+
+def angle_deg(pivot_xy, tip_xy):
+    """針角度[deg]（画像上向きが+y、0〜360）。配列・スカラー両対応"""
+    d = np.asarray(tip_xy, dtype=np.float64) - np.asarray(pivot_xy, dtype=np.float64)
+    return np.degrees(np.arctan2(-d[..., 1], d[..., 0])) % 360.0
+
+
+def circ_abs_diff_deg(a, b):
+    return np.abs(((np.asarray(a, dtype=np.float64) - b + 180.0) % 360.0) - 180.0)
+
+
+def map_angle_to_value(ang, cfg: Dict[str, Any]):
+    """角度→指示値の線形変換（gauge_config.yml形式のキャリブレーション）"""
+    t0 = float(cfg["theta_min"])
+    t1 = float(cfg["theta_max"])
+    v0 = float(cfg["v_min"])
+    v1 = float(cfg["v_max"])
+
+    # 展開（CW/CCWともにt1<t0なら360度足す）
+    if t1 < t0:
+        t1 += 360.0
+
+    a = np.asarray(ang, dtype=np.float64)
+    a = np.where(a < t0, a + 360.0, a)
+    a = np.clip(a, t0, t1)
+
+    # 線形変換
+    return v0 + (a - t0) / (t1 - t0) * (v1 - v0)
+
+
+def read_batch(dets: Sequence[Detections], conf_thres: float, calib: Optional[Dict[str, Any]] = None) -> Dict[str, np.ndarray]:
+    """バッチ全体の検出を一括でスコアリングし、画像ごとに最良検出の角度・値を返す
+
+    戻り値の各配列は長さB（画像数）。検出なしの画像は has_det=False, 角度・値はNaN。
+    """
+    n_images = len(dets)
+    counts = np.array([len(d.kp_xy) for d in dets], dtype=np.int64)
+    total = int(counts.sum())
+
+    kp_xy = np.zeros((total, 2, 2), np.float64)
+    kp_score = np.zeros(total, np.float64)         # スコア用（信頼度なしは0）
+    kp_gate = np.ones((total, 2), np.float64)      # ゲート用（信頼度なしは1=常に有効）
+    box_score = np.zeros(total, np.float64)
+
+    offset = 0
+    for d, n in zip(dets, counts):
+        if n == 0:
+            continue
+        sl = slice(offset, offset + n)
+        kp_xy[sl] = d.kp_xy[:, [PIVOT_IDX, TIP_IDX]]
+        if d.kp_conf is not None:
+            pair = d.kp_conf[:, [PIVOT_IDX, TIP_IDX]]
+            kp_score[sl] = pair.mean(axis=1)
+            kp_gate[sl] = pair
+        if d.box_conf is not None:
+            m = min(n, len(d.box_conf))
+            box_score[offset:offset + m] = d.box_conf[:m]
+        offset += n
+
+    scores = KP_WEIGHT * kp_score + BOX_WEIGHT * box_score
+
+    # 画像ごとの最高スコア検出（同点は先頭）: 画像番号→スコア降順で安定ソートし各グループ先頭を取る
+    image_idx = np.repeat(np.arange(n_images), counts)
+    order = np.lexsort((-scores, image_idx))
+    starts = np.cumsum(counts) - counts
+    has_det = counts > 0
+    best = order[starts[has_det]]
+
+    out = {
+        "has_det": has_det,
+        "idx": np.full(n_images, -1, np.int64),
+        "valid": np.zeros(n_images, bool),
+        "score": np.full(n_images, np.nan),
+        "conf": np.full((n_images, 2), np.nan),
+        "pivot": np.full((n_images, 2), np.nan),
+        "tip": np.full((n_images, 2), np.nan),
+        "angle": np.full(n_images, np.nan),
+        "value": np.full(n_images, np.nan),
+    }
+    out["idx"][has_det] = best - starts[has_det]
+    out["score"][has_det] = scores[best]
+    out["conf"][has_det] = kp_gate[best]
+    out["valid"][has_det] = (kp_gate[best] >= conf_thres).all(axis=1)
+    out["pivot"][has_det] = kp_xy[best, 0]
+    out["tip"][has_det] = kp_xy[best, 1]
+    out["angle"][has_det] = angle_deg(out["pivot"][has_det], out["tip"][has_det])
+    if calib is not None:
+        out["value"][has_det] = map_angle_to_value(out["angle"][has_det], calib)
+    return out
+
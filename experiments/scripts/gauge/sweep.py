@@ -0,0 +1,106 @@
+# scripts/gauge/sweep.py
+"""閾値 × キャリブレーションのスイープ（推論結果キャッシュから再推論なしで集計）
+
+初回のみ最低閾値で全画像を推論してキャッシュし、以降はキャッシュから
+各 conf_threshold の角度MAE・valid_ratio と、各キャリブレーションの値誤差を計算する。
+集計方法は eval_angle_mae.py / eval_value_mae.py と同じ。
+
+使い方（experiments/ から）:
+    python -m scripts.gauge.sweep --weights best.pt --test-images data/images/test --test-labels data/labels/test \\
+        --thresholds 0.3,0.4,0.5,0.6 --gauge-configs config/gauge_config.yml,config/gauge_alt.yml \\
+        --test-values eval/value_gt.csv --out eval/sweep.json
+"""
+import argparse, glob, json, time
+from pathlib import Path
+import numpy as np
+import yaml
+
+from .pred_cache import load_or_build
+from .reading import read_batch, angle_deg, circ_abs_diff_deg, map_angle_to_value
+from scripts.eval_angle_mae import read_gt_kpts
+from scripts.eval_value_mae import load_test_values
+
+def gt_angles(cache, test_labels: str):
+    """ラベルからGT角度（なければNaN）"""
+    out = np.full(len(cache), np.nan)
+    for i, (name, (h, w)) in enumerate(zip(cache.names, cache.shapes)):
+        pv, tp = read_gt_kpts(str(Path(test_labels) / f"{Path(str(name)).stem}.txt"), w, h)
+        if pv and tp:
+            out[i] = angle_deg(pv[:2], tp[:2])
+    return out
+
+def angle_metrics(readings, angle_gt):
+    # eval_angle_mae と同じ: GT・予測ともにあり、かつ valid の画像で平均
+    counted = readings["valid"] & ~np.isnan(angle_gt) & readings["has_det"]
+    err = circ_abs_diff_deg(readings["angle"][counted], angle_gt[counted])
+    return {
+        "mae_deg": float(err.mean()) if counted.any() else None,
+        "num_valid": int(counted.sum()),
+        "valid_ratio": float(counted.mean()) if len(counted) else 0.0,
+    }
+
+def value_metrics(readings, calib, value_gt, with_gt):
+    # eval_value_mae と同じ: GTのある画像のみ対象、valid の画像で平均
+    valid = readings["valid"][with_gt] & readings["has_det"][with_gt]
+    pred = map_angle_to_value(readings["angle"][with_gt][valid], calib)
+    err = np.abs(pred - value_gt[valid])
+    return {
+        "mae_value": float(err.mean()) if valid.any() else None,
+        "num_valid": int(valid.sum()),
+        "valid_ratio": float(valid.mean()) if len(valid) else 0.0,
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--weights", required=True, help="best.pt または .onnx")
+    ap.add_argument("--backend", choices=["auto", "ultralytics", "onnx"], default="auto")
+    ap.add_argument("--test-images", required=True)
+    ap.add_argument("--test-labels", default=None, help="角度GT（YOLO-poseラベル）")
+    ap.add_argument("--test-values", default=None, help="値GT CSV（filename,value_gt）")
+    ap.add_argument("--gauge-configs", default="", help="比較するキャリブレーション（カンマ区切り）")
+    ap.add_argument("--thresholds", default="0.1,0.2,0.3,0.4,0.5,0.6,0.7", help="比較するconf_threshold（カンマ区切り）")
+    ap.add_argument("--imgsz", type=int, default=640)
+    ap.add_argument("--batch-size", type=int, default=16)
+    ap.add_argument("--cache-dir", default="cache/predictions")
+    ap.add_argument("--rebuild", action="store_true", help="キャッシュを作り直す")
+    ap.add_argument("--out", default=None, help="結果JSONの出力先")
+    args = ap.parse_args()
+
+    img_paths = sorted(glob.glob(str(Path(args.test_images) / "*.*")))
+    t0 = time.perf_counter()
+    cache, path, built = load_or_build(args.weights, img_paths, args.imgsz, args.cache_dir,
+                                       args.backend, args.batch_size, args.rebuild)
+    print(f"{'built' if built else 'loaded'} cache: {path} ({len(cache)} images, {time.perf_counter() - t0:.2f}s)")
+
+    angle_gt = gt_angles(cache, args.test_labels) if args.test_labels else None
+    calibs = {}
+    for p in (p for p in args.gauge_configs.split(",") if p):
+        with open(p, "r") as f:
+            calibs[Path(p).name] = yaml.safe_load(f)
+    value_gt = with_gt = None
+    if args.test_values and calibs:
+        gt_map = load_test_values(args.test_values)
+        with_gt = np.array([str(n) in gt_map for n in cache.names], bool)
+        value_gt = np.array([gt_map[str(n)] for n in cache.names[with_gt]], np.float64)
+
+    t0 = time.perf_counter()
+    rows = []
+    for thres in (float(x) for x in args.thresholds.split(",")):
+        readings = read_batch(cache.detections(thres), thres)
+        row = {"conf_threshold": thres}
+        if angle_gt is not None:
+            row["angle"] = angle_metrics(readings, angle_gt)
+        if value_gt is not None:
+            row["value"] = {name: value_metrics(readings, calib, value_gt, with_gt) for name, calib in calibs.items()}
+        rows.append(row)
+    sweep_ms = (time.perf_counter() - t0) * 1000.0
+
+    report = {"cache": str(path), "imgsz": args.imgsz, "sweep_ms": sweep_ms, "results": rows}
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+if __name__ == "__main__":
+    main()
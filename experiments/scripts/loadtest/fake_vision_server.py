@@ -0,0 +1,152 @@
+# scripts/loadtest/fake_vision_server.py
+"""Azure Image Analysis（Read）の代わりに応答するローカルHTTPサーバー（負荷試験用）
+
+ImageAnalysisClient から endpoint=http://127.0.0.1:<port> で呼べる。
+レイテンシ分布・エラー率・429率・読み取り失敗率（空の結果＝カスケードを進ませる）を指定できる。
+
+使い方（experiments/ から）:
+    python -m scripts.loadtest.fake_vision_server --port 8090 --latency lognormal:400,0.6 --error-rate 0.01 --throttle-rate 0.02
+"""
+import json, random, time, argparse, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Any, List, Optional
+
+from scripts.ocr.image_io import probe_size
+
+ANALYZE_PATH = "/computervision/imageanalysis:analyze"
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """レイテンシ分布（ms）: fixed:<ms> / uniform:<min>,<max> / lognormal:<中央値>,<sigma>"""
+    kind, _, params = spec.partition(":")
+    values = [float(v) for v in params.split(",") if v]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal" and len(values) == 2:
+        import math
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError(f"unknown latency spec: {spec}")
+
+def read_result(text: str, confidence: float, width: int, height: int) -> Dict[str, Any]:
+    """画像中央に1行だけある読み取り結果（Image Analysis 4.0 のJSON形式）"""
+    poly = [{"x": int(width * 0.3), "y": int(height * 0.4)}, {"x": int(width * 0.7), "y": int(height * 0.4)},
+            {"x": int(width * 0.7), "y": int(height * 0.6)}, {"x": int(width * 0.3), "y": int(height * 0.6)}]
+    return {"blocks": [{"lines": [{
+        "text": text,
+        "boundingPolygon": poly,
+        "words": [{"text": text, "boundingPolygon": poly, "confidence": confidence}],
+    }]}]}
+
+class FakeVision:
+    """応答内容の決定と集計（ハンドラスレッド間で共有）"""
+
+    def __init__(self, latency: Callable[[random.Random], float], error_rate: float = 0.0,
+                 throttle_rate: float = 0.0, miss_rate: float = 0.0, answers: Optional[List[str]] = None,
+                 confidence: float = 0.95, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.miss_rate = miss_rate
+        self.answers = answers or ["12:34"]
+        self.confidence = confidence
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "ok": 0, "miss": 0, "error": 0, "throttled": 0}
+
+    def decide(self):
+        with self._lock:
+            self.counts["requests"] += 1
+            delay_ms = self.latency(self._rng)
+            r = self._rng.random()
+            if r < self.throttle_rate:
+                outcome = "throttled"
+            elif r < self.throttle_rate + self.error_rate:
+                outcome = "error"
+            elif r < self.throttle_rate + self.error_rate + self.miss_rate:
+                outcome = "miss"
+            else:
+                outcome = "ok"
+            self.counts[outcome] += 1
+            return delay_ms, outcome, self._rng.choice(self.answers)
+
+def make_handler(fake: FakeVision):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._send(200, fake.counts)
+
+        def do_POST(self):
+            image = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if not self.path.startswith(ANALYZE_PATH):
+                self._send(404, {"error": {"code": "NotFound", "message": self.path}})
+                return
+            delay_ms, outcome, text = fake.decide()
+            time.sleep(delay_ms / 1000.0)
+            if outcome == "throttled":
+                self._send(429, {"error": {"code": "429", "message": "Rate limit is exceeded."}}, {"Retry-After": "1"})
+                return
+            if outcome == "error":
+                self._send(500, {"error": {"code": "InternalServerError", "message": "simulated failure"}})
+                return
+            size = probe_size(image)
+            if size is None:
+                self._send(400, {"error": {"code": "InvalidRequest", "message": "InvalidImageFormat"}})
+                return
+            width, height = size
+            body = {"modelVersion": "2023-10-01", "metadata": {"width": width, "height": height}}
+            body["readResult"] = {"blocks": []} if outcome == "miss" else read_result(text, fake.confidence, width, height)
+            self._send(200, body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def serve(fake: FakeVision, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """バックグラウンドスレッドで起動したサーバーを返す（port=0 なら空きポート）"""
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def add_fake_args(ap: argparse.ArgumentParser):
+    ap.add_argument("--latency", default="lognormal:400,0.5", help="fixed:<ms> / uniform:<min>,<max> / lognormal:<中央値>,<sigma>")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="500を返す割合")
+    ap.add_argument("--throttle-rate", type=float, default=0.0, help="429を返す割合")
+    ap.add_argument("--miss-rate", type=float, default=0.3, help="読み取り結果なしを返す割合（カスケードの試行が進む）")
+    ap.add_argument("--answers", default="12:34,56.7,0.25", help="返すテキスト（カンマ区切りからランダム）")
+    ap.add_argument("--seed", type=int, default=0)
+
+def fake_from_args(args) -> FakeVision:
+    return FakeVision(parse_latency(args.latency), args.error_rate, args.throttle_rate, args.miss_rate,
+                      [a for a in args.answers.split(",") if a], seed=args.seed)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8090)
+    add_fake_args(ap)
+    args = ap.parse_args()
+
+    server = serve(fake_from_args(args), args.host, args.port)
+    print(f"fake Azure Vision: http://{args.host}:{server.server_port}  (GET / で集計)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
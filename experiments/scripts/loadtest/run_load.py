@@ -0,0 +1,183 @@
+# scripts/loadtest/run_load.py
+"""OCR APIの段階的負荷試験（レプリカのサイジング用）
+
+偽のAzure Visionサーバー（fake_vision_server）を立て、それに向けた api.main:app を uvicorn で起動し、
+同時接続数を段階的に上げながら /api/ocr/analyze を叩く（クローズドループ）。
+段階ごとにスループット・レイテンシ p50/p95/p99・1リクエストあたりの試行数とAzure呼び出し数・
+エラーコード内訳を出す。--target を指定すると起動済みのAPIを叩く（偽サーバーは起動しない）。
+
+同じ画像を繰り返し送るため、起動するAPIでは結果キャッシュを無効にする（OCR_CACHE_SIZE=0）。
+
+使い方（experiments/ から）:
+    python -m scripts.loadtest.run_load --glob "data_ocr/images/*.*" --steps 1,2,4,8,16 --duration 20
+    python -m scripts.loadtest.run_load --synthetic 8 --latency lognormal:800,0.7 --throttle-rate 0.05 \\
+        --env ADMISSION_MAX_CONCURRENT=4 --out runs/loadtest/report.json
+"""
+import os, sys, json, time, base64, pathlib, argparse, subprocess, threading
+import urllib.request, urllib.error
+from collections import Counter
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from .fake_vision_server import serve, add_fake_args, fake_from_args
+
+ROOT = pathlib.Path(__file__).resolve().parents[3]
+EXPERIMENTS = ROOT / "experiments"
+
+def load_images(pattern: str, synthetic: int) -> List[str]:
+    """data URL（base64）のリスト"""
+    if synthetic:
+        import cv2
+        rng = np.random.default_rng(0)
+        blobs = []
+        for i in range(synthetic):
+            img = np.full((480, 640, 3), 200, np.uint8)
+            img += rng.integers(0, 20, img.shape, dtype=np.uint8)
+            cv2.putText(img, f"{rng.integers(0, 100)}.{i}", (120, 260), cv2.FONT_HERSHEY_SIMPLEX, 3, (20, 20, 20), 8)
+            blobs.append(cv2.imencode(".jpg", img)[1].tobytes())
+    else:
+        paths = sorted(pathlib.Path().glob(pattern))
+        if not paths:
+            raise SystemExit(f"no files for pattern: {pattern}（--synthetic N で合成画像も使えます）")
+        blobs = [p.read_bytes() for p in paths]
+    return ["data:image/jpeg;base64," + base64.b64encode(b).decode("ascii") for b in blobs]
+
+def wait_healthy(base_url: str, timeout_s: float = 60.0):
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(base_url + "/health", timeout=2) as resp:
+                if resp.status == 200:
+                    return
+        except Exception:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"API did not become healthy: {base_url}")
+
+def spawn_api(port: int, workers: int, vision_endpoint: str, extra_env: Dict[str, str]) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        "VISION_ENDPOINT": vision_endpoint,
+        "VISION_KEY": "loadtest",
+        "OCR_CACHE_SIZE": "0",
+        "PYTHONPATH": os.pathsep.join([str(EXPERIMENTS), str(ROOT), env.get("PYTHONPATH", "")]),
+    })
+    env.update(extra_env)
+    cmd = [sys.executable, "-m", "uvicorn", "api.main:app", "--host", "127.0.0.1", "--port", str(port),
+           "--workers", str(workers), "--log-level", "warning"]
+    return subprocess.Popen(cmd, cwd=str(ROOT), env=env)
+
+def post(url: str, image: str, timeout_s: float) -> Dict[str, Any]:
+    body = json.dumps({"image_base64": image}).encode("utf-8")
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"}, method="POST")
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout_s) as resp:
+            status, data = resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        status = e.code
+        try:
+            data = json.loads(e.read())
+        except ValueError:
+            data = {}
+    except Exception as e:
+        return {"latency_ms": (time.perf_counter() - t0) * 1000.0, "code": f"CLIENT_{type(e).__name__}"}
+    latency_ms = (time.perf_counter() - t0) * 1000.0
+    error = data.get("error") or {}
+    code = f"{status}:{error['code']}" if isinstance(error, dict) and error.get("code") else str(status)
+    result = data.get("result") or {}
+    return {"latency_ms": latency_ms, "code": code, "ok": bool(data.get("success")),
+            "attempts": result.get("preprocessing_attempts")}
+
+def run_step(url: str, images: List[str], concurrency: int, duration_s: float, timeout_s: float) -> List[Dict[str, Any]]:
+    """concurrency 本のクライアントが duration_s 秒間、応答が返るたびに次を送る"""
+    records: List[Dict[str, Any]] = []
+    lock = threading.Lock()
+    deadline = time.time() + duration_s
+
+    def client(offset: int):
+        i = offset
+        while time.time() < deadline:
+            rec = post(url, images[i % len(images)], timeout_s)
+            i += concurrency
+            with lock:
+                records.append(rec)
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return records
+
+def summarize(records: List[Dict[str, Any]], elapsed_s: float, azure_calls: Optional[int]) -> Dict[str, Any]:
+    lat = np.array([r["latency_ms"] for r in records]) if records else np.zeros(1)
+    ok = [r for r in records if r.get("ok")]
+    attempts = [r["attempts"] for r in ok if r.get("attempts") is not None]
+    return {
+        "requests": len(records),
+        "throughput_rps": len(records) / elapsed_s,
+        "goodput_rps": len(ok) / elapsed_s,
+        "latency_ms": {"p50": float(np.percentile(lat, 50)), "p95": float(np.percentile(lat, 95)),
+                       "p99": float(np.percentile(lat, 99))},
+        "success_latency_p95_ms": float(np.percentile([r["latency_ms"] for r in ok], 95)) if ok else None,
+        "attempts_per_success": float(np.mean(attempts)) if attempts else None,
+        "azure_calls_per_request": azure_calls / len(records) if records and azure_calls is not None else None,
+        "codes": dict(Counter(r["code"] for r in records)),
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--target", default=None, help="起動済みAPIのURL（未指定なら偽Azure＋APIを起動）")
+    ap.add_argument("--glob", default="data_ocr/images/*.*", help="送信する画像のglobパターン")
+    ap.add_argument("--synthetic", type=int, default=0, help="画像の代わりに合成画像をN枚使う")
+    ap.add_argument("--steps", default="1,2,4,8,16", help="同時接続数の段階（カンマ区切り）")
+    ap.add_argument("--duration", type=float, default=20.0, help="各段階の秒数")
+    ap.add_argument("--timeout", type=float, default=60.0, help="1リクエストのタイムアウト秒")
+    ap.add_argument("--port", type=int, default=8765, help="起動するAPIのポート")
+    ap.add_argument("--workers", type=int, default=1, help="起動するAPIの uvicorn ワーカー数（=1レプリカ相当）")
+    ap.add_argument("--env", action="append", default=[], help="起動するAPIへの追加環境変数 KEY=VALUE（複数可）")
+    ap.add_argument("--out", default=None, help="レポートJSONの出力先")
+    add_fake_args(ap)
+    args = ap.parse_args()
+
+    images = load_images(args.glob, args.synthetic)
+    fake, proc = None, None
+    if args.target:
+        base_url = args.target.rstrip("/")
+    else:
+        fake = fake_from_args(args)
+        server = serve(fake)
+        extra_env = dict(kv.split("=", 1) for kv in args.env)
+        proc = spawn_api(args.port, args.workers, f"http://127.0.0.1:{server.server_port}", extra_env)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    report: Dict[str, Any] = {"config": vars(args), "steps": []}
+    try:
+        wait_healthy(base_url)
+        url = base_url + "/api/ocr/analyze"
+        for concurrency in (int(s) for s in args.steps.split(",")):
+            before = fake.counts["requests"] if fake else None
+            t0 = time.time()
+            records = run_step(url, images, concurrency, args.duration, args.timeout)
+            elapsed = time.time() - t0
+            azure_calls = fake.counts["requests"] - before if fake else None
+            step = {"concurrency": concurrency, **summarize(records, elapsed, azure_calls)}
+            report["steps"].append(step)
+            print(f"c={concurrency:>3}  rps={step['throughput_rps']:6.2f}  good={step['goodput_rps']:6.2f}  "
+                  f"p50={step['latency_ms']['p50']:7.0f}  p95={step['latency_ms']['p95']:7.0f}  "
+                  f"p99={step['latency_ms']['p99']:7.0f}  attempts={step['attempts_per_success']}  codes={step['codes']}")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    if args.out:
+        out = pathlib.Path(args.out)
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"report: {out}")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 # scripts/ocr/analyze_ocr_results.py
 import os, json, argparse, pathlib
+from concurrent.futures import ProcessPoolExecutor
 import cv2
 import numpy as np
 from typing import List, Dict, Any, Tuple
@@ -7,50 +8,23 @@ import re
 
 # 前処理エンジンをインポート
 from .preprocess import PreprocessingEngine
+from . import numeric
 
-# run_ocr.pyと同じ改善された正規表現を使用
-NUMERIC_RE = re.compile(r"^(?!.*[IO]/[IO])(?![IO]+$)(?![A-Z]+$)[0-9OIl:.,+\-_/\\()\s°C°F%℃]+$")
-
-def smart_normalize(text: str) -> str:
-    """シンプルな賢い正規化"""
-    import re
-    
-    # 明らかに非数値なパターンはそのまま返す
-    non_numeric = ['I/O', 'O/I', 'ON', 'OFF', 'IO', 'OI']
-    if text.upper() in non_numeric:
-        return text
-    
-    # 時刻表示の前処理クリーンアップ
-    # ". 1 1:38" → "11:38" のような変換
-    cleaned = text
-    
-    # 先頭の不要文字を除去
-    cleaned = re.sub(r'^[.\-\s]+', '', cleaned)
-    
-    # 時刻パターンの間のスペースを除去
-    cleaned = re.sub(r'(\d)\s+(\d)', r'\1\2', cleaned)  # "1 1:38" → "11:38"
-    cleaned = re.sub(r'(\d)\s+:', r'\1:', cleaned)      # "1 :" → "1:"
-    cleaned = re.sub(r':\s+(\d)', r':\1', cleaned)      # ": 38" → ":38"
-    
-    # 数字がある場合のみ文字置換
-    if re.search(r'\d', cleaned):
-        cleaned = cleaned.replace("O", "0").replace("I", "1").replace("l", "1")
-    
-    return cleaned
+# 数値判定は共通モジュールのものを使用（--test-regex で差し替え可能）
+NUMERIC_RE = numeric.NUMERIC_RE
 
 def reproduce_preprocessing(img_path: str, preprocessing_info: Dict[str, Any]) -> np.ndarray:
-    """前処理情報を基に前処理を再実行"""
-    if not preprocessing_info.get("used_preprocessing", False):
-        return cv2.imread(img_path)
-    
+    """記録された最終ステージの変換のみを再適用（OCR呼び出しなし）"""
     image = cv2.imread(img_path)
-    engine = PreprocessingEngine()
+    if image is None or not preprocessing_info.get("used_preprocessing", False):
+        return image
     
-    def simple_ocr_callback(processed_img: np.ndarray) -> Tuple[bool, bool, List[Dict[str, Any]]]:
-        # 簡易版：数値的な内容があるかの判定のみ
-        return True, True, []  # 前処理成功条件を満たすまで継続
+    final_stage = preprocessing_info.get("final_stage")
+    if not isinstance(final_stage, dict):
+        # 旧形式（"attempt_N"）や全段失敗時は元画像のまま
+        return image
     
-    return engine.process_image(image, simple_ocr_callback)
+    return PreprocessingEngine().replay(image, final_stage)
 
 def draw_bounding_polygons(img_path: str, lines: List[Dict[str, Any]], numeric_lines: List[Dict[str, Any]], preprocessing_info: Dict[str, Any] = None) -> np.ndarray:
     """画像にbounding_polygonを描画して可視化"""
@@ -89,6 +63,28 @@ def draw_bounding_polygons(img_path: str, lines: List[Dict[str, Any]], numeric_l
     
     return canvas
 
+def render_visualization(task: Dict[str, Any]) -> bool:
+    """1画像分の可視化を描画・保存（プロセスプールのワーカーで実行）"""
+    analysis = task["analysis"]
+    canvas = draw_bounding_polygons(task["image"], task["all_lines"], task["extracted_numbers"], task["preprocessing"])
+    if canvas is None:
+        return False
+    
+    # 分析結果をテキストで画像に追加
+    status_text = f"Stage: {analysis['failure_stage']}"
+    lines_text = f"Lines: {analysis['total_lines']}"
+    numeric_text = f"Numeric: {len(analysis['numeric_candidates'])}"
+    
+    cv2.putText(canvas, status_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+    cv2.putText(canvas, lines_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+    cv2.putText(canvas, numeric_text, (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+    
+    return cv2.imwrite(task["output_path"], canvas)
+
+def _init_render_worker():
+    # プロセス並列時にOpenCV内部スレッドが過剰に立たないようにする
+    cv2.setNumThreads(1)
+
 def analyze_ocr_results(lines: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
     """OCR結果の包括的分析：数値抽出と失敗段階分析"""
     extracted_numbers = []
@@ -100,13 +96,13 @@ def analyze_ocr_results(lines: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any
         text = line["text"].strip()
         
         # 数字を含む行をチェック
-        if re.search(r'[0-9]', text):
+        if numeric.has_digit(text):
             numeric_candidates.append(text)
         
         # 正規表現マッチで数値として抽出
         if NUMERIC_RE.fullmatch(text):
             # 賢い正規化を使用
-            normalized = smart_normalize(text)
+            normalized = numeric.smart_normalize(text)
             extracted_numbers.append({**line, "normalized": normalized})
             regex_matches.append(text)
     
@@ -139,6 +135,7 @@ def main():
     ap.add_argument("--results-dir", required=True, help="OCR結果ディレクトリ（例: runs/ocr/20250816-160044）")
     ap.add_argument("--output-dir", default=None, help="分析結果出力先（未指定なら results-dir/analysis）")
     ap.add_argument("--test-regex", help="代替正規表現パターンをテスト")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="可視化の並列プロセス数（1なら逐次実行）")
     args = ap.parse_args()
     
     # 代替正規表現のテスト
@@ -157,6 +154,7 @@ def main():
         raise FileNotFoundError(f"results.jsonl not found in {results_dir}")
     
     analysis_summary = []
+    render_tasks = []
     viz_dir = output_dir / "visualizations"
     viz_dir.mkdir(exist_ok=True)
     
@@ -172,23 +170,16 @@ def main():
             # 統一された分析関数で包括的分析を実行
             extracted_numbers, analysis = analyze_ocr_results(all_lines)
             
-            # 画像可視化（前処理情報を使用）
+            # 画像可視化は後でまとめて並列実行
             img_name = pathlib.Path(img_path).stem
-            canvas = draw_bounding_polygons(img_path, all_lines, extracted_numbers, preprocessing_info)
-            
-            if canvas is not None:
-                # 分析結果をテキストで画像に追加
-                status_text = f"Stage: {analysis['failure_stage']}"
-                lines_text = f"Lines: {analysis['total_lines']}"
-                numeric_text = f"Numeric: {len(analysis['numeric_candidates'])}"
-                
-                cv2.putText(canvas, status_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                cv2.putText(canvas, lines_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                cv2.putText(canvas, numeric_text, (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                
-                # 保存
-                output_path = viz_dir / f"{img_name}_analysis.jpg"
-                cv2.imwrite(str(output_path), canvas)
+            render_tasks.append({
+                "image": img_path,
+                "all_lines": all_lines,
+                "extracted_numbers": extracted_numbers,
+                "preprocessing": preprocessing_info,
+                "analysis": analysis,
+                "output_path": str(viz_dir / f"{img_name}_analysis.jpg"),
+            })
             
             # サマリーに追加
             summary_item = {
@@ -205,6 +196,13 @@ def main():
             
             analysis_summary.append(summary_item)
     
+    print(f"可視化を生成中... ({len(render_tasks)}枚, workers={args.workers})")
+    if args.workers > 1 and len(render_tasks) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_render_worker) as pool:
+            rendered = list(pool.map(render_visualization, render_tasks, chunksize=8))
+    else:
+        rendered = [render_visualization(task) for task in render_tasks]
+    
     # 失敗段階デバッグ用の統計のみ計算
     total_images = len(analysis_summary)
     success_count = sum(1 for item in analysis_summary if item["success"])
@@ -250,7 +248,7 @@ def main():
     for reason, count in picked_reasons.items():
         print(f"  {reason}: {count}枚")
     
-    print(f"\n可視化結果: {viz_dir}")
+    print(f"\n可視化結果: {viz_dir} ({sum(rendered)}/{len(render_tasks)}枚)")
     print(f"詳細分析: {output_dir / 'analysis_summary.json'}")
     print(f"失敗例: {output_dir / 'failed_cases.json'}")
 
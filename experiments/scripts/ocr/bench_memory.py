@@ -0,0 +1,97 @@
+# scripts/ocr/bench_memory.py
+"""1リクエストあたりのピークメモリ計測（メモリ上限モードの有無を比較）
+
+各設定を別プロセスで実行し、base64文字列→バイト列→前処理カスケード全段
+（OCRは常に失敗する空クライアント＝最悪ケース）のピークRSS増分を測る。
+--assert-mb を指定すると、上限モードのピーク増分が超えた場合に終了コード1で失敗する。
+
+使い方（experiments/ から）:
+    python -m scripts.ocr.bench_memory --width 6000 --height 4000 --assert-mb 900
+    python -m scripts.ocr.bench_memory --image data_ocr/images/large.jpg
+"""
+import argparse, base64, json, subprocess, sys, types
+
+def peak_rss_mb() -> float:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024.0 * 1024.0) if sys.platform == "darwin" else rss / 1024.0
+
+class NullClient:
+    """Azureを呼ばずに「読み取り結果なし」を返す（全段試行させるため）"""
+
+    def __init__(self):
+        self.calls = 0
+        self.bytes_sent = 0
+
+    def analyze(self, image_data, visual_features, **kwargs):
+        self.calls += 1
+        self.bytes_sent += len(image_data)
+        return types.SimpleNamespace(read=None)
+
+def synthetic_jpeg(width: int, height: int) -> bytes:
+    """細かいテクスチャ入りの大きな写真風JPEG（高圧縮されにくい）"""
+    import cv2
+    import numpy as np
+    rng = np.random.default_rng(0)
+    img = rng.integers(0, 256, (height // 4, width // 4, 3), dtype=np.uint8)
+    img = cv2.resize(img, (width, height), interpolation=cv2.INTER_CUBIC)
+    cv2.putText(img, "12.34", (width // 5, height // 2), cv2.FONT_HERSHEY_SIMPLEX, width / 400, (0, 0, 0), width // 100)
+    return cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 95])[1].tobytes()
+
+def run_child(payload_path: str, max_decode_pixels: int, max_variant_pixels: int):
+    """子プロセス側: 1リクエスト分を処理してピークRSS増分をJSONで出力"""
+    import time
+    from .single_image_ocr import analyze_single_image
+
+    with open(payload_path, "r") as f:
+        body = f.read()                 # リクエストJSON相当のbase64文字列
+    baseline = peak_rss_mb()
+
+    t0 = time.perf_counter()
+    img_bytes = base64.b64decode(body)
+    client = NullClient()
+    _, analysis = analyze_single_image(client, img_bytes, True,
+                                       max_decode_pixels=max_decode_pixels, max_variant_pixels=max_variant_pixels)
+    print(json.dumps({
+        "peak_rss_delta_mb": peak_rss_mb() - baseline,
+        "seconds": time.perf_counter() - t0,
+        "attempts": analysis["preprocessing"]["attempts"],
+        "decode_reduction": analysis["preprocessing"]["decode_reduction"],
+        "upload_mb": client.bytes_sent / 1e6,
+    }))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--image", default=None, help="計測に使う画像（未指定なら合成画像）")
+    ap.add_argument("--width", type=int, default=6000)
+    ap.add_argument("--height", type=int, default=4000)
+    ap.add_argument("--max-decode-pixels", type=int, default=16_000_000)
+    ap.add_argument("--max-variant-pixels", type=int, default=24_000_000)
+    ap.add_argument("--assert-mb", type=float, default=None, help="上限モードのピーク増分[MB]の許容値")
+    ap.add_argument("--payload", default=None, help=argparse.SUPPRESS)   # 子プロセス用
+    args = ap.parse_args()
+
+    if args.payload:
+        run_child(args.payload, args.max_decode_pixels, args.max_variant_pixels)
+        return
+
+    import tempfile
+    img_bytes = open(args.image, "rb").read() if args.image else synthetic_jpeg(args.width, args.height)
+    with tempfile.NamedTemporaryFile("w", suffix=".b64", delete=False) as f:
+        f.write(base64.b64encode(img_bytes).decode("ascii"))
+        payload = f.name
+
+    report = {"image_mb": len(img_bytes) / 1e6}
+    for mode, limits in (("unbounded", (0, 0)), ("budget", (args.max_decode_pixels, args.max_variant_pixels))):
+        cmd = [sys.executable, "-m", "scripts.ocr.bench_memory", "--payload", payload,
+               "--max-decode-pixels", str(limits[0]), "--max-variant-pixels", str(limits[1])]
+        out = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+        report[mode] = json.loads(out.strip().splitlines()[-1])
+
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.assert_mb is not None and report["budget"]["peak_rss_delta_mb"] > args.assert_mb:
+        print(f"FAIL: budget peak {report['budget']['peak_rss_delta_mb']:.0f} MB > {args.assert_mb:.0f} MB")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
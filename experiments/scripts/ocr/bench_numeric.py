@@ -0,0 +1,106 @@
+# scripts/ocr/bench_numeric.py
+"""numeric.py の等価性チェックとマイクロベンチマーク
+
+使い方（experiments/ から）:
+    python -m scripts.ocr.bench_numeric --number 20000
+"""
+import re, json, argparse, timeit
+from typing import List, Dict, Any
+
+from . import numeric
+
+# ---- 旧実装（run_ocr.py / single_image_ocr.py / engine.py にあったもの）の凍結コピー ----
+LEGACY_NUMERIC_RE = re.compile(r"^(?!.*[IO]/[IO])(?![IO]+$)(?![A-Z]+$)[0-9OIl:.,+\-_/\\()\s°C°F%℃]+$")
+
+def legacy_smart_normalize(text: str) -> str:
+    non_numeric = ['I/O', 'O/I', 'ON', 'OFF', 'IO', 'OI']
+    if text.upper() in non_numeric:
+        return text
+    cleaned = text
+    cleaned = re.sub(r'^[.\-\s]+', '', cleaned)
+    cleaned = re.sub(r'(\d)\s+(\d)', r'\1\2', cleaned)
+    cleaned = re.sub(r'(\d)\s+:', r'\1:', cleaned)
+    cleaned = re.sub(r':\s+(\d)', r':\1', cleaned)
+    if re.search(r'\d', cleaned):
+        cleaned = cleaned.replace("O", "0").replace("I", "1").replace("l", "1")
+    return cleaned
+
+def legacy_pick_numeric(lines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    out = []
+    for ln in lines:
+        text = ln["text"].strip()
+        if LEGACY_NUMERIC_RE.fullmatch(text):
+            out.append({**ln, "normalized": legacy_smart_normalize(text)})
+    return out
+
+def legacy_is_valid_numeric(text: str) -> bool:
+    text = text.strip()
+    if len(text.replace(" ", "")) < 2:
+        return False
+    exclude_patterns = [
+        r'^\.', r'^0:\d{2}$', r'^\d{1,2}\.\d{3,}$', r'^\d+\.\s+\d+$',
+        r'^0{3,}$', r'^\d{1}[°℃°F%]$', r'^[°℃°FC%]+$', r'^\([IO]/[IO]\)$',
+    ]
+    if any(re.match(p, text) for p in exclude_patterns):
+        return False
+    return sum(1 for c in text if c.isdigit()) >= 2
+
+# 実際のOCR結果で見られた行を中心にしたコーパス
+CORPUS = [
+    "10:03", ". 1 1:38", "1 1:38", "11 : 38", "12: 05", "-12.5", "- 3.4", "25.6℃", "7℃", "C", "℃",
+    "I/O", "O/I", "(I/O)", "ON", "OFF", "IO", "OI", "0:03", ".11:34", "10.004", "10. 0045", "000",
+    "1O.5", "l2:3O", "O", "IIII", "ABC", "98.6°F", "45%", "1,234", "12/34", "(12)", "3 4 . 5",
+    "12 :34", "+ 5", "0.5", "  8 8  ", "8 8 :8 8", "TEMP 25", "12:34:56", "1 2 3", "1 2 3 4",
+]
+
+# 旧実装はスペース区切りの数字が3つ以上連続すると取りこぼす（"1 2 3" → "12 3"）。
+# 新実装は "123" に揃えるため、この差分のみ意図的な変更として扱う。
+KNOWN_DIFFS = {"1 2 3", "1 2 3 4"}
+
+def check_equivalence() -> List[Dict[str, Any]]:
+    diffs = []
+    for text in CORPUS:
+        lines = [{"text": text}]
+        old = [r["normalized"] for r in legacy_pick_numeric(lines)]
+        new = [r["normalized"] for r in numeric.pick_numeric(lines)]
+        old_valid = [legacy_is_valid_numeric(t) for t in old]
+        new_valid = [numeric.is_valid_numeric(t) for t in new]
+        if (old, old_valid) != (new, new_valid):
+            diffs.append({"text": text, "legacy": old, "new": new,
+                          "legacy_valid": old_valid, "new_valid": new_valid,
+                          "expected": text in KNOWN_DIFFS})
+    return diffs
+
+def bench(number: int) -> Dict[str, float]:
+    lines = [{"text": t} for t in CORPUS]
+
+    def run_legacy():
+        for r in legacy_pick_numeric(lines):
+            legacy_is_valid_numeric(r["normalized"])
+
+    def run_new():
+        for r in numeric.pick_numeric(lines):
+            numeric.is_valid_numeric(r["normalized"])
+
+    legacy_s = min(timeit.repeat(run_legacy, number=number, repeat=3))
+    new_s = min(timeit.repeat(run_new, number=number, repeat=3))
+    per_line = number * len(lines)
+    return {
+        "legacy_us_per_line": legacy_s / per_line * 1e6,
+        "new_us_per_line": new_s / per_line * 1e6,
+        "speedup": legacy_s / new_s if new_s > 0 else None,
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--number", type=int, default=5000, help="コーパス全体の反復回数")
+    args = ap.parse_args()
+
+    diffs = check_equivalence()
+    unexpected = [d for d in diffs if not d["expected"]]
+    print(json.dumps({"diffs": diffs, **bench(args.number)}, ensure_ascii=False, indent=2))
+    if unexpected:
+        raise SystemExit(f"{len(unexpected)} unexpected differences from legacy implementation")
+
+if __name__ == "__main__":
+    main()
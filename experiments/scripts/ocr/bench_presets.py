@@ -0,0 +1,95 @@
+# scripts/ocr/bench_presets.py
+"""プリセット単位の実行時間・メモリ確保量の比較（従来モード vs 再利用バッファ）
+
+カスケードで使うプリセット×スケールの組み合わせごとに、
+中央値の実行時間と1回あたりの確保量（tracemalloc のピーク、numpy配列を含む）を測る。
+再利用モードはウォームアップ後のバッファ新規確保数も出す。
+あわせて encode_variant の送信バイト列が両モードで一致することを確認する（不一致なら終了コード1）。
+
+使い方（experiments/ から）:
+    python -m scripts.ocr.bench_presets --image data_ocr/images/sample.jpg --repeat 20
+    python -m scripts.ocr.bench_presets --width 1920 --height 1080
+"""
+import argparse, json, statistics, sys, time, tracemalloc
+
+import cv2
+import numpy as np
+
+from .encoding import encode_variant
+from .preprocess.buffers import thread_pool
+from .preprocess.operations import PreprocessingOperations
+
+# エンジンのS1/S2と同じ組み合わせ
+COMBOS = [(p, 1.0) for p in ["invert", "clahe", "lcd_strong", "decimal_enhance"]] + [("closing", 1.5)] + [
+    (p, s) for s in [0.75, 0.5, 1.5, 2.0] for p in ["invert", "clahe", "closing"] + (["as-is"] if s <= 1.0 else [])
+    if not (p == "closing" and s == 1.5)
+]
+
+def synthetic_image(width: int, height: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    img = np.full((height, width, 3), 190, np.uint8)
+    img += rng.integers(0, 30, img.shape, dtype=np.uint8)
+    cv2.putText(img, "12.34", (width // 5, height // 2), cv2.FONT_HERSHEY_SIMPLEX, width / 400, (30, 30, 30), width // 100)
+    return img
+
+def measure(ops: PreprocessingOperations, image: np.ndarray, preset: str, scale: float, repeat: int):
+    ops.apply_preset(image, preset, scale)       # ウォームアップ（再利用モードはここでバッファを確保）
+    allocations = thread_pool().allocations
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        ops.apply_preset(image, preset, scale)
+        times.append((time.perf_counter() - t0) * 1000.0)
+
+    tracemalloc.start()
+    ops.apply_preset(image, preset, scale)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "median_ms": statistics.median(times),
+        "peak_kb": peak / 1024.0,
+        "new_buffers": thread_pool().allocations - allocations,
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--image", default=None, help="計測に使う画像（未指定なら合成画像）")
+    ap.add_argument("--width", type=int, default=1280)
+    ap.add_argument("--height", type=int, default=960)
+    ap.add_argument("--repeat", type=int, default=10)
+    ap.add_argument("--out", default=None, help="結果JSONの出力先")
+    args = ap.parse_args()
+
+    image = cv2.imread(args.image) if args.image else synthetic_image(args.width, args.height)
+    if image is None:
+        raise SystemExit(f"cannot read image: {args.image}")
+
+    legacy = PreprocessingOperations()
+    reuse = PreprocessingOperations(reuse_buffers=True)
+    rows, mismatched = [], []
+    for preset, scale in COMBOS:
+        name = f"{preset}-{scale}"
+        a = measure(legacy, image, preset, scale, args.repeat)
+        b = measure(reuse, image, preset, scale, args.repeat)
+        same = encode_variant(legacy.apply_preset(image, preset, scale))[0] == encode_variant(reuse.apply_preset(image, preset, scale))[0]
+        if not same:
+            mismatched.append(name)
+        rows.append({"variant": name, "legacy": a, "reuse": b, "same_upload": same})
+        print(f"{name:22s} legacy {a['median_ms']:7.2f} ms {a['peak_kb']:9.0f} KB | "
+              f"reuse {b['median_ms']:7.2f} ms {b['peak_kb']:9.0f} KB new={b['new_buffers']} | same={same}")
+
+    total = {mode: {"median_ms": sum(r[mode]["median_ms"] for r in rows), "peak_kb": sum(r[mode]["peak_kb"] for r in rows)}
+             for mode in ("legacy", "reuse")}
+    print(f"{'total':22s} legacy {total['legacy']['median_ms']:7.2f} ms {total['legacy']['peak_kb']:9.0f} KB | "
+          f"reuse {total['reuse']['median_ms']:7.2f} ms {total['reuse']['peak_kb']:9.0f} KB")
+    print(f"pool: {thread_pool().stats()}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"shape": list(image.shape), "rows": rows, "total": total}, f, ensure_ascii=False, indent=2)
+    if mismatched:
+        print(f"FAIL: upload bytes differ for {', '.join(mismatched)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# scripts/ocr/change_detection.py
+"""表示領域の変化検出（dHashによる知覚ハッシュ）
+
+動画・連続フレームで、前回OCRしたフレームから表示が変わっていないフレームを
+OCRせずに読み取り値を使い回すために使う。
+"""
+from typing import Optional, Tuple
+import cv2
+import numpy as np
+
+from .preprocess.operations import PreprocessingOperations
+
+HASH_SIZE = 32   # 表示の一部の桁だけが変わる場合も拾えるよう細かめ
+# 明暗差がこれ以下の隣接セルは「差なし」とする（平坦な背景でノイズによりビットが揺れるのを防ぐ）
+HASH_MARGIN = 2
+
+
+def dhash(image: np.ndarray, hash_size: int = HASH_SIZE, margin: int = HASH_MARGIN) -> int:
+    """差分ハッシュ（隣接セルの明暗比較、hash_size^2 ビット）"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = (small[:, 1:] > small[:, :-1] + margin).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class ChangeDetector:
+    """前回OCRフレームとの表示領域のハッシュ距離で、OCRが必要か判定する
+
+    表示領域は extract_horizontal_rois の最大ROIを使い、OCRのたびに取り直す
+    （見つからなければフレーム全体）。max_skip フレーム連続で使い回したら強制的にOCRする。
+    """
+
+    def __init__(self, threshold: int = 4, max_skip: int = 0):
+        self.threshold = threshold
+        self.max_skip = max_skip
+        self.ops = PreprocessingOperations()
+        self.roi: Optional[Tuple[int, int, int, int]] = None
+        self.last_hash: Optional[int] = None
+        self.skipped = 0
+
+    def _region(self, frame: np.ndarray) -> np.ndarray:
+        return self.ops.crop_roi(frame, self.roi) if self.roi else frame
+
+    def check(self, frame: np.ndarray) -> Tuple[bool, Optional[int]]:
+        """(OCRが必要か, 前回OCRフレームとのハッシュ距離)"""
+        if self.last_hash is None:
+            return True, None
+        distance = hamming(dhash(self._region(frame)), self.last_hash)
+        if distance > self.threshold or (self.max_skip and self.skipped >= self.max_skip):
+            return True, distance
+        self.skipped += 1
+        return False, distance
+
+    def update(self, frame: np.ndarray, roi: Optional[Tuple[int, int, int, int]] = None):
+        """OCRしたフレームを基準として記録（roi 指定時はその領域で比較する）"""
+        if roi is None:
+            rois = self.ops.extract_horizontal_rois(frame, k=1)
+            roi = rois[0] if rois else None
+        self.roi = tuple(roi) if roi is not None else None
+        self.last_hash = dhash(self._region(frame))
+        self.skipped = 0
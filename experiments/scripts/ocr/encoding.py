@@ -0,0 +1,72 @@
+# scripts/ocr/encoding.py
+"""OCR送信用のエンコード（バリアントごとに形式・チャンネル数・品質・解像度を選ぶ）
+
+- 二値画像（_lcd_strong など）: 1チャンネルPNG（JPEGより小さく、ノイズも乗らない）
+- グレースケール（3チャンネルでもB=G=R）: 1チャンネルJPEG
+- カラー写真: JPEG（品質 JPEG_QUALITY）
+- 長辺が MAX_LONG_SIDE を超える場合は縮小（Azure Readの精度は上がらず転送量だけ増える）
+"""
+from typing import Any, Dict, Tuple
+import cv2
+import numpy as np
+
+JPEG_QUALITY = 90
+PNG_COMPRESSION = 3
+MAX_LONG_SIDE = 4096
+
+
+def _is_gray_bgr(image: np.ndarray) -> bool:
+    if image.ndim != 3 or image.shape[2] != 3:
+        return False
+    # 間引いて当たりを付けてから全画素で確認
+    sample = image[::16, ::16]
+    if not (np.array_equal(sample[..., 0], sample[..., 1]) and np.array_equal(sample[..., 1], sample[..., 2])):
+        return False
+    return np.array_equal(image[..., 0], image[..., 1]) and np.array_equal(image[..., 1], image[..., 2])
+
+
+def _is_binary(gray: np.ndarray) -> bool:
+    return cv2.countNonZero(cv2.inRange(gray, 1, 254)) == 0
+
+
+def encode_variant(image: np.ndarray, max_long_side: int = MAX_LONG_SIDE,
+                   jpeg_quality: int = JPEG_QUALITY) -> Tuple[bytes, Dict[str, Any]]:
+    """(送信バイト列, 情報) を返す。info["scale"] は送信画像/元バリアントの倍率"""
+    h, w = image.shape[:2]
+    scale = 1.0
+    if max_long_side and max(h, w) > max_long_side:
+        scale = max_long_side / float(max(h, w))
+        image = cv2.resize(image, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+    if _is_gray_bgr(image):
+        image = image[..., 0]
+    if image.ndim == 2 and _is_binary(image):
+        ok, buf = cv2.imencode(".png", image, [cv2.IMWRITE_PNG_COMPRESSION, PNG_COMPRESSION])
+        fmt = "png"
+    else:
+        ok, buf = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        fmt = "jpg"
+    if not ok:
+        raise ValueError("Failed to encode image")
+
+    channels = 1 if image.ndim == 2 else image.shape[2]
+    return buf.tobytes(), {"format": fmt, "channels": channels, "scale": scale}
+
+
+def encode_legacy(image: np.ndarray) -> Tuple[bytes, Dict[str, Any]]:
+    """従来どおりの既定品質JPEG（比較用）"""
+    _, buf = cv2.imencode(".jpg", image)
+    channels = 1 if image.ndim == 2 else image.shape[2]
+    return buf.tobytes(), {"format": "jpg", "channels": channels, "scale": 1.0}
+
+
+def rescale_lines(lines, scale: float):
+    """縮小して送信した場合、bounding_polygon をバリアント座標に戻す"""
+    if scale == 1.0:
+        return lines
+    inv = 1.0 / scale
+    for line in lines:
+        line["bounding_polygon"] = [{"x": p["x"] * inv, "y": p["y"] * inv} for p in line["bounding_polygon"]]
+        for word in line.get("words", []):
+            word["bounding_polygon"] = [{"x": p["x"] * inv, "y": p["y"] * inv} for p in word["bounding_polygon"]]
+    return lines
@@ -0,0 +1,71 @@
+# scripts/ocr/eval_seven_segment.py
+"""ローカル7セグ認識の閾値別カバー率・正解率（Azure呼び出しなし）
+
+OCR_LOCAL_THRESHOLD を決めるための評価。閾値以上で採用された画像の割合（=Azureを呼ばずに済む割合）と、
+採用分の正解率を出す。誤読がほぼ出ない最小の閾値を選ぶ。
+
+使い方（experiments/ から）:
+    python -m scripts.ocr.eval_seven_segment --glob "data_ocr/images/*.*" --gt eval/ocr/gt.csv
+"""
+import json, time, argparse, pathlib
+import cv2
+import numpy as np
+
+from .seven_segment import recognize
+from .numeric import smart_normalize
+from .replay_scorer import load_gt
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--glob", default="data_ocr/images/*.*", help="入力画像のglobパターン")
+    ap.add_argument("--gt", default="eval/ocr/gt.csv", help="正解CSV（filename,text_gt）")
+    ap.add_argument("--thresholds", default="0.5,0.7,0.8,0.85,0.9,0.95", help="比較する閾値（カンマ区切り）")
+    ap.add_argument("--out", default=None, help="画像ごとの結果を書き出すJSONL")
+    args = ap.parse_args()
+
+    paths = sorted(pathlib.Path().glob(args.glob))
+    if not paths:
+        raise SystemExit(f"no files for pattern: {args.glob}")
+    gt = load_gt(args.gt)
+
+    rows = []
+    for p in paths:
+        image = cv2.imread(str(p))
+        if image is None:
+            continue
+        t0 = time.perf_counter()
+        reading = recognize(image)
+        rows.append({
+            "image": p.name,
+            "text": smart_normalize(reading["text"]) if reading else "",
+            "confidence": reading["confidence"] if reading else 0.0,
+            "latency_ms": (time.perf_counter() - t0) * 1000.0,
+            "gt": gt.get(p.name),
+        })
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            for r in rows:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+    report = {
+        "images": len(rows),
+        "judged_with_gt": sum(1 for r in rows if r["gt"] is not None),
+        "latency_ms_mean": float(np.mean([r["latency_ms"] for r in rows])) if rows else None,
+        "latency_ms_p95": float(np.percentile([r["latency_ms"] for r in rows], 95)) if rows else None,
+    }
+    for t in (float(x) for x in args.thresholds.split(",")):
+        accepted = [r for r in rows if r["text"] and r["confidence"] >= t]
+        judged = [r for r in accepted if r["gt"] is not None]
+        wrong = [r for r in judged if r["text"] != r["gt"]]
+        report[f"conf>={t}"] = {
+            "coverage": len(accepted) / len(rows) if rows else None,
+            "accepted": len(accepted),
+            "judged_with_gt": len(judged),
+            "wrong": len(wrong),
+            "accuracy": 1 - len(wrong) / len(judged) if judged else None,
+        }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# scripts/ocr/image_io.py
+"""メモリ上限付きの画像デコード
+
+大きな画像はヘッダから縦横を読み取り、IMREAD_REDUCED_* で縮小デコードする
+（JPEGはDCT段階で縮小されるため、フル解像度の配列を一度も作らない）。
+"""
+import struct
+from typing import Optional, Tuple
+import cv2
+import numpy as np
+
+# 縮小率 → デコードフラグ
+_REDUCED_FLAGS = (
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+)
+
+# JPEGのSOFマーカー（DHT/JPG/DACを除くC0〜CF）
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def probe_size(img_bytes: bytes) -> Optional[Tuple[int, int]]:
+    """ヘッダのみから (幅, 高さ) を取得（JPEG/PNG、その他はNone）"""
+    if img_bytes[:8] == b"\x89PNG\r\n\x1a\n" and len(img_bytes) >= 24:
+        w, h = struct.unpack(">II", img_bytes[16:24])
+        return w, h
+
+    if img_bytes[:2] == b"\xff\xd8":
+        i, n = 2, len(img_bytes)
+        while i + 9 < n:
+            if img_bytes[i] != 0xFF:
+                i += 1
+                continue
+            marker = img_bytes[i + 1]
+            if marker == 0xFF:        # フィルバイト
+                i += 1
+                continue
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:   # 長さなしマーカー
+                i += 2
+                continue
+            seg_len = struct.unpack(">H", img_bytes[i + 2:i + 4])[0]
+            if marker in _JPEG_SOF:
+                h, w = struct.unpack(">HH", img_bytes[i + 5:i + 9])
+                return w, h
+            i += 2 + seg_len
+    return None
+
+
+def reduction_factor(size: Optional[Tuple[int, int]], max_pixels: int) -> int:
+    """max_pixels 以下に収まる最小の縮小率（1, 2, 4, 8）"""
+    if not max_pixels or size is None:
+        return 1
+    w, h = size
+    for factor, _ in ((1, None),) + _REDUCED_FLAGS:
+        if (w // factor) * (h // factor) <= max_pixels:
+            return factor
+    return _REDUCED_FLAGS[-1][0]
+
+
+def decode_bounded(img_bytes: bytes, max_pixels: int = 0) -> Tuple[Optional[np.ndarray], int]:
+    """BGR画像と縮小率を返す（max_pixels=0 なら通常デコード、失敗時は画像None）"""
+    buf = np.frombuffer(img_bytes, np.uint8)
+    factor = reduction_factor(probe_size(img_bytes) if max_pixels else None, max_pixels)
+    flag = dict(_REDUCED_FLAGS).get(factor, cv2.IMREAD_COLOR)
+    return cv2.imdecode(buf, flag), factor
+
+
+def cap_scale(shape, factor: float, max_pixels: int) -> float:
+    """拡大後の画素数が max_pixels を超えないよう倍率を抑える（max_pixels=0 なら無制限）"""
+    if not max_pixels:
+        return factor
+    h, w = shape[:2]
+    limit = (max_pixels / float(max(1, h * w))) ** 0.5
+    return min(factor, limit)
@@ -0,0 +1,85 @@
+# scripts/ocr/numeric.py
+"""数値抽出・正規化の共通モジュール（API・各スクリプト共通）"""
+import re
+from typing import List, Dict, Any, Tuple, Optional, Pattern
+
+# 数値らしい行の判定（℃を含む統一版）
+NUMERIC_RE = re.compile(r"^(?!.*[IO]/[IO])(?![IO]+$)(?![A-Z]+$)[0-9OIl:.,+\-_/\\()\s°C°F%℃]+$")
+
+# 明らかに非数値なパターン（大文字化して比較）
+_NON_NUMERIC = frozenset(['I/O', 'O/I', 'ON', 'OFF', 'IO', 'OI'])
+
+# 1パス正規化: 先頭の不要文字 / 数字間・コロン前後のスペースをまとめて除去
+#   ". 1 1:38" → "11:38", "1 :" → "1:", ": 38" → ":38"
+_CLEANUP_RE = re.compile(r"^[.\-\s]+|(?<=\d)\s+(?=[\d:])|(?<=:)\s+(?=\d)")
+
+_DIGIT_RE = re.compile(r"\d")
+
+# OCRの誤認識文字 → 数字
+_CONFUSABLE_TABLE = str.maketrans({"O": "0", "I": "1", "l": "1"})
+
+# 除外パターン（問題のあるもの）を1本の正規表現に結合
+_INVALID_PATTERNS = [
+    r'^\.',                         # .11:34
+    r'^0:\d{2}$',                  # 0:03
+    r'^\d{1,2}\.\d{3,}$',          # 10.004, 10.0045 (小数点以下3桁以上)
+    r'^\d+\.\s+\d+$',              # 10. 0045 (スペース入り小数)
+    r'^0{3,}$',                    # 000
+    r'^\d{1}[°℃°F%]$',            # 7℃
+    r'^[°℃°FC%]+$',                # C, ℃のみ
+    r'^\([IO]/[IO]\)$',            # (I/O), (O/I)
+]
+_INVALID_RE = re.compile("|".join(f"(?:{p})" for p in _INVALID_PATTERNS))
+
+
+def smart_normalize(text: str) -> str:
+    """シンプルな賢い正規化（1パス版）"""
+    if text.upper() in _NON_NUMERIC:
+        return text
+
+    cleaned = _CLEANUP_RE.sub("", text)
+
+    # 数字がある場合のみ文字置換
+    if _DIGIT_RE.search(cleaned):
+        cleaned = cleaned.translate(_CONFUSABLE_TABLE)
+
+    return cleaned
+
+
+def has_digit(text: str) -> bool:
+    return _DIGIT_RE.search(text) is not None
+
+
+def pick_numeric(lines: List[Dict[str, Any]], numeric_re: Optional[Pattern] = None) -> List[Dict[str, Any]]:
+    """数値らしい行を抽出して正規化結果を付与"""
+    pattern = numeric_re or NUMERIC_RE
+    out = []
+    for ln in lines:
+        text = ln["text"].strip()
+        if pattern.fullmatch(text):
+            out.append({**ln, "normalized": smart_normalize(text)})
+    return out
+
+
+def check_ocr_success(lines: List[Dict[str, Any]]) -> Tuple[bool, bool, List[Dict[str, Any]]]:
+    """OCR結果の成功判定を行う"""
+    found_any_line = len(lines) > 0
+    numeric_results = pick_numeric(lines)
+    found_numeric_like = len(numeric_results) > 0
+    return found_any_line, found_numeric_like, numeric_results
+
+
+def is_valid_numeric(text: str) -> bool:
+    """シンプルな数値妥当性判定"""
+    text = text.strip()
+
+    # 最小長チェック
+    if len(text.replace(" ", "")) < 2:
+        return False
+
+    if _INVALID_RE.match(text):
+        return False
+
+    # 数字が2桁以上あれば基本的にOK
+    digit_count = sum(1 for c in text if c.isdigit())
+    return digit_count >= 2
@@ -0,0 +1,90 @@
+# scripts/ocr/preprocess/buffers.py
+"""前処理用の再利用バッファ（スレッドごと）
+
+OpenCV関数の dst= に渡す出力先を (用途, 形状, dtype) ごとに保持し、カスケードの各バリアントで
+同じ大きさの一時配列を確保し直さないようにする。合計 max_bytes を超えたら古いものから手放す。
+返したバッファは同じスレッドで同じ用途・形状を次に要求されるまで有効（それ以降も使うならコピーする）。
+
+プールはカスケード1回分だけ使い、終わったら clear() で手放す（スレッドごとに溜め込むとワーカー数倍のメモリが残り続けるため）。
+全スレッドのプール合計も TOTAL_MAX_BYTES までで、超える分はプールせず毎回確保する。
+"""
+import threading
+from collections import OrderedDict
+from typing import Tuple
+
+import numpy as np
+
+# 1スレッドあたりの上限（超える大きさの配列はプールせず毎回確保）
+POOL_MAX_BYTES = 128 * 1024 * 1024
+# プロセス全体（全スレッドのプール合計）の上限
+TOTAL_MAX_BYTES = 512 * 1024 * 1024
+
+_total_lock = threading.Lock()
+_total_bytes = 0
+
+def _reserve(nbytes: int) -> bool:
+    global _total_bytes
+    with _total_lock:
+        if _total_bytes + nbytes > TOTAL_MAX_BYTES:
+            return False
+        _total_bytes += nbytes
+        return True
+
+def _release(nbytes: int):
+    global _total_bytes
+    with _total_lock:
+        _total_bytes -= nbytes
+
+def total_bytes() -> int:
+    return _total_bytes
+
+class BufferPool:
+    def __init__(self, max_bytes: int = POOL_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+        self.bytes = 0
+        self.allocations = 0
+        self.reuses = 0
+
+    def get(self, tag: str, shape, dtype=np.uint8) -> np.ndarray:
+        key = (tag, tuple(shape), np.dtype(dtype).str)
+        buf = self._items.get(key)
+        if buf is not None:
+            self._items.move_to_end(key)
+            self.reuses += 1
+            return buf
+
+        buf = np.empty(shape, dtype)
+        self.allocations += 1
+        if buf.nbytes > self.max_bytes:
+            return buf
+        # 自分のプールの古いものを先に手放してから、全体の上限内で保持する
+        while self._items and self.bytes + buf.nbytes > self.max_bytes:
+            self._evict()
+        if _reserve(buf.nbytes):
+            self._items[key] = buf
+            self.bytes += buf.nbytes
+        return buf
+
+    def _evict(self):
+        _, old = self._items.popitem(last=False)
+        self.bytes -= old.nbytes
+        _release(old.nbytes)
+
+    def clear(self):
+        """保持しているバッファを全て手放す（使用中の配列は参照が残る間は有効）"""
+        while self._items:
+            self._evict()
+
+    def stats(self):
+        return {"buffers": len(self._items), "bytes": self.bytes,
+                "allocations": self.allocations, "reuses": self.reuses}
+
+_local = threading.local()
+
+def thread_pool() -> BufferPool:
+    """呼び出しスレッド専用のプール（APIのスレッドプールのワーカーごとに1つ）"""
+    pool = getattr(_local, "pool", None)
+    if pool is None:
+        pool = _local.pool = BufferPool()
+    return pool
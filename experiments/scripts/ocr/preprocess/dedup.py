@@ -0,0 +1,85 @@
+# scripts/ocr/preprocess/dedup.py
+"""送信済みバリアントとほぼ同じバリアントの判定（サイズを揃えたdHash）
+
+同じリクエストで既に失敗したバリアントとハッシュ距離が max_distance 以内なら、OCRしても結果は変わらないとみなす。
+dHashは隣接セルの大小しか見ないので、違いが指紋に表れる組だけを比較する:
+- 同じプリセット・同じ領域（全体または同じROI）でスケールだけ違うもの
+- 二値画像とその反転（as-is と invert）
+プリセットが違うもの（CLAHE・二値化など）は、ハッシュが一致しても読みやすさが違うことがあるので比較しない。
+- 解像度: 失敗済みの方が同じか大きい場合だけ同一とみなす（拡大バリアントは小さい文字が読める可能性があるので残す）。
+  送信時は長辺 MAX_LONG_SIDE に縮小されるので、それ以上は同じ解像度として扱う
+- 縦横比が ASPECT_TOLERANCE 以上違うもの（ROIと全体など）は比較しない
+- コントラスト（輝度の標準偏差）が CONTRAST_TOLERANCE 以上違うもの、二値画像とそれ以外は比較しない
+  （dHashは明暗差の大きさを見ないため、低コントラスト画像とそのCLAHE結果を同一とみなしてしまう）
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from ..encoding import MAX_LONG_SIDE
+
+HASH_SIZE = 16   # 256ビット
+HASH_MARGIN = 2  # 明暗差がこれ以下の隣接セルは「差なし」
+ASPECT_TOLERANCE = 0.1
+CONTRAST_TOLERANCE = 0.15
+
+def fingerprint(image: np.ndarray, spec: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """dHash（通常・明暗反転）と比較条件
+
+    spec: バリアントのステージ仕様（preset/scale/roi）。比較してよい組の判定に使う
+    """
+    spec = spec or {}
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA).astype(np.int16)
+    diff = small[:, 1:] - small[:, :-1]
+    h, w = gray.shape[:2]
+    return {
+        "hash": int.from_bytes(np.packbits(diff > HASH_MARGIN).tobytes(), "big"),
+        # 反転画像では隣接セルの大小が逆になる
+        "inverted": int.from_bytes(np.packbits(diff < -HASH_MARGIN).tobytes(), "big"),
+        "binary": cv2.countNonZero(cv2.inRange(gray, 1, 254)) == 0,
+        "contrast": float(cv2.meanStdDev(gray)[1][0, 0]),
+        "shape": gray.shape[:2],
+        "aspect": w / float(h),
+        "long_side": min(max(h, w), MAX_LONG_SIDE),
+        "preset": spec.get("preset", "as-is"),
+        "roi": spec.get("roi"),
+    }
+
+def _hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def _inverse_pair(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    """二値画像とその反転（as-is と invert）の組"""
+    return a["binary"] and b["binary"] and {a["preset"], b["preset"]} == {"as-is", "invert"}
+
+class SimilarVariants:
+    """失敗したバリアントの指紋を保持し、新しいバリアントが既出かを判定する"""
+
+    def __init__(self, max_distance: int = 4):
+        self.max_distance = max_distance
+        self._seen: List[Tuple[Dict[str, Any], int]] = []
+
+    def match(self, fp: Dict[str, Any]) -> Optional[Tuple[int, int, Dict[str, Any]]]:
+        """同一とみなせる失敗済みバリアントの (試行番号, 距離, 指紋)。なければNone"""
+        best = None
+        for seen, attempt in self._seen:
+            if seen["roi"] != fp["roi"]:
+                continue
+            inverse = _inverse_pair(fp, seen)
+            if seen["preset"] != fp["preset"] and not inverse:
+                continue
+            if seen["long_side"] < fp["long_side"]:
+                continue
+            if abs(fp["aspect"] / seen["aspect"] - 1.0) > ASPECT_TOLERANCE or fp["binary"] != seen["binary"]:
+                continue
+            if abs(fp["contrast"] - seen["contrast"]) > CONTRAST_TOLERANCE * max(seen["contrast"], 1.0):
+                continue
+            distance = _hamming(fp["hash"], seen["inverted"] if inverse else seen["hash"])
+            if distance <= self.max_distance and (best is None or distance < best[1]):
+                best = (attempt, distance, seen)
+        return best
+
+    def add(self, fp: Dict[str, Any], attempt: int):
+        self._seen.append((fp, attempt))
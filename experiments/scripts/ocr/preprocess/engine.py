@@ -1,119 +1,257 @@
 # scripts/ocr/preprocess/engine.py
+import time
+from typing import Optional
+
 import cv2
 import numpy as np
-import re
 from .operations import PreprocessingOperations
+from .buffers import thread_pool
+from .plans import get_plan, iter_variants
+from .dedup import SimilarVariants, fingerprint
+from .resume import from_relative, to_relative, variant_key
+from .scoring import DEFAULT_ACCEPT_SCORE, candidate_features, score_features
 
 class PreprocessingEngine:
-    def __init__(self):
-        self.ops = PreprocessingOperations()
+    def __init__(self, accept_score: Optional[float] = DEFAULT_ACCEPT_SCORE, weights=None, max_variant_pixels: int = 0,
+                 reuse_buffers: bool = False, plan=None, similar_distance=None):
+        # plan: cascade_plans.yml の計画（get_plan の戻り値、Noneなら既定の計画）
+        self.plan = plan or get_plan()
+        # reuse_buffers: バリアントをスレッドごとの再利用バッファに書き出す（次のバリアントで上書きされる）
+        self.ops = PreprocessingOperations(max_pixels=max_variant_pixels, reuse_buffers=reuse_buffers)
+        self.reuse_buffers = reuse_buffers
+        # similar_distance: 失敗済みバリアントとのdHash距離がこれ以下ならOCRせずにスキップ（Noneなら無効）
+        self.similar_distance = similar_distance
+        # accept_score: None なら妥当な候補で終了（旧ルール）、inf なら打ち切らずに全試行（リプレイ用の記録）
+        self.accept_score = accept_score
+        self.weights = weights
         self.attempt_count = 0
+        self.final_stage = None
+        self.final_attempt = None
+        self.original_attempt = None
+        self.history = []
+        self.stages = []
+        self.skipped = []
+        self.accepted = False
+        self.outcomes = {}
+        self.rois = []
+        self._read = {}
+        self._similar = None
+        self._fallback = None
+    
+    def process_image(self, image: np.ndarray, ocr_callback, preferred_spec=None, resume=None):
+        """段階的前処理実行（ステージ構成は self.plan）
+
+        preferred_spec（前回採用されたステージ仕様）があれば、それを最初に試す。
+        resume（前回失敗時の resume_state）があれば、前回文字が読めなかったバリアントは試さず、
+        未試行のバリアント（前回のROIを含む）→ 前回失敗したバリアントの順に試す。素通し（S0）は常に試す。
+        前回は素通しで何も読めず今回は読めた場合は撮影条件が変わったとみなし、前回読めなかったものも後半で試す。
+        reuse_buffers の場合、終了時にこのスレッドの再利用バッファを手放す（返した画像は参照が残る間は有効）。
+        """
+        try:
+            return self._process_image(image, ocr_callback, preferred_spec, resume)
+        finally:
+            if self.reuse_buffers:
+                thread_pool().clear()
     
-    def process_image(self, image: np.ndarray, ocr_callback):
-        """段階的前処理実行"""
+    def _process_image(self, image: np.ndarray, ocr_callback, preferred_spec=None, resume=None):
         self.attempt_count = 0
+        self.final_stage = None
+        self.final_attempt = None
+        self.original_attempt = None
+        self.history = []
+        self.stages = []
+        self.skipped = []
+        self.accepted = False
+        self.outcomes = {}
+        self.rois = []
+        self._read = {}
+        self._similar = SimilarVariants(self.similar_distance) if self.similar_distance is not None else None
+        self._fallback = None
         
-        # S0: 素通し
-        if self._try_ocr(image, ocr_callback, "S0-original"):
-            return image
-        
-        # S1: 最小プリセット（液晶特化・小数点特化を追加）
-        for preset in ["invert", "clahe", "lcd_strong", "decimal_enhance"]:
-            processed = self.ops.apply_preset(image, preset)
-            if self._try_ocr(processed, ocr_callback, f"S1-{preset}"):
+        # P: 前回採用ステージの再適用（連続フレームでは大抵これで決まる）
+        if preferred_spec:
+            spec = self._spec(preferred_spec.get("preset", "as-is"), preferred_spec.get("scale", 1.0), preferred_spec.get("roi"))
+            processed = self._replay_safe(image, spec)
+            if processed is not None and self._attempt(processed, ocr_callback, "P-preferred", spec) == "accepted":
                 return processed
         
-        # S2: スケール×プリセット（closing-1.5を最優先）
-        scales = [0.75, 0.5, 1.5, 2.0]
+        passes = [None]
+        hint_rois = None
+        if resume:
+            previous = {k: "blank" for k in resume.get("blank", [])}
+            previous.update({k: "failed" for k in resume.get("failed", [])})
+            self.outcomes = dict(previous)
+            hint_rois = from_relative(resume.get("rois", []), image.shape)
+            original_key = variant_key(self._spec())
+            
+            def retry(key, original):
+                if original:
+                    return False
+                changed = previous.get(original_key) == "blank" and self._read.get(original_key, False)
+                return previous.get(key) == "failed" or (changed and previous.get(key) == "blank")
+            
+            passes = [lambda key, original: original or key not in previous, retry]
         
-        # 最優先: closing-1.5
-        processed = self.ops.apply_preset(image, "closing", 1.5)
-        if self._try_ocr(processed, ocr_callback, "S2-closing-1.5"):
-            return processed
+        for select in passes:
+            for stage in self.plan["stages"]:
+                accepted = self._run_stage(stage, image, ocr_callback, select, hint_rois)
+                if accepted is not None:
+                    return accepted
         
-        # 残りの組み合わせ
-        for scale in scales:
-            presets = ["invert", "clahe", "closing"]
-            if scale <= 1.0:  # 縮小時のみas-is追加
-                presets.append("as-is")
-                
-            for preset in presets:
-                # closing-1.5は既に試行済みなのでスキップ
-                if preset == "closing" and scale == 1.5:
-                    continue
-                    
-                processed = self.ops.apply_preset(image, preset, scale)
-                if self._try_ocr(processed, ocr_callback, f"S2-{preset}-{scale}"):
-                    return processed
-        
-        # S3: ROIフォールバック（最後の救済手段）
-        rois = self.ops.extract_horizontal_rois(image, k=3)
-        for roi_idx, roi_coords in enumerate(rois):
-            roi_image = self.ops.crop_roi(image, roi_coords)
-            
-            # ROIが小さすぎる場合はスキップ
-            if roi_image.shape[0] < 20 or roi_image.shape[1] < 50:
-                continue
-                
-            # S2と同じスケール×プリセット順序
-            for scale in scales:
-                presets = ["invert", "clahe", "closing"]
-                if scale <= 1.0:
-                    presets.append("as-is")
-                    
-                for preset in presets:
-                    processed = self.ops.apply_preset(roi_image, preset, scale)
-                    if self._try_ocr(processed, ocr_callback, f"S3-roi{roi_idx}-{preset}-{scale}"):
-                        return processed
+        # 閾値を超える候補がなければ、最もスコアの高かった試行を採用
+        if self._fallback is not None:
+            _, fallback_image, self.final_stage, self.final_attempt = self._fallback
+            return fallback_image
         
         return image  # 全て失敗
     
-    def _is_valid_numeric(self, numeric_results):
-        """シンプルな数値妥当性判定"""
-        if not numeric_results:
-            return False
-        
-        text = numeric_results[0]["normalized"].strip()
-        
-        # 最小長チェック
-        if len(text.replace(" ", "")) < 2:
-            return False
-        
-        # 除外パターン（問題のあるもの）
-        exclude_patterns = [
-            r'^\.',                         # .11:34
-            r'^0:\d{2}$',                  # 0:03  
-            r'^\d{1,2}\.\d{3,}$',          # 10.004, 10.0045 (小数点以下3桁以上)
-            r'^\d+\.\s+\d+$',              # 10. 0045 (スペース入り小数)
-            r'^0{3,}$',                    # 000
-            r'^\d{1}[°℃°F%]$',            # 7℃
-            r'^[°℃°FC%]+$',                # C, ℃のみ
-            r'^\([IO]/[IO]\)$',            # (I/O), (O/I)
-        ]
-        
-        if any(re.match(p, text) for p in exclude_patterns):
-            return False
-        
-        # 数字が2桁以上あれば基本的にOK
-        digit_count = sum(1 for c in text if c.isdigit())
-        return digit_count >= 2
+    def _run_stage(self, stage, image: np.ndarray, ocr_callback, select=None, hint_rois=None):
+        """ステージの試行を max_attempts / max_ms の範囲で順に行い、採用されたバリアントを返す
+
+        select(key, original): 試すバリアントの選択（再開時）
+        """
+        max_attempts = stage.get("max_attempts")
+        max_ms = stage.get("max_ms")
+        priority_combos = {(p, float(s)) for p, s in stage.get("priority", [])}
+        record = {"stage": stage["name"], "attempts": 0, "skipped": 0, "elapsed_ms": 0.0, "stopped": None}
+        self.stages.append(record)
+        t0 = time.perf_counter()
+        try:
+            for stage_name, spec, build in iter_variants(stage, image, self.ops, hint_rois):
+                if select is not None and not select(variant_key(spec), stage.get("original", False)):
+                    continue
+                if max_attempts is not None and record["attempts"] >= max_attempts:
+                    record["stopped"] = "max_attempts"
+                    break
+                if max_ms is not None and (time.perf_counter() - t0) * 1000.0 >= max_ms:
+                    record["stopped"] = "max_ms"
+                    break
+                processed = build()
+                # priority は計画で明示した組なので、似ていても必ず送る
+                priority = (spec["preset"], float(spec["scale"])) in priority_combos
+                outcome = self._attempt(processed, ocr_callback, stage_name, spec, stage.get("original", False),
+                                        skippable=not priority)
+                record["skipped" if outcome == "skipped" else "attempts"] += 1
+                if outcome == "accepted":
+                    return processed
+            return None
+        finally:
+            record["elapsed_ms"] = round((time.perf_counter() - t0) * 1000.0, 1)
     
-    def _try_ocr(self, image, ocr_callback, stage_name):
-        """OCR試行と厳格な早期終了判定"""
+    def _attempt(self, processed, ocr_callback, stage_name, spec, original: bool = False, skippable: bool = True):
+        """1バリアントの試行（"accepted" / "failed" / "skipped"）
+
+        original: 素通しの試行（全失敗時はこの試行の結果を使う。スキップ時は同じ大きさなら同一とみなした試行の結果）
+        skippable: False なら似たバリアントが失敗済みでも送る（失敗した場合は指紋を記録する）
+        """
+        fp = fingerprint(processed, spec) if self._similar is not None else None
+        if fp is not None and skippable:
+            match = self._similar.match(fp)
+            if match is not None:
+                attempt, distance, seen = match
+                print(f"Skip ({stage_name}): similar to attempt {attempt} (distance={distance})")
+                self.skipped.append({"stage": stage_name, "similar_to": attempt, "distance": distance})
+                if original and seen["shape"] == fp["shape"]:
+                    self.original_attempt = attempt
+                return "skipped"
+        if original:
+            self.original_attempt = self.attempt_count + 1
+        if self._try_ocr(processed, ocr_callback, stage_name, spec):
+            return "accepted"
+        if fp is not None:
+            self._similar.add(fp, self.attempt_count)
+        return "failed"
+    
+    def resume_state(self, image_shape):
+        """撮り直し時に渡す状態（試行結果と、最良候補・試したROIの比率座標）"""
+        rois = []
+        if self._fallback is not None and self._fallback[2].get("roi") is not None:
+            rois.append(self._fallback[2]["roi"])
+        rois += [r for r in self.rois if r not in rois]
+        return {
+            "plan": self.plan["name"],
+            "blank": sorted(k for k, v in self.outcomes.items() if v == "blank"),
+            "failed": sorted(k for k, v in self.outcomes.items() if v == "failed"),
+            "rois": to_relative(rois, image_shape),
+        }
+    
+    def replay(self, image: np.ndarray, spec):
+        """記録済みのステージ仕様（preset/scale/ROI）だけを再適用"""
+        if not spec:
+            return image
+        if spec.get("roi") is not None:
+            image = self.ops.crop_roi(image, spec["roi"])
+        return self.ops.apply_preset(image, spec.get("preset", "as-is"), spec.get("scale", 1.0))
+    
+    def _replay_safe(self, image: np.ndarray, spec):
+        """ROIが画像外・小さすぎる場合はNone（フレームサイズが変わった場合など）"""
+        roi = spec.get("roi")
+        if roi is not None:
+            x, y, w, h = roi
+            if x + w > image.shape[1] or y + h > image.shape[0] or h < 20 or w < 50:
+                return None
+        return self.replay(image, spec)
+    
+    @staticmethod
+    def _spec(preset: str = "as-is", scale: float = 1.0, roi=None):
+        """再現可能なステージ仕様（ROI座標は元画像基準）"""
+        return {
+            "preset": preset,
+            "scale": scale,
+            "roi": list(roi) if roi is not None else None,
+        }
+    
+    def _try_ocr(self, image, ocr_callback, stage_name, spec):
+        """OCR試行とスコアによる早期終了判定"""
         self.attempt_count += 1
         found_any_line, found_numeric_like, numeric_results = ocr_callback(image)
+        if stage_name != "P-preferred":
+            # 1度でも文字行が読めたバリアントは blank にしない（ROIごとの結果をまとめる）
+            key = variant_key(spec)
+            self._read[key] = self._read.get(key, False) or found_any_line
+            read_something = found_any_line or self.outcomes.get(key) == "failed"
+            self.outcomes[key] = "failed" if read_something else "blank"
+            if spec.get("roi") is not None and spec["roi"] not in self.rois:
+                self.rois.append(spec["roi"])
         
         print(f"Attempt {self.attempt_count} ({stage_name}): "
               f"line={found_any_line}, numeric={found_numeric_like}")
         
-        # 厳格な終了条件
-        if found_any_line and found_numeric_like:
-            # さらに数値の妥当性をチェック
-            valid_numeric = self._is_valid_numeric(numeric_results)
-            if valid_numeric:
-                print(f"  → Valid numeric found: {numeric_results[0]['normalized']}")
-                return True
-            else:
-                print(f"  → Invalid numeric rejected: {numeric_results[0]['normalized'] if numeric_results else 'None'}")
+        # 全候補を信頼度・文字高さ・位置でスコアリング
+        features = [candidate_features(c, image.shape) for c in numeric_results]
+        scores = [score_features(f, self.weights) for f in features]
+        self.history.append({
+            "attempt": self.attempt_count,
+            "stage": stage_name,
+            "candidates": [{**f, "score": s} for f, s in zip(features, scores)],
+        })
+        
+        if not (found_any_line and found_numeric_like) or not scores:
+            return False
+        
+        best_idx = max(range(len(scores)), key=lambda i: (scores[i], features[i]["valid"]))
+        best_text, best_score = features[best_idx]["normalized"], scores[best_idx]
+        stage = {"name": stage_name, **spec, "score": best_score}
+        
+        if self.accept_score is None:
+            accept = any(f["valid"] for f in features)
+        else:
+            accept = best_score >= self.accept_score
+        if accept:
+            print(f"  → Accepted: {best_text} (score={best_score:.2f})")
+            self.final_stage = stage
+            self.final_attempt = self.attempt_count
+            self.accepted = True
+            return True
+        
+        if best_score > 0.0:
+            # 低スコアでは止めず、最良候補として保持して続行
+            print(f"  → Low score, continue: {best_text} (score={best_score:.2f})")
+            if self._fallback is None or best_score > self._fallback[0]:
+                # 再利用バッファは後続のバリアントで上書きされるので複製して保持
+                kept = image.copy() if self.reuse_buffers else image
+                self._fallback = (best_score, kept, stage, self.attempt_count)
+        else:
+            print(f"  → Invalid numeric rejected: {best_text}")
         
-        return False
\ No newline at end of file
+        return False
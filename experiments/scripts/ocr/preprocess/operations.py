@@ -2,18 +2,46 @@
 import cv2
 import numpy as np
 
+from ..image_io import cap_scale
+from .buffers import thread_pool
+
+# 液晶用ガンマ補正テーブル（gamma=0.4）
+LCD_GAMMA_TABLE = np.array([((i / 255.0) ** 0.4) * 255 for i in range(256)]).astype("uint8")
+
 class PreprocessingOperations:
-    def __init__(self):
+    def __init__(self, max_pixels: int = 0, reuse_buffers: bool = False):
+        # 拡大系バリアントの画素数上限（0なら無制限）
+        self.max_pixels = max_pixels
+        # スレッドごとの再利用バッファに書き出す（dst=）。グレースケールの結果はBGRに戻さずそのまま返す
+        self.reuse_buffers = reuse_buffers
         self.clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
         self.clahe_strong = cv2.createCLAHE(clipLimit=5.0, tileGridSize=(4, 4))
+        self.clahe_mild = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    
+    def _out(self, tag: str, shape):
+        """出力先バッファ。再利用モードでなければNone（OpenCVが新規に確保する）"""
+        if not self.reuse_buffers:
+            return None
+        return thread_pool().get(tag, shape)
+    
+    def _gray(self, image):
+        if len(image.shape) == 3:
+            return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=self._out("gray", image.shape[:2]))
+        return image
+    
+    def _as_output(self, gray):
+        """グレースケールの結果を返す（従来モードはOCRエンジン向けにBGRへ戻す）"""
+        if self.reuse_buffers:
+            return gray
+        return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
     
     def apply_preset(self, image: np.ndarray, preset: str, scale: float = 1.0):
         """プリセット適用"""
-        # スケーリング
+        # スケーリング（等倍はコピーしない。各プリセットは新しい配列を返す）
         if scale != 1.0:
             processed = self._scale(image, scale)
         else:
-            processed = image.copy()
+            processed = image
         
         # プリセット適用
         if preset == "invert":
@@ -69,29 +97,24 @@ class PreprocessingOperations:
     
     def _lcd_strong(self, image):
         """液晶ディスプレイ特化の強力な前処理"""
-        # グレースケール変換
-        if len(image.shape) == 3:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = image.copy()
+        gray = self._gray(image)
+        shape = gray.shape
         
         # 1. ガンマ補正で暗部を明るく（暗い液晶文字を強調）
-        gamma = 0.4
-        gamma_table = np.array([((i / 255.0) ** gamma) * 255 for i in range(256)]).astype("uint8")
-        enhanced = cv2.LUT(gray, gamma_table)
+        enhanced = cv2.LUT(gray, LCD_GAMMA_TABLE, dst=self._out("lcd_gamma", shape))
         
         # 2. 強化CLAHE（コントラスト大幅向上）
-        clahe_result = self.clahe_strong.apply(enhanced)
+        clahe_result = self.clahe_strong.apply(enhanced, dst=self._out("lcd_clahe", shape))
         
         # 3. アンシャープマスク（エッジ強調）
-        gaussian = cv2.GaussianBlur(clahe_result, (0, 0), 2.0)
-        unsharp = cv2.addWeighted(clahe_result, 2.0, gaussian, -1.0, 0)
+        gaussian = cv2.GaussianBlur(clahe_result, (0, 0), 2.0, dst=self._out("lcd_blur", shape))
+        unsharp = cv2.addWeighted(clahe_result, 2.0, gaussian, -1.0, 0, dst=self._out("lcd_unsharp", shape))
         
         # 4. 適応二値化で最終調整
-        binary = cv2.adaptiveThreshold(unsharp, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 7, 2)
+        binary = cv2.adaptiveThreshold(unsharp, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 7, 2,
+                                       dst=self._out("lcd_binary", shape))
         
-        # カラー画像として返す（OCRエンジンの要求に合わせて）
-        return cv2.cvtColor(binary, cv2.COLOR_GRAY2BGR)
+        return self._as_output(binary)
     
     def _nms_rects(self, rects, overlap_thresh):
         """矩形のNMS"""
@@ -124,51 +147,57 @@ class PreprocessingOperations:
         return [tuple(map(int, rects[i])) for i in keep]
     
     def _scale(self, image, factor):
+        factor = cap_scale(image.shape, factor, self.max_pixels)
         h, w = image.shape[:2]
         new_size = (int(w * factor), int(h * factor))
         interp = cv2.INTER_AREA if factor < 1.0 else cv2.INTER_CUBIC
-        return cv2.resize(image, new_size, interpolation=interp)
+        dst = self._out("scale", (new_size[1], new_size[0]) + image.shape[2:])
+        return cv2.resize(image, new_size, dst=dst, interpolation=interp)
     
     def _invert(self, image):
-        return cv2.bitwise_not(image)
+        return cv2.bitwise_not(image, dst=self._out("invert", image.shape))
     
     def _clahe(self, image):
         if len(image.shape) == 3:
-            lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-            l, a, b = cv2.split(lab)
-            l = self.clahe.apply(l)
-            return cv2.cvtColor(cv2.merge([l, a, b]), cv2.COLOR_LAB2BGR)
-        return self.clahe.apply(image)
+            # L チャンネルだけ取り出して戻す（split/merge で3チャンネル分を確保しない）
+            lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB, dst=self._out("lab", image.shape))
+            l = cv2.extractChannel(lab, 0, dst=self._out("lab_l", image.shape[:2]))
+            l = self.clahe.apply(l, dst=self._out("lab_l_eq", image.shape[:2]))
+            cv2.insertChannel(l, lab, 0)
+            return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=self._out("clahe", image.shape))
+        return self.clahe.apply(image, dst=self._out("clahe", image.shape))
     
     def _closing(self, image):
         kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 2))
         if len(image.shape) == 3:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            closed = cv2.morphologyEx(gray, cv2.MORPH_CLOSE, kernel)
-            return cv2.cvtColor(closed, cv2.COLOR_GRAY2BGR)
-        return cv2.morphologyEx(image, cv2.MORPH_CLOSE, kernel)
+            gray = self._gray(image)
+            closed = cv2.morphologyEx(gray, cv2.MORPH_CLOSE, kernel, dst=self._out("closing", gray.shape))
+            return self._as_output(closed)
+        return cv2.morphologyEx(image, cv2.MORPH_CLOSE, kernel, dst=self._out("closing", image.shape))
     
     def _decimal_enhance(self, image):
         """小数点検出特化の前処理"""
-        # グレースケール変換
-        if len(image.shape) == 3:
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = image.copy()
+        gray = self._gray(image)
         
         # 1. 強い拡大（小数点を大きく）
-        enlarged = cv2.resize(gray, None, fx=2.5, fy=2.5, interpolation=cv2.INTER_CUBIC)
+        factor = cap_scale(gray.shape, 2.5, self.max_pixels)
+        if self.reuse_buffers:
+            h, w = gray.shape
+            size = (int(round(w * factor)), int(round(h * factor)))
+            enlarged = cv2.resize(gray, size, dst=self._out("dec_enlarged", (size[1], size[0])),
+                                  interpolation=cv2.INTER_CUBIC)
+        else:
+            enlarged = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_CUBIC)
+        shape = enlarged.shape
         
         # 2. ガウシアンブラーで滑らか化
-        blurred = cv2.GaussianBlur(enlarged, (3, 3), 0.5)
+        blurred = cv2.GaussianBlur(enlarged, (3, 3), 0.5, dst=self._out("dec_blur", shape))
         
         # 3. 穏やかなCLAHE（小数点を潰さない）
-        clahe_mild = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        enhanced = clahe_mild.apply(blurred)
+        enhanced = self.clahe_mild.apply(blurred, dst=self._out("dec_clahe", shape))
         
         # 4. アンシャープマスク（エッジ強調）
-        gaussian = cv2.GaussianBlur(enhanced, (0, 0), 1.0)
-        unsharp = cv2.addWeighted(enhanced, 1.5, gaussian, -0.5, 0)
+        gaussian = cv2.GaussianBlur(enhanced, (0, 0), 1.0, dst=self._out("dec_gauss", shape))
+        unsharp = cv2.addWeighted(enhanced, 1.5, gaussian, -0.5, 0, dst=self._out("dec_unsharp", shape))
         
-        # カラー画像として返す
-        return cv2.cvtColor(unsharp, cv2.COLOR_GRAY2BGR)
\ No newline at end of file
+        return self._as_output(unsharp)
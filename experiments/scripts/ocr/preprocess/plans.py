@@ -0,0 +1,104 @@
+# scripts/ocr/preprocess/plans.py
+"""カスケード計画（cascade_plans.yml）の読み込みと、ステージごとのバリアント列挙"""
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import yaml
+
+from .resume import overlaps
+
+PLANS_FILE = Path(__file__).with_name("cascade_plans.yml")
+
+PRESETS = {"as-is", "invert", "clahe", "closing", "lcd_strong", "decimal_enhance"}
+STAGE_KEYS = {"name", "original", "priority", "scales", "presets", "shrink_presets", "roi", "max_attempts", "max_ms"}
+
+# (試行名, ステージ仕様, バリアント生成関数)
+Variant = Tuple[str, Dict[str, Any], Callable[[], np.ndarray]]
+
+def _check_stage(plan_name: str, stage: Dict[str, Any]):
+    where = f"plan '{plan_name}' stage '{stage.get('name')}'"
+    if not stage.get("name"):
+        raise ValueError(f"plan '{plan_name}': stage without name")
+    unknown = set(stage) - STAGE_KEYS
+    if unknown:
+        raise ValueError(f"{where}: unknown keys {sorted(unknown)}")
+    presets = list(stage.get("presets", [])) + list(stage.get("shrink_presets", []))
+    presets += [p for p, _ in stage.get("priority", [])]
+    bad = [p for p in presets if p not in PRESETS]
+    if bad:
+        raise ValueError(f"{where}: unknown presets {bad}")
+    if any(float(s) <= 0 for s in stage.get("scales", [])) or any(float(s) <= 0 for _, s in stage.get("priority", [])):
+        raise ValueError(f"{where}: scales must be positive")
+
+@lru_cache(maxsize=4)
+def load_plans(path: Optional[str] = None) -> Dict[str, Any]:
+    """{"default": 名前, "plans": {名前: {"name", "stages"}}}（path未指定なら同梱のYAML）"""
+    with open(path or PLANS_FILE, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    plans = {}
+    for name, plan in (data.get("plans") or {}).items():
+        stages = plan.get("stages") or []
+        for stage in stages:
+            _check_stage(name, stage)
+        plans[name] = {"name": name, "stages": stages}
+    default = data.get("default")
+    if default not in plans:
+        raise ValueError(f"default plan '{default}' is not defined in {path or PLANS_FILE}")
+    return {"default": default, "plans": plans}
+
+def plan_names(path: Optional[str] = None) -> List[str]:
+    return list(load_plans(path)["plans"])
+
+def get_plan(name: Optional[str] = None, path: Optional[str] = None) -> Dict[str, Any]:
+    """名前で計画を取得（Noneなら default）。未定義の名前は KeyError"""
+    data = load_plans(path)
+    name = name or data["default"]
+    if name not in data["plans"]:
+        raise KeyError(f"unknown cascade plan: {name}")
+    return data["plans"][name]
+
+def _combos(stage: Dict[str, Any]) -> List[Tuple[str, float]]:
+    """priority → スケール×プリセットの順（priority と重複する組は除く）"""
+    priority = [(p, float(s)) for p, s in stage.get("priority", [])]
+    combos = list(priority)
+    for scale in (float(s) for s in stage.get("scales", [1.0])):
+        presets = list(stage.get("presets", []))
+        if scale <= 1.0:
+            presets += stage.get("shrink_presets", [])
+        combos += [(p, scale) for p in presets if (p, scale) not in priority]
+    return combos
+
+def iter_variants(stage: Dict[str, Any], image: np.ndarray, ops, hint_rois=None) -> Iterator[Variant]:
+    """ステージの試行を順に返す（画像は呼び出し側が必要になった時点で生成する）
+
+    hint_rois: ROIステージで検出結果より先に試すROI（前回の撮影で見つかったもの）。重なる検出結果は除く
+    """
+    name = stage["name"]
+    if stage.get("original"):
+        yield f"{name}-original", {"preset": "as-is", "scale": 1.0, "roi": None}, lambda: image
+        return
+
+    combos = _combos(stage)
+    roi = stage.get("roi")
+    if roi is None:
+        # スケール1.0だけのステージ（S1）は試行名にスケールを付けない
+        plain = "priority" not in stage and [float(s) for s in stage.get("scales", [1.0])] == [1.0]
+        for preset, scale in combos:
+            label = f"{name}-{preset}" if plain else f"{name}-{preset}-{scale}"
+            yield label, {"preset": preset, "scale": scale, "roi": None}, \
+                lambda p=preset, s=scale: ops.apply_preset(image, p, s)
+        return
+
+    hints = [tuple(r) for r in (hint_rois or [])]
+    detected = ops.extract_horizontal_rois(image, k=roi.get("k", 3))
+    rois = hints + [r for r in detected if not any(overlaps(r, h) for h in hints)]
+    for roi_idx, roi_coords in enumerate(rois):
+        roi_image = ops.crop_roi(image, roi_coords)
+        # ROIが小さすぎる場合はスキップ
+        if roi_image.shape[0] < roi.get("min_height", 20) or roi_image.shape[1] < roi.get("min_width", 50):
+            continue
+        for preset, scale in combos:
+            yield f"{name}-roi{roi_idx}-{preset}-{scale}", {"preset": preset, "scale": scale, "roi": list(roi_coords)}, \
+                lambda img=roi_image, p=preset, s=scale: ops.apply_preset(img, p, s)
@@ -0,0 +1,37 @@
+# scripts/ocr/preprocess/resume.py
+"""撮り直し時のカスケード再開用の状態（前回の試行結果とROI）
+
+状態は {"plan", "blank", "failed", "rois"} の辞書で、APIが署名付きトークンにして返す。
+- blank: 文字行が1つも読めなかったバリアント（この場面では無駄とみなし、再開時は試さない）
+- failed: 文字は読めたが数値として採用できなかったバリアント（再開時は未試行のものの後に回す）
+- rois: 前回のROI（画像サイズに対する比率 x, y, w, h）。再開時はROI検出結果より先に試す
+バリアントは preset@scale で識別し、ROI上のバリアントは座標を含めず roi: を付ける（撮り直しでROIは変わるため）。
+"""
+from typing import Any, Dict, List, Sequence
+
+MAX_ROIS = 5
+
+def variant_key(spec: Dict[str, Any]) -> str:
+    prefix = "roi:" if spec.get("roi") is not None else ""
+    return f"{prefix}{spec['preset']}@{float(spec['scale'])}"
+
+def to_relative(rois: Sequence[Sequence[int]], shape: Sequence[int]) -> List[List[float]]:
+    h, w = shape[:2]
+    return [[round(x / w, 4), round(y / h, 4), round(rw / w, 4), round(rh / h, 4)] for x, y, rw, rh in rois[:MAX_ROIS]]
+
+def from_relative(rois: Sequence[Sequence[float]], shape: Sequence[int]) -> List[List[int]]:
+    """比率のROIを画像座標に戻す（画像外ははみ出さないよう切り詰め）"""
+    h, w = shape[:2]
+    result = []
+    for rx, ry, rw, rh in rois[:MAX_ROIS]:
+        x, y = max(0, int(rx * w)), max(0, int(ry * h))
+        result.append([x, y, min(w - x, int(rw * w)), min(h - y, int(rh * h))])
+    return result
+
+def overlaps(a: Sequence[int], b: Sequence[int], threshold: float = 0.5) -> bool:
+    """IoUが threshold 以上か"""
+    ix = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return union > 0 and inter / union >= threshold
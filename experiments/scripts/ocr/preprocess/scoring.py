@@ -0,0 +1,88 @@
+# scripts/ocr/preprocess/scoring.py
+"""数値候補のスコアリング（単語信頼度・文字高さ・画像内位置）"""
+import json
+import math
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Sequence
+
+from ..numeric import is_valid_numeric
+
+# replay_scorer.py --search --write で記録データから選んだ閾値・重み（あればこちらを使う）
+PARAMS_FILE = Path(__file__).with_name("scorer_params.json")
+
+# 重み（合計1.0）。計測前の暫定値で、候補の順位付けにだけ使う
+DEFAULT_WEIGHTS = {"confidence": 0.6, "height": 0.25, "position": 0.15}
+# この値以上のスコアなら早期終了。None なら旧ルール相当（妥当な候補があれば終了）
+# 閾値は記録データで計測するまで使わない
+DEFAULT_ACCEPT_SCORE: Optional[float] = None
+# confidenceが取れない場合の中立値
+MISSING_CONFIDENCE = 0.5
+# 画像高さに対する文字高さがこの比率以上なら高さスコア満点
+FULL_HEIGHT_RATIO = 0.1
+
+
+def load_params(path: Path = PARAMS_FILE):
+    """(重み, 閾値)。ファイルがなければ暫定値"""
+    if not path.exists():
+        return DEFAULT_WEIGHTS, DEFAULT_ACCEPT_SCORE
+    with open(path, "r", encoding="utf-8") as f:
+        params = json.load(f)
+    weights = params["weights"]
+    if set(weights) != set(DEFAULT_WEIGHTS):
+        raise ValueError(f"{path}: weights must have keys {sorted(DEFAULT_WEIGHTS)}")
+    return weights, float(params["accept_score"])
+
+
+DEFAULT_WEIGHTS, DEFAULT_ACCEPT_SCORE = load_params()
+
+
+def candidate_features(candidate: Dict[str, Any], image_shape: Sequence[int]) -> Dict[str, Any]:
+    """スコア計算用の特徴量（リプレイ用にそのまま保存できる形）"""
+    img_h, img_w = image_shape[:2]
+
+    confs = [w["confidence"] for w in candidate.get("words", []) if w.get("confidence") is not None]
+    confidence = sum(confs) / len(confs) if confs else None
+
+    height_ratio = 0.0
+    center_offset = 1.0
+    polygon = candidate.get("bounding_polygon") or []
+    if polygon and img_h > 0 and img_w > 0:
+        xs = [pt["x"] for pt in polygon]
+        ys = [pt["y"] for pt in polygon]
+        height_ratio = (max(ys) - min(ys)) / img_h
+        # 画像中心からの距離（半対角線で正規化、0=中心, 1=隅）
+        cx = (max(xs) + min(xs)) / 2.0
+        cy = (max(ys) + min(ys)) / 2.0
+        center_offset = min(1.0, math.hypot(cx - img_w / 2.0, cy - img_h / 2.0) / math.hypot(img_w / 2.0, img_h / 2.0))
+
+    return {
+        "normalized": candidate["normalized"],
+        "valid": is_valid_numeric(candidate["normalized"]),
+        "confidence": confidence,
+        "height_ratio": height_ratio,
+        "center_offset": center_offset,
+    }
+
+
+def score_features(features: Dict[str, Any], weights: Optional[Dict[str, float]] = None) -> float:
+    """特徴量からスコア(0〜1)を計算。妥当性判定で落ちる候補は0"""
+    if not features["valid"]:
+        return 0.0
+    weights = weights or DEFAULT_WEIGHTS
+    confidence = features["confidence"] if features["confidence"] is not None else MISSING_CONFIDENCE
+    height = min(1.0, features["height_ratio"] / FULL_HEIGHT_RATIO)
+    position = 1.0 - features["center_offset"]
+    return (weights["confidence"] * confidence
+            + weights["height"] * height
+            + weights["position"] * position)
+
+
+def rank_candidates(numeric_results: List[Dict[str, Any]], image_shape: Sequence[int],
+                    weights: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """全数値候補にscoreを付与し、スコア降順で返す（同点は元の順序）"""
+    ranked = []
+    for cand in numeric_results:
+        score = score_features(candidate_features(cand, image_shape), weights)
+        ranked.append({**cand, "score": score})
+    ranked.sort(key=lambda c: c["score"], reverse=True)
+    return ranked
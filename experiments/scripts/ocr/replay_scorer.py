@@ -0,0 +1,140 @@
+# scripts/ocr/replay_scorer.py
+"""記録済みの試行履歴で早期終了ルールをリプレイ比較（Azure呼び出しなし）
+
+run_ocr.py の results.jsonl に含まれる preprocessing.history を使い、
+旧ルール（先頭候補が妥当なら終了）とスコアによる終了判定を比較する。
+履歴は run_ocr.py --full-history で記録する（通常の実行は採用時点で打ち切られ、それより遅く止まるルールを評価できない）。
+
+使い方（experiments/ から）:
+    python -m scripts.ocr.run_ocr --glob "data_ocr/images/*.*" --full-history --outdir runs/ocr/full
+    python -m scripts.ocr.replay_scorer --results-dir runs/ocr/full --gt eval/ocr/gt.csv
+    # 重み・閾値を探索し、誤終了が最少（同数なら平均試行回数が最小）のものを採用
+    python -m scripts.ocr.replay_scorer --results-dir runs/ocr/full --gt eval/ocr/gt.csv --search \\
+        --write scripts/ocr/preprocess/scorer_params.json
+"""
+import csv, json, argparse, pathlib, sys
+from typing import List, Dict, Any, Optional, Iterator
+
+from .preprocess.scoring import DEFAULT_WEIGHTS, score_features
+
+SEARCH_STEP = 0.05
+
+def load_gt(path: Optional[str]) -> Dict[str, str]:
+    """正解CSV（filename,text_gt）"""
+    if not path or not pathlib.Path(path).exists():
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return {row["filename"]: row["text_gt"] for row in csv.DictReader(f) if row.get("filename")}
+
+def replay_legacy(history: List[Dict[str, Any]]):
+    """旧ルール: 先頭の数値候補が妥当なら終了"""
+    for h in history:
+        cands = h["candidates"]
+        if cands and cands[0]["valid"]:
+            return h["attempt"], cands[0]["normalized"]
+    return None, None
+
+def replay_scored(history: List[Dict[str, Any]], threshold: float, weights: Dict[str, float]):
+    """スコアルール: 最良候補のスコアが閾値以上なら終了"""
+    for h in history:
+        scored = [(score_features(c, weights), c["normalized"]) for c in h["candidates"]]
+        if scored:
+            best_score, best_text = max(scored, key=lambda t: t[0])
+            if best_score >= threshold:
+                return h["attempt"], best_text
+    return None, None
+
+def summarize(outcomes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    stopped = [o for o in outcomes if o["attempt"] is not None]
+    judged = [o for o in stopped if o["gt"] is not None]
+    wrong = [o for o in judged if o["text"] != o["gt"]]
+    return {
+        "images": len(outcomes),
+        "stopped_within_history": len(stopped),
+        "mean_attempts_to_stop": sum(o["attempt"] for o in stopped) / len(stopped) if stopped else None,
+        # 止まらなかった画像は記録された全試行分を数える（Azure呼び出し回数の見積もり）
+        "mean_attempts": sum(o["attempt"] or o["total"] for o in outcomes) / len(outcomes),
+        "judged_with_gt": len(judged),
+        "wrong_exits": len(wrong),
+        "wrong_exit_rate": len(wrong) / len(judged) if judged else None,
+    }
+
+def evaluate(records, gt: Dict[str, str], replay) -> Dict[str, Any]:
+    return summarize([
+        dict(zip(("attempt", "text"), replay(h)), gt=gt.get(name), total=len(h)) for name, h in records
+    ])
+
+def weight_grid(step: float = SEARCH_STEP) -> Iterator[Dict[str, float]]:
+    n = int(round(1.0 / step))
+    for i in range(n + 1):
+        for j in range(n + 1 - i):
+            yield {"confidence": round(i * step, 4), "height": round(j * step, 4),
+                   "position": round((n - i - j) * step, 4)}
+
+def search(records, gt: Dict[str, str], thresholds: List[float], legacy: Dict[str, Any],
+           max_mean_attempts: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """旧ルールより誤終了・未終了が増えない組のうち、誤終了が最少のもの（同数なら平均試行回数が最小）
+
+    max_mean_attempts: 平均試行回数の上限（Azure呼び出し回数の予算）
+    """
+    best = None
+    for weights in weight_grid():
+        for t in thresholds:
+            summary = evaluate(records, gt, lambda h: replay_scored(h, t, weights))
+            if summary["wrong_exits"] > legacy["wrong_exits"]:
+                continue
+            if summary["stopped_within_history"] < legacy["stopped_within_history"]:
+                continue
+            if max_mean_attempts is not None and summary["mean_attempts"] > max_mean_attempts:
+                continue
+            key = (summary["wrong_exits"], summary["mean_attempts"])
+            if best is None or key < best[0]:
+                best = (key, {"weights": weights, "accept_score": t, "summary": summary})
+    return best[1] if best else None
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--results-dir", required=True, help="run_ocr.py --full-history の出力ディレクトリ")
+    ap.add_argument("--gt", default=None, help="正解CSV（filename,text_gt）")
+    ap.add_argument("--thresholds", default="0.4,0.5,0.55,0.6,0.7", help="比較する閾値（カンマ区切り）")
+    ap.add_argument("--search", action="store_true", help="重み（0.05刻み）と閾値（0.3〜0.9）を探索する（--gt 必須）")
+    ap.add_argument("--max-mean-attempts", type=float, default=None, help="探索時の平均試行回数の上限")
+    ap.add_argument("--write", default=None, help="探索結果の保存先（preprocess/scorer_params.json に置くと既定値になる）")
+    args = ap.parse_args()
+
+    gt = load_gt(args.gt)
+    records = []
+    partial = 0
+    with open(pathlib.Path(args.results_dir) / "results.jsonl", "r", encoding="utf-8") as f:
+        for line in f:
+            data = json.loads(line)
+            history = data.get("preprocessing", {}).get("history")
+            if history:
+                records.append((pathlib.Path(data["image"]).name, history))
+                partial += not data["preprocessing"].get("full_history", False)
+    if not records:
+        raise SystemExit("history付きの結果がありません（前処理ありで run_ocr.py を再実行してください）")
+    if partial:
+        print(f"warning: {partial}/{len(records)} 件は --full-history なしの記録です（採用時点で打ち切られています）", file=sys.stderr)
+
+    legacy = evaluate(records, gt, replay_legacy)
+    report = {"legacy": legacy}
+    for t in (float(x) for x in args.thresholds.split(",")):
+        report[f"score>={t}"] = evaluate(records, gt, lambda h: replay_scored(h, t, DEFAULT_WEIGHTS))
+
+    if args.search:
+        if not gt:
+            raise SystemExit("--search には正解CSV（--gt）が必要です")
+        thresholds = [round(0.3 + i * SEARCH_STEP, 2) for i in range(13)]
+        chosen = search(records, gt, thresholds, legacy, args.max_mean_attempts)
+        report["search"] = chosen
+        if chosen and args.write:
+            with open(args.write, "w", encoding="utf-8") as f:
+                json.dump({"weights": chosen["weights"], "accept_score": chosen["accept_score"],
+                           "measured_on": {"results_dir": args.results_dir, "legacy": legacy,
+                                           "chosen": chosen["summary"]}}, f, ensure_ascii=False, indent=2)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# scripts/ocr/run_video_ocr.py
+"""動画・フレーム連番のOCR（表示が変わったフレームだけOCRし、他は直前の読み取り値を使い回す）
+
+使い方（experiments/ から）:
+    python -m scripts.ocr.run_video_ocr --source data_ocr/videos/panel.mp4 --fps 2
+    python -m scripts.ocr.run_video_ocr --source data_ocr/frames/ --every 5 --hash-threshold 6
+"""
+import json, argparse, pathlib, datetime
+from typing import Iterator, Tuple
+import cv2
+import numpy as np
+from tqdm import tqdm
+
+from .run_ocr import make_client
+from .single_image_ocr import analyze_single_image
+from .change_detection import ChangeDetector
+
+IMAGE_EXTS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+def iter_frames(source: str, every: int = 1, fps: float = 0.0) -> Iterator[Tuple[int, float, np.ndarray]]:
+    """(フレーム番号, 時刻[秒], BGR画像) を間引きながら返す。ディレクトリは連番画像として扱う"""
+    src = pathlib.Path(source)
+    if src.is_dir():
+        paths = sorted(p for p in src.iterdir() if p.suffix.lower() in IMAGE_EXTS)
+        step = max(1, every)
+        for i in range(0, len(paths), step):
+            frame = cv2.imread(str(paths[i]))
+            if frame is not None:
+                yield i, i / fps if fps > 0 else float(i), frame
+        return
+
+    cap = cv2.VideoCapture(str(src))
+    if not cap.isOpened():
+        raise SystemExit(f"cannot open video: {source}")
+    video_fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    step = max(1, int(round(video_fps / fps))) if fps > 0 else max(1, every)
+    i = 0
+    try:
+        while True:
+            # 間引くフレームはデコードしない
+            if not cap.grab():
+                break
+            if i % step == 0:
+                ok, frame = cap.retrieve()
+                if ok:
+                    yield i, i / video_fps, frame
+            i += 1
+    finally:
+        cap.release()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--source", required=True, help="動画ファイル または フレーム画像のディレクトリ")
+    ap.add_argument("--fps", type=float, default=0.0, help="サンプリングレート（動画のみ、0なら --every）")
+    ap.add_argument("--every", type=int, default=1, help="Nフレームごとにサンプリング")
+    ap.add_argument("--hash-threshold", type=int, default=4, help="このハミング距離を超えたら表示が変わったとみなす（1024ビット中）")
+    ap.add_argument("--max-skip", type=int, default=0, help="連続で使い回す最大フレーム数（0なら無制限）")
+    ap.add_argument("--outdir", default=None, help="出力先（未指定なら runs/video_ocr/<timestamp>)")
+    ap.add_argument("--no-preprocessing", action="store_true", help="前処理を無効にする")
+    args = ap.parse_args()
+
+    client = make_client()
+    detector = ChangeDetector(args.hash_threshold, args.max_skip)
+    use_preprocessing = not args.no_preprocessing
+
+    ts = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    outdir = pathlib.Path(args.outdir or f"runs/video_ocr/{ts}")
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    sampled, ocr_frames, azure_calls = 0, 0, 0
+    last = {"text": "", "text_raw": "", "source_frame": None}
+    with open(outdir / "frames.jsonl", "w", encoding="utf-8") as jsonl:
+        for idx, t, frame in tqdm(iter_frames(args.source, args.every, args.fps), desc="frames"):
+            sampled += 1
+            need_ocr, distance = detector.check(frame)
+            if need_ocr:
+                # 前処理ありならデコード済みのフレームをそのまま渡す（JPEGへの往復をしない）
+                frame_bytes = b""
+                if not use_preprocessing:
+                    frame_bytes = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 95])[1].tobytes()
+                res, analysis = analyze_single_image(client, frame_bytes, use_preprocessing, image=frame)
+                nums = analysis["numeric"]
+                detector.update(frame)
+                ocr_frames += 1
+                azure_calls += analysis["preprocessing"].get("attempts", 1)
+                last = {
+                    "text": nums[0]["normalized"] if nums else "",
+                    "text_raw": nums[0]["text"] if nums else "",
+                    "source_frame": idx,
+                }
+
+            jsonl.write(json.dumps({
+                "frame": idx,
+                "time_s": round(t, 3),
+                "ocr": need_ocr,
+                "hash_distance": distance,
+                **last,
+            }, ensure_ascii=False) + "\n")
+
+    summary = {
+        "source": args.source,
+        "sampled_frames": sampled,
+        "ocr_frames": ocr_frames,
+        "reused_frames": sampled - ocr_frames,
+        "azure_calls": azure_calls,
+        "ocr_ratio": ocr_frames / sampled if sampled else 0.0,
+        "hash_threshold": args.hash_threshold,
+        "max_skip": args.max_skip,
+        "preprocessing": use_preprocessing,
+    }
+    with open(outdir / "summary.json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    print(f"done: {outdir}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+# scripts/ocr/seven_segment.py
+"""7セグメント（液晶・LED）数字のローカル認識（OpenCV/NumPyのみ、ネットワーク不要）
+
+extract_horizontal_rois のROI（と画像全体）を二値化・傾き補正し、
+数字ごとに7つのセグメント領域の点灯率を見て桁を決める。
+確信度の高い読み取りだけ採用し、不確かな場合は Azure に回す前提。
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import cv2
+import numpy as np
+
+from .numeric import NUMERIC_RE, is_valid_numeric
+from .preprocess.operations import PreprocessingOperations
+
+# 判定用にROIをこの高さへ正規化
+NORM_HEIGHT = 96
+# 斜体表示の補正で試すシアー量（x += shear * (h - y)）
+SHEARS = np.arange(-0.3, 0.301, 0.05)
+
+# セグメントの走査領域（桁ボックスに対する相対座標）
+#   (向き, 走査範囲の始点, 終点, 窓の始点, 終点)
+#   横セグメントは x を走査して窓（y範囲）内に点灯画素がある列の割合、縦セグメントはその逆。
+#   太さやフォントに依らず、点灯なら≒1、消灯なら≒0 になる。
+#   a: 上, b: 右上, c: 右下, d: 下, e: 左下, f: 左上, g: 中央
+SEGMENTS = (
+    ("h", 0.30, 0.70, 0.00, 0.22),
+    ("v", 0.18, 0.38, 0.65, 1.00),
+    ("v", 0.62, 0.82, 0.65, 1.00),
+    ("h", 0.30, 0.70, 0.78, 1.00),
+    ("v", 0.62, 0.82, 0.00, 0.35),
+    ("v", 0.18, 0.38, 0.00, 0.35),
+    ("h", 0.30, 0.70, 0.39, 0.61),
+)
+
+DIGITS = {
+    (1, 1, 1, 1, 1, 1, 0): "0",
+    (0, 1, 1, 0, 0, 0, 0): "1",
+    (1, 1, 0, 1, 1, 0, 1): "2",
+    (1, 1, 1, 1, 0, 0, 1): "3",
+    (0, 1, 1, 0, 0, 1, 1): "4",
+    (1, 0, 1, 1, 0, 1, 1): "5",
+    (1, 0, 1, 1, 1, 1, 1): "6",
+    (0, 0, 1, 1, 1, 1, 1): "6",   # 上なしの6
+    (1, 1, 1, 0, 0, 0, 0): "7",
+    (1, 1, 1, 0, 0, 1, 0): "7",   # 左上ありの7
+    (1, 1, 1, 1, 1, 1, 1): "8",
+    (1, 1, 1, 1, 0, 1, 1): "9",
+    (1, 1, 1, 0, 0, 1, 1): "9",   # 下なしの9
+}
+
+# 点灯判定の閾値と、確信度1とみなす閾値からの距離
+ON_RATIO = 0.5
+CONF_MARGIN = 0.4
+# 桁の幅/高さがこれ未満なら「1」
+ONE_ASPECT = 0.4
+# 「1」以外の桁として読む最小の幅/高さ
+MIN_DIGIT_ASPECT = 0.3
+# 「1」とみなす縦方向の点灯行の割合と、各行の最大幅（高さ比）
+ONE_FILL = 0.8
+ONE_STROKE = 0.25
+
+_ops = PreprocessingOperations()
+
+
+def _binarize(gray: np.ndarray, dark_text: bool) -> np.ndarray:
+    flag = cv2.THRESH_BINARY_INV if dark_text else cv2.THRESH_BINARY
+    _, binary = cv2.threshold(gray, 0, 255, flag | cv2.THRESH_OTSU)
+    return binary
+
+
+def _deskew(binary: np.ndarray) -> np.ndarray:
+    """斜体を補正（縦線が最も細くなる＝点灯列が最少になるシアーを選ぶ）"""
+    h, w = binary.shape
+    pad = int(abs(SHEARS).max() * h) + 1
+    best, best_cols = binary, np.count_nonzero(binary.any(axis=0))
+    for s in SHEARS:
+        if abs(s) < 1e-6:
+            continue
+        m = np.float32([[1, s, pad - s * h], [0, 1, 0]])
+        warped = cv2.warpAffine(binary, m, (w + 2 * pad, h), flags=cv2.INTER_NEAREST)
+        cols = np.count_nonzero(warped.any(axis=0))
+        if cols < best_cols:
+            best, best_cols = warped, cols
+    return best
+
+
+def _segment_states(binary: np.ndarray, box) -> Tuple[Tuple[int, ...], float]:
+    x, y, w, h = box
+    cell = binary[y:y + h, x:x + w] > 0
+    states, conf = [], 1.0
+    for axis, s0, s1, w0, w1 in SEGMENTS:
+        if axis == "h":
+            window = cell[int(w0 * h):max(int(w1 * h), int(w0 * h) + 1), int(s0 * w):max(int(s1 * w), int(s0 * w) + 1)]
+            hits = window.any(axis=0)
+        else:
+            window = cell[int(s0 * h):max(int(s1 * h), int(s0 * h) + 1), int(w0 * w):max(int(w1 * w), int(w0 * w) + 1)]
+            hits = window.any(axis=1)
+        ratio = float(hits.mean()) if hits.size else 0.0
+        states.append(int(ratio > ON_RATIO))
+        conf = min(conf, min(1.0, abs(ratio - ON_RATIO) / CONF_MARGIN))
+    return tuple(states), conf
+
+
+def _text_band(binary: np.ndarray) -> Optional[Tuple[int, int, int, int]]:
+    """数字の並ぶ帯（x, y, w, h）を返す。外周に接する塊（枠・背景）は除く"""
+    h, w = binary.shape
+    n, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    boxes = [
+        tuple(stats[i, :4]) for i in range(1, n)
+        if stats[i, 0] > 0 and stats[i, 1] > 0
+        and stats[i, 0] + stats[i, 2] < w and stats[i, 1] + stats[i, 3] < h
+        and stats[i, cv2.CC_STAT_AREA] >= 4
+    ]
+    if not boxes:
+        return None
+    # セグメント単位に割れていても、縦に並ぶ塊の高さから桁の高さを見積もる
+    tallest = max(b[3] for b in boxes)
+    band = [b for b in boxes if b[3] >= 0.3 * tallest]
+    top = min(b[1] for b in band)
+    bottom = max(b[1] + b[3] for b in band)
+    # 左右は帯の高さに収まる塊（符号・小数点を含む）まで広げる
+    inside = [b for b in boxes if b[1] >= top and b[1] + b[3] <= bottom]
+    left = min(b[0] for b in inside)
+    right = max(b[0] + b[2] for b in inside)
+    pad = max(2, (bottom - top) // 8)
+    y0, y1 = max(0, top - pad), min(h, bottom + pad)
+    x0, x1 = max(0, left - pad), min(w, right + pad)
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def _is_single_stroke(cell: np.ndarray) -> bool:
+    """「1」（縦1本）か。幅の狭い「3」「7」と区別するため、どの行も細いことを見る"""
+    on = cell > 0
+    rows = on.any(axis=1)
+    if rows.mean() < ONE_FILL:
+        return False
+    cols = np.arange(cell.shape[1])
+    spans = [np.ptp(cols[r]) + 1 for r in on[rows]]
+    # 横セグメントを含む桁は一部の行だけ幅が広くなる
+    wide = np.percentile(spans, 90)
+    return wide <= ONE_STROKE * cell.shape[0] and wide <= 1.5 * np.median(spans)
+
+
+def _group_digits(binary: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """セグメント単位の塊を桁単位の矩形にまとめる（膨張で繋げ、実画素の外接矩形を取る）"""
+    h = binary.shape[0]
+    kw = max(3, h // 20) | 1
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kw, max(3, h // 5)))
+    n, labels = cv2.connectedComponents(cv2.dilate(binary, kernel), connectivity=8)
+    boxes = []
+    for i in range(1, n):
+        pts = cv2.findNonZero(((labels == i) & (binary > 0)).astype(np.uint8))
+        if pts is not None:
+            boxes.append(cv2.boundingRect(pts))
+    # 斜体の補正残りで x 範囲が重なるものは同じ桁
+    boxes.sort()
+    merged: List[List[int]] = []
+    for x, y, w, bh in boxes:
+        if merged and x < merged[-1][0] + merged[-1][2]:
+            mx, my, mw, mh = merged[-1]
+            x0, y0 = min(mx, x), min(my, y)
+            x1, y1 = max(mx + mw, x + w), max(my + mh, y + bh)
+            merged[-1] = [x0, y0, x1 - x0, y1 - y0]
+        else:
+            merged.append([x, y, w, bh])
+    return [tuple(m) for m in merged]
+
+
+def _read_line(binary: np.ndarray) -> Optional[Dict[str, Any]]:
+    """二値化済み（文字=255）の1行から数値を読む"""
+    h = binary.shape[0]
+    # 小数点は桁と繋がらないよう先に取り出す（下寄りの小さな塊）
+    n, labels, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    dots, digits_only = [], binary.copy()
+    for i in range(1, n):
+        x, y, w, bh, area = stats[i]
+        if w <= 0.15 * h and bh <= 0.15 * h and y + bh >= 0.6 * h and 0.5 <= w / float(bh) <= 2.0:
+            dots.append((x, y, w, bh))
+            digits_only[labels == i] = 0
+
+    boxes = [b for b in _group_digits(digits_only) if b[2] * b[3] >= 4]
+    if not boxes:
+        return None
+    digit_h = max(b[3] for b in boxes)
+    if digit_h < h * 0.3:
+        return None
+    tall = [b for b in boxes if b[3] >= 0.6 * digit_h]
+    # 「1」「4」「7」は上下のセグメントがなく背が低いので、行の上端・下端は最大範囲で取る
+    top = min(b[1] for b in tall)
+    baseline = max([b[1] + b[3] for b in tall] + [d[1] + d[3] for d in dots])
+
+    chars: List[Tuple[int, str, float]] = []
+    noise = 0
+    for x, y, w, bh in boxes:
+        if bh >= 0.6 * digit_h:
+            if w < ONE_ASPECT * bh and _is_single_stroke(binary[y:y + bh, x:x + w]):
+                chars.append((x, "1", 1.0))
+                continue
+            if w < MIN_DIGIT_ASPECT * bh:
+                return None
+            states, conf = _segment_states(binary, (x, top, w, baseline - top))
+            digit = DIGITS.get(states)
+            if digit is None:
+                return None
+            chars.append((x, digit, conf))
+        elif bh < 0.3 * digit_h and w >= 0.3 * digit_h and top + 0.3 * digit_h < y + bh / 2 < baseline - 0.3 * digit_h:
+            chars.append((x, "-", 1.0))
+        else:
+            noise += 1
+    for x, y, w, bh in dots:
+        if abs(y + bh - baseline) <= 0.15 * digit_h:
+            chars.append((x, ".", 1.0))
+        else:
+            noise += 1
+
+    chars.sort()
+    text = "".join(c for _, c, _ in chars)
+    # 小数点が先頭・末尾・連続するものは誤検出扱い
+    text = text.strip(".")
+    if ".." in text or not any(c.isdigit() for c in text):
+        return None
+    if not NUMERIC_RE.fullmatch(text) or not is_valid_numeric(text):
+        return None
+
+    confidence = min(c for _, _, c in chars) * (0.5 ** noise)
+    return {"text": text, "confidence": float(confidence)}
+
+
+def read_region(image: np.ndarray) -> Optional[Dict[str, Any]]:
+    """1領域を両極性（暗い文字／明るい文字）で読み、確信度の高い方を返す"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    if gray.shape[0] < 10 or gray.shape[1] < 10:
+        return None
+
+    best = None
+    for dark_text in (True, False):
+        band = _text_band(_binarize(gray, dark_text))
+        if band is None or band[3] < 10:
+            continue
+        x, y, w, h = band
+        scale = NORM_HEIGHT / float(h)
+        line = cv2.resize(gray[y:y + h, x:x + w], (max(1, int(w * scale)), NORM_HEIGHT),
+                          interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_LINEAR)
+        # 余白を足して外周に接する桁も塊として取れるようにする
+        line = cv2.copyMakeBorder(line, 4, 4, 4, 4, cv2.BORDER_REPLICATE)
+        reading = _read_line(_deskew(_binarize(line, dark_text)))
+        if reading and (best is None or reading["confidence"] > best["confidence"]):
+            best = {**reading, "band": band}
+    return best
+
+
+def recognize(image: np.ndarray, k: int = 3) -> Optional[Dict[str, Any]]:
+    """ROI候補（横長領域＋画像全体）から最も確信度の高い読み取りを返す
+
+    戻り値: {"text", "confidence", "roi": [x, y, w, h]} または None
+    """
+    h, w = image.shape[:2]
+    regions = [tuple(r) for r in _ops.extract_horizontal_rois(image, k=k)] + [(0, 0, w, h)]
+    best = None
+    for roi in regions:
+        reading = read_region(_ops.crop_roi(image, roi))
+        if reading and (best is None or reading["confidence"] > best["confidence"]):
+            bx, by, bw, bh = reading.pop("band")
+            best = {**reading, "roi": [int(roi[0] + bx), int(roi[1] + by), int(bw), int(bh)]}
+    return best
+
+
+def as_ocr_lines(reading: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Azure Readと同じ形の行リストに変換（後段の数値抽出・スコアリングをそのまま使う）"""
+    x, y, w, h = reading["roi"]
+    polygon = [{"x": x, "y": y}, {"x": x + w, "y": y}, {"x": x + w, "y": y + h}, {"x": x, "y": y + h}]
+    return [{
+        "text": reading["text"],
+        "bounding_polygon": polygon,
+        "words": [{"text": reading["text"], "confidence": reading["confidence"], "bounding_polygon": polygon}],
+    }]
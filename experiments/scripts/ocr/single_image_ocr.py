@@ -1,16 +1,21 @@
 # scripts/ocr/single_image_ocr.py
-import re
+import time
 import cv2
 import numpy as np
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 from azure.ai.vision.imageanalysis import ImageAnalysisClient
 from azure.ai.vision.imageanalysis.models import VisualFeatures
 
 # 既存のpreprocessモジュールをインポート
 from .preprocess import PreprocessingEngine
+from .preprocess.scoring import DEFAULT_ACCEPT_SCORE, rank_candidates
+from .numeric import pick_numeric, check_ocr_success
+from .image_io import decode_bounded
+from .encoding import encode_variant, encode_legacy, rescale_lines
+from . import seven_segment
 
-# 既存の正規表現を再利用
-NUMERIC_RE = re.compile(r"^(?!.*[IO]/[IO])(?![IO]+$)(?![A-Z]+$)[0-9OIl:.,+\-_/\\()\s°C°F%]+$")
+# ローカル7セグ認識の結果を採用する確信度（これ未満は Azure に回す）
+LOCAL_THRESHOLD = 0.85
 
 
 def analyze_image_bytes(client: ImageAnalysisClient, img_bytes: bytes) -> Dict[str, Any]:
@@ -49,54 +54,31 @@ def analyze_image_bytes(client: ImageAnalysisClient, img_bytes: bytes) -> Dict[s
     return {"lines": lines}
 
 
-def smart_normalize(text: str) -> str:
-    """既存のsmart_normalize関数をそのまま使用"""
-    import re
-    
-    # 明らかに非数値なパターンはそのまま返す
-    non_numeric = ['I/O', 'O/I', 'ON', 'OFF', 'IO', 'OI']
-    if text.upper() in non_numeric:
-        return text
-    
-    # 時刻表示の前処理クリーンアップ
-    cleaned = text
-    
-    # 先頭の不要文字を除去
-    cleaned = re.sub(r'^[.\-\s]+', '', cleaned)
-    
-    # 時刻パターンの間のスペースを除去
-    cleaned = re.sub(r'(\d)\s+(\d)', r'\1\2', cleaned)  # "1 1:38" → "11:38"
-    cleaned = re.sub(r'(\d)\s+:', r'\1:', cleaned)      # "1 :" → "1:"
-    cleaned = re.sub(r':\s+(\d)', r':\1', cleaned)      # ": 38" → ":38"
-    
-    # 数字がある場合のみ文字置換
-    if re.search(r'\d', cleaned):
-        cleaned = cleaned.replace("O", "0").replace("I", "1").replace("l", "1")
-    
-    return cleaned
-
-
-def pick_numeric(lines: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """既存のpick_numeric関数をそのまま使用"""
-    out = []
-    for ln in lines:
-        text = ln["text"].strip()
-        if NUMERIC_RE.fullmatch(text):
-            normalized = smart_normalize(text)
-            out.append({**ln, "normalized": normalized})
-    return out
-
+def analyze_single_image(client: ImageAnalysisClient, img_bytes: bytes, use_preprocessing: bool = True,
+                         preferred_spec: Optional[Dict[str, Any]] = None,
+                         max_decode_pixels: int = 0, max_variant_pixels: int = 0,
+                         image: Optional[np.ndarray] = None,
+                         legacy_encoding: bool = False, local_first: bool = False,
+                         local_threshold: float = LOCAL_THRESHOLD,
+                         reuse_buffers: bool = False,
+                         plan: Optional[Dict[str, Any]] = None,
+                         similar_distance: Optional[int] = None,
+                         resume: Optional[Dict[str, Any]] = None,
+                         full_history: bool = False) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """単一画像のOCR処理（バイト列版）
 
-def check_ocr_success(lines: List[Dict[str, Any]]) -> Tuple[bool, bool, List[Dict[str, Any]]]:
-    """既存のcheck_ocr_success関数をそのまま使用"""
-    found_any_line = len(lines) > 0
-    numeric_results = pick_numeric(lines)
-    found_numeric_like = len(numeric_results) > 0
-    return found_any_line, found_numeric_like, numeric_results
-
-
-def analyze_single_image(client: ImageAnalysisClient, img_bytes: bytes, use_preprocessing: bool = True) -> Tuple[Dict[str, Any], Dict[str, Any]]:
-    """単一画像のOCR処理（バイト列版）"""
+    preferred_spec: 前回採用されたステージ仕様（final_stage）。最初にこれを試す。
+    max_decode_pixels / max_variant_pixels: メモリ上限（0なら無制限）。
+        デコード時の縮小と、拡大バリアントの画素数上限。
+    image: 呼び出し側でデコード済みの画像（指定時は img_bytes を再デコードしない）。
+    legacy_encoding: 送信画像を従来の既定品質JPEGにする（比較用）。
+    local_first: Azureの前にローカルの7セグ認識を試し、確信度が local_threshold 以上ならそれを返す。
+    reuse_buffers: 前処理バリアントをスレッドごとの再利用バッファで生成する（送信バイト列は同じ）。
+    plan: カスケード計画（preprocess.plans.get_plan の戻り値、Noneなら既定の計画）。
+    similar_distance: 失敗済みバリアントとのdHash距離がこれ以下のバリアントはOCRしない（Noneなら全て送る）。
+    resume: 撮り直し前の試行結果（前回の preprocessing["resume"]）。前回無駄だったバリアントを飛ばし、未試行のものから試す。
+    full_history: 早期終了せず計画の全試行を記録する（replay_scorer.py で終了ルールを比較するため。結果は最高スコアの試行）。
+    """
     
     if not use_preprocessing:
         # 前処理なしの場合
@@ -106,37 +88,91 @@ def analyze_single_image(client: ImageAnalysisClient, img_bytes: bytes, use_prep
         return res, {"numeric": nums, "preprocessing": preprocessing_log}
     
     # 前処理エンジンを使用
-    image = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
+    reduction = 1
+    if image is None:
+        image, reduction = decode_bounded(img_bytes, max_decode_pixels)
     if image is None:
         raise ValueError("Invalid image data")
     
-    engine = PreprocessingEngine()
+    local = None
+    if local_first:
+        t0 = time.perf_counter()
+        reading = seven_segment.recognize(image)
+        local = {
+            "text": reading["text"] if reading else "",
+            "roi": reading["roi"] if reading else None,
+            "confidence": reading["confidence"] if reading else 0.0,
+            "latency_ms": (time.perf_counter() - t0) * 1000.0,
+            "accepted": bool(reading) and reading["confidence"] >= local_threshold
+        }
+        if local["accepted"]:
+            res = {"lines": seven_segment.as_ocr_lines(reading)}
+            nums = rank_candidates(pick_numeric(res["lines"]), image.shape)
+            preprocessing_log = {
+                "used_preprocessing": True,
+                "attempts": 0,
+                "final_stage": None,
+                "history": [],
+                "accepted": True,
+                "resume": None,
+                "decode_reduction": reduction,
+                "local": local,
+                "uploads": [],
+                "upload_bytes": 0
+            }
+            return res, {"numeric": nums, "preprocessing": preprocessing_log}
+    
+    accept_score = float("inf") if full_history else DEFAULT_ACCEPT_SCORE
+    engine = PreprocessingEngine(accept_score=accept_score, max_variant_pixels=max_variant_pixels,
+                                 reuse_buffers=reuse_buffers, plan=plan, similar_distance=similar_distance)
+    attempt_results = {}
+    uploads = []
+    encode = encode_legacy if legacy_encoding else encode_variant
+    
+    def ocr_variant(processed_img: np.ndarray) -> Dict[str, Any]:
+        """バリアントに合わせた形式でエンコードしてOCR（座標はバリアント基準に戻す）"""
+        processed_bytes, info = encode(processed_img)
+        t0 = time.perf_counter()
+        res = analyze_image_bytes(client, processed_bytes)
+        uploads.append({"attempt": engine.attempt_count, "bytes": len(processed_bytes),
+                        "latency_ms": (time.perf_counter() - t0) * 1000.0, **info})
+        rescale_lines(res["lines"], info["scale"])
+        return res
     
     def ocr_callback(processed_img: np.ndarray) -> Tuple[bool, bool, List[Dict[str, Any]]]:
         """前処理された画像に対するOCRコールバック"""
         if processed_img is None or processed_img.size == 0:
             return False, False, []
         
-        _, buffer = cv2.imencode('.jpg', processed_img)
-        processed_bytes = buffer.tobytes()
-        res = analyze_image_bytes(client, processed_bytes)
+        res = ocr_variant(processed_img)
+        # 採用された試行の結果を再利用するため保持（試行番号はエンジン側で採番済み）
+        attempt_results[engine.attempt_count] = res
         return check_ocr_success(res["lines"])
     
     # 段階的前処理実行
-    final_image = engine.process_image(image, ocr_callback)
+    final_image = engine.process_image(image, ocr_callback, preferred_spec, resume)
     
-    # 最終結果のOCR
-    _, buffer = cv2.imencode('.jpg', final_image)
-    final_bytes = buffer.tobytes()
-    final_res = analyze_image_bytes(client, final_bytes)
-    final_nums = pick_numeric(final_res["lines"])
+    # 最終結果: 採用試行（全失敗時はS0）のOCR結果を再利用し、無ければ再OCR
+    final_res = attempt_results.get(engine.final_attempt or engine.original_attempt)
+    if final_res is None:
+        final_res = ocr_variant(final_image)
+    final_nums = rank_candidates(pick_numeric(final_res["lines"]), final_image.shape)
     
     preprocessing_log = {
         "used_preprocessing": True,
         "attempts": engine.attempt_count,
-        "final_stage": f"attempt_{engine.attempt_count}"
+        "plan": engine.plan["name"],
+        "stages": engine.stages,
+        "skipped": engine.skipped,
+        "accepted": engine.accepted,
+        "resume": engine.resume_state(image.shape),
+        "final_stage": engine.final_stage,
+        "history": engine.history,
+        "full_history": full_history,
+        "decode_reduction": reduction,
+        "local": local,
+        "uploads": uploads,
+        "upload_bytes": sum(u["bytes"] for u in uploads)
     }
     
     return final_res, {"numeric": final_nums, "preprocessing": preprocessing_log}
-
-